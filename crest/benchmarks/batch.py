@@ -0,0 +1,65 @@
+""" Compare validating a large array response element by element with the compiled
+    jsonschema validator against validating it in one batch with a `BatchValidator`,
+    for a flat item schema that is checked entirely column by column and for one with
+    a property that has to be validated generically. Run with
+    `python -m crest.benchmarks.batch`.
+"""
+import argparse
+import json
+
+from crest.schema import JSONSchema, sub_validator
+from crest.benchmarks.records import best_of
+from crest.benchmarks.server import echo_payload
+
+
+FLAT_ITEM = {
+    'type': 'object',
+    'required': ['id', 'name', 'value', 'active'],
+    'properties': {
+        'id': {'type': 'integer', 'minimum': 0},
+        'name': {'type': 'string', 'maxLength': 32},
+        'value': {'type': 'number', 'minimum': 0, 'maximum': 1e9},
+        'active': {'type': 'boolean', 'enum': [True, False]}
+    }
+}
+
+# the same, with a pattern on the name, which can't be vectorized
+MIXED_ITEM = dict(FLAT_ITEM, properties=dict(FLAT_ITEM['properties'],
+                                             name={'type': 'string', 'pattern': '^item [0-9]+$'}))
+
+
+def run(items=100000, rounds=3):
+
+    data = json.loads(echo_payload('GET', '/items?items={}'.format(items), b''))
+
+    results = {}
+    for name, item_schema in [('flat', FLAT_ITEM), ('mixed', MIXED_ITEM)]:
+        schema = JSONSchema({'type': 'array', 'items': item_schema})
+        generic = sub_validator(schema.validator, item_schema)
+        batch = schema.batch_validator(items=True)
+        assert batch.invalid_indices(data) == [i for i, obj in enumerate(data) if not generic.is_valid(obj)]
+
+        per_element = best_of(lambda: [generic.is_valid(obj) for obj in data], rounds)
+        batched = best_of(lambda: batch.invalid_indices(data), rounds)
+        results[name] = {
+            'per_element_seconds': per_element,
+            'batch_seconds': batched,
+            'speedup': per_element / batched
+        }
+    return results
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    for name, result in run(args.items, args.rounds).items():
+        print('{:>6}: per element {:8.1f} ms, batch {:8.1f} ms ({:5.1f}x)'.format(
+            name, result['per_element_seconds'] * 1e3, result['batch_seconds'] * 1e3, result['speedup']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+""" Compare the throughput of the JSON codecs available to the client when decoding large
+    response bodies from bytes and encoding request bodies to bytes. Run with
+    `python -m crest.benchmarks.codecs`.
+"""
+import argparse
+import time
+
+from crest.codec import available_codecs, get_codec
+from crest.benchmarks.server import echo_payload
+
+
+def best_of(func, rounds):
+
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(sizes=(1000, 10000, 100000), rounds=5):
+
+    results = {}
+    for items in sizes:
+        payload = echo_payload('GET', '/items?items={}'.format(items), b'')
+        for name in available_codecs():
+            codec = get_codec(name)
+            document = codec.loads(payload)
+            decode = best_of(lambda: codec.loads(payload), rounds)
+            encode = best_of(lambda: codec.dumps(document), rounds)
+            results[(name, items)] = {
+                'bytes': len(payload),
+                'decode_megabytes_per_second': len(payload) / decode / 1e6,
+                'encode_megabytes_per_second': len(payload) / encode / 1e6
+            }
+    return results
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    for (name, items), result in run(args.sizes, args.rounds).items():
+        print('{:>10} {:>7} items ({:>9} bytes): decode {:7.1f} MB/s, encode {:7.1f} MB/s'.format(
+            name, items, result['bytes'], result['decode_megabytes_per_second'],
+            result['encode_megabytes_per_second']))
+
+
+if __name__ == '__main__':
+    main()
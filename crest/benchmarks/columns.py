@@ -0,0 +1,52 @@
+""" Compare decoding a list response into the dicts it decodes to with decoding it into
+    NumPy columns, as a dict of arrays or as a structured array: how long decoding
+    takes, and how much memory the result holds on to. Run with
+    `python -m crest.benchmarks.columns`.
+"""
+import argparse
+
+from crest.codec import get_codec
+from crest.columns import to_columns, to_structured
+from crest.schema import JSONSchema
+from crest.benchmarks.records import ITEMS_SCHEMA, best_of, retained_bytes
+from crest.benchmarks.server import echo_payload
+
+
+def run(items=100000, rounds=3, codec=None):
+
+    codec = get_codec(codec)
+    columns = JSONSchema(dict(ITEMS_SCHEMA, items=dict(ITEMS_SCHEMA['items'],
+                                                       required=['id', 'name', 'value', 'active']))).columns()
+    payload = echo_payload('GET', '/items?items={}'.format(items), b'')
+
+    decoders = [
+        ('dicts', lambda: codec.loads(payload)),
+        ('columns', lambda: to_columns(columns, codec.loads(payload))),
+        ('structured', lambda: to_structured(columns, codec.loads(payload)))
+    ]
+
+    results = {}
+    for name, decode in decoders:
+        seconds = best_of(decode, rounds)
+        results[name] = {
+            'seconds': seconds,
+            'bytes_per_record': retained_bytes(decode) / items
+        }
+    return results
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--codec', default=None)
+    args = parser.parse_args()
+
+    for name, result in run(args.items, args.rounds, args.codec).items():
+        print('{:>10}: {:8.1f} ms, {:6.0f} bytes per record'.format(
+            name, result['seconds'] * 1e3, result['bytes_per_record']))
+
+
+if __name__ == '__main__':
+    main()
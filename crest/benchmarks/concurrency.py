@@ -0,0 +1,64 @@
+""" Compare how long a burst of calls takes through the blocking client, one call after
+    another, and through the asyncio client with all of them in flight at once. Run with
+    `python -m crest.benchmarks.concurrency`.
+"""
+import argparse
+import asyncio
+import time
+
+from crest.builder import RESTInterface, Get
+from crest.client import Client, AsyncClient
+from crest.benchmarks.server import AsyncStandInServer
+
+
+class BenchInterface(RESTInterface):
+
+    user = Get('users/{id}')
+
+
+def run_sync(url, requests):
+
+    with Client(url) as client:
+        interface = BenchInterface(client)
+        start = time.perf_counter()
+        for i in range(requests):
+            interface.user.get(id=i)
+        return time.perf_counter() - start
+
+
+async def run_async(url, requests):
+
+    async with AsyncClient(url) as client:
+        interface = BenchInterface(client)
+        start = time.perf_counter()
+        await asyncio.gather(*[interface.user.aget(id=i) for i in range(requests)])
+        return time.perf_counter() - start
+
+
+def run(requests=200, latency=0.02):
+
+    results = {}
+    with AsyncStandInServer(latency=latency) as server:
+        for label, elapsed in [('sync', run_sync(server.url, requests)),
+                               ('async', asyncio.run(run_async(server.url, requests)))]:
+            results[label] = {
+                'seconds': elapsed,
+                'requests_per_second': requests / elapsed
+            }
+    return results
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.02)
+    args = parser.parse_args()
+
+    for label, result in run(args.requests, args.latency).items():
+        print('{:>6}: {:8.3f}s, {:10.1f} req/s'.format(
+            label, result['seconds'], result['requests_per_second']))
+
+
+if __name__ == '__main__':
+    main()
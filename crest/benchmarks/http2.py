@@ -0,0 +1,74 @@
+""" Compare the throughput of many threads sharing one client over HTTP/1.1, through
+    a connection pool that either blocks at `pool_maxsize` connections or opens extra
+    ones, or is as large as the number of threads, with the same calls multiplexed
+    over a single HTTP/2 connection. The stand-in servers hold every response back for
+    the same latency. Run with `python -m crest.benchmarks.http2`.
+"""
+import argparse
+import time
+
+from concurrent import futures
+from crest.builder import RESTInterface, Get
+from crest.client import Client
+from crest.transport import HTTP2Transport
+from crest.benchmarks.server import AsyncStandInServer, HTTP2StandInServer
+
+
+class BenchInterface(RESTInterface):
+
+    api_base = 'api'
+    items = Get('items/{id}')
+
+
+def requests_per_second(client, requests, threads, items):
+
+    interface = BenchInterface(client)
+    start = time.perf_counter()
+    with futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda i: interface.items.get(id=i, params={'items': items}), range(requests)))
+    return requests / (time.perf_counter() - start)
+
+
+def run(requests=2000, threads=64, latency=0.05, items=10, pool_maxsize=10, max_streams=100):
+
+    results = {}
+    with AsyncStandInServer(latency=latency) as server:
+        for label, maxsize, block in [('http/1.1, {} blocking'.format(pool_maxsize), pool_maxsize, True),
+                                      ('http/1.1, {}'.format(pool_maxsize), pool_maxsize, False),
+                                      ('http/1.1, {}'.format(threads), threads, False)]:
+            server.connections = 0
+            with Client(server.url, pool_maxsize=maxsize, pool_block=block, coalesce=False) as client:
+                results[label] = {
+                    'requests_per_second': requests_per_second(client, requests, threads, items),
+                    'connections': server.connections
+                }
+
+    with HTTP2StandInServer(latency=latency, max_streams=max_streams) as server:
+        transport = HTTP2Transport(max_streams=max_streams, http1=False)
+        with Client(server.url, transport=transport, coalesce=False) as client:
+            results['http/2'] = {
+                'requests_per_second': requests_per_second(client, requests, threads, items),
+                'connections': server.connections
+            }
+    return results
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=64)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds every response is held back for')
+    parser.add_argument('--items', type=int, default=10, help='records in every response')
+    parser.add_argument('--pool-maxsize', type=int, default=10)
+    parser.add_argument('--max-streams', type=int, default=100)
+    args = parser.parse_args()
+
+    results = run(args.requests, args.threads, args.latency, args.items, args.pool_maxsize, args.max_streams)
+    for label, result in results.items():
+        print('{:>22}: {:10.1f} req/s over {} connection(s)'.format(
+            label, result['requests_per_second'], result['connections']))
+
+
+if __name__ == '__main__':
+    main()
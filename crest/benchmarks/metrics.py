@@ -0,0 +1,52 @@
+""" Measure the cost of recording call metrics, by comparing the time per call of a
+    client without metrics against one with them. Run with
+    `python -m crest.benchmarks.metrics`.
+"""
+import argparse
+import time
+
+from crest.builder import RESTInterface, Get
+from crest.client import Client
+from crest.metrics import Metrics
+from crest.benchmarks.server import StandInServer
+
+
+class BenchInterface(RESTInterface):
+
+    user = Get('users/{id}')
+
+
+def microseconds_per_call(client, calls):
+
+    interface = BenchInterface(client)
+    start = time.perf_counter()
+    for i in range(calls):
+        interface.user.get(id=i)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def run(calls=2000, rounds=3):
+
+    results = {'disabled': [], 'enabled': []}
+    with StandInServer() as server:
+        for _ in range(rounds):
+            for label, metrics in [('disabled', None), ('enabled', Metrics())]:
+                with Client(server.url, metrics=metrics) as client:
+                    results[label].append(microseconds_per_call(client, calls))
+    # the best round is the least disturbed by the rest of the system
+    return {label: {'microseconds_per_call': min(times)} for label, times in results.items()}
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    for label, result in run(args.calls, args.rounds).items():
+        print('{:>10}: {:8.1f}us per call'.format(label, result['microseconds_per_call']))
+
+
+if __name__ == '__main__':
+    main()
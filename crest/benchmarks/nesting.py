@@ -0,0 +1,72 @@
+""" Measure the construction time and peak memory of a schema that embeds the same
+    library of sub-schemas in many parents. Run with `python -m crest.benchmarks.nesting`.
+"""
+import argparse
+import time
+import tracemalloc
+
+from crest.schema import JSONSchema
+
+
+def make_library(definitions):
+
+    return JSONSchema({
+        'type': 'object',
+        'properties': {'root': {'$ref': '#/definitions/type0'}},
+        'definitions': {
+            'type{}'.format(i): {
+                'type': 'object',
+                'description': 'shared definition number {}'.format(i),
+                'properties': {
+                    'id': {'type': 'integer'},
+                    'name': {'type': 'string', 'maxLength': 64},
+                    'tags': {'type': 'array', 'items': {'type': 'string'}}
+                }
+            } for i in range(definitions)
+        }
+    })
+
+
+def make_composed(library, parents):
+
+    return JSONSchema({
+        'type': 'object',
+        'properties': {'parent{}'.format(i): {'$ref': '#/definitions/parent{}'.format(i)} for i in range(parents)},
+        'definitions': {
+            'parent{}'.format(i): {
+                'type': 'object',
+                'properties': {'library': {'$ref': '#/definitions/library'}},
+                'definitions': {'library': library}
+            } for i in range(parents)
+        }
+    })
+
+
+def run(definitions=500, parents=50):
+
+    library = make_library(definitions)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    make_composed(library, parents)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'seconds': elapsed, 'peak_bytes': peak}
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--definitions', type=int, default=500)
+    parser.add_argument('--parents', type=int, default=50)
+    args = parser.parse_args()
+
+    result = run(args.definitions, args.parents)
+    print('{} parents x {} definitions: {:.4f}s, peak {:.1f} KiB'.format(
+        args.parents, args.definitions, result['seconds'], result['peak_bytes'] / 1024))
+
+
+if __name__ == '__main__':
+    main()
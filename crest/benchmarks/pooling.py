@@ -0,0 +1,53 @@
+""" Compare request throughput of a pooled, keep-alive client against one that opens a
+    new connection for every call. Run with `python -m crest.benchmarks.pooling`.
+"""
+import argparse
+import time
+
+from crest.builder import RESTInterface, Get
+from crest.client import Client
+from crest.benchmarks.server import StandInServer
+
+
+class BenchInterface(RESTInterface):
+
+    user = Get('users/{id}')
+
+
+def requests_per_second(client, requests):
+
+    interface = BenchInterface(client)
+    start = time.perf_counter()
+    for i in range(requests):
+        interface.user.get(id=i)
+    elapsed = time.perf_counter() - start
+    return requests / elapsed
+
+
+def run(requests=1000):
+
+    results = {}
+    with StandInServer() as server:
+        for label, keep_alive in [('pooled', True), ('unpooled', False)]:
+            server.connections = 0
+            with Client(server.url, keep_alive=keep_alive) as client:
+                results[label] = {
+                    'requests_per_second': requests_per_second(client, requests),
+                    'connections': server.connections
+                }
+    return results
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=1000)
+    args = parser.parse_args()
+
+    for label, result in run(args.requests).items():
+        print('{:>10}: {:10.1f} req/s over {} connection(s)'.format(
+            label, result['requests_per_second'], result['connections']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+""" Compare holding a decoded list response as the dicts it decodes to with holding it as
+    the `__slots__` records generated from its `JSONSchema`: the memory each record
+    takes, and how fast a response body is decoded into either. Run with
+    `python -m crest.benchmarks.records`.
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from crest.codec import get_codec
+from crest.schema import JSONSchema
+from crest.benchmarks.server import echo_payload
+
+
+ITEMS_SCHEMA = {
+    'type': 'array',
+    'items': {
+        'title': 'item',
+        'type': 'object',
+        'properties': {
+            'id': {'type': 'integer'},
+            'name': {'type': 'string'},
+            'value': {'type': 'number'},
+            'active': {'type': 'boolean'}
+        }
+    }
+}
+
+
+def retained_bytes(func):
+    """ How many bytes the value `func` returns still holds once it has been built """
+
+    gc.collect()
+    tracemalloc.start()
+    value = func()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del value
+    return size
+
+
+def best_of(func, rounds):
+
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(items=100000, rounds=3, codec=None):
+
+    codec = get_codec(codec)
+    record_class = JSONSchema(ITEMS_SCHEMA).record_class()
+    payload = echo_payload('GET', '/items?items={}'.format(items), b'')
+
+    decode_dicts = lambda: codec.loads(payload)
+    decode_records = lambda: record_class.from_list(codec.loads(payload))
+
+    results = {}
+    for name, decode in [('dicts', decode_dicts), ('records', decode_records)]:
+        seconds = best_of(decode, rounds)
+        results[name] = {
+            'bytes_per_record': retained_bytes(decode) / items,
+            'records_per_second': items / seconds
+        }
+    return results
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--codec', default=None)
+    args = parser.parse_args()
+
+    for name, result in run(args.items, args.rounds, args.codec).items():
+        print('{:>8}: {:6.0f} bytes per record, {:10.0f} records/s'.format(
+            name, result['bytes_per_record'], result['records_per_second']))
+
+
+if __name__ == '__main__':
+    main()
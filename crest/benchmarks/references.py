@@ -0,0 +1,66 @@
+""" Measure how `JSONSchema.adjust_references` scales with the number of definitions in a
+    schema. Run with `python -m crest.benchmarks.references`.
+"""
+import argparse
+import time
+
+from crest.schema import JSONSchema
+
+
+def make_schema(definitions, group_size=10):
+    """ A schema with `definitions` definitions, split into nested sub-schemas of
+        `group_size` definitions that each reference their neighbours
+    """
+
+    groups = {}
+    for group in range(max(definitions // group_size, 1)):
+        names = ['item{}'.format(i) for i in range(group_size)]
+        groups['group{}'.format(group)] = {
+            'type': 'object',
+            'properties': {name: {'$ref': '#/definitions/{}'.format(name)} for name in names},
+            'definitions': {
+                name: {
+                    'type': 'object',
+                    'properties': {
+                        'value': {'type': 'number'},
+                        'next': {'$ref': '#/definitions/{}'.format(names[(i + 1) % group_size])}
+                    }
+                } for i, name in enumerate(names)
+            }
+        }
+
+    return {
+        'type': 'object',
+        'properties': {name: {'$ref': '#/definitions/{}'.format(name)} for name in groups},
+        'definitions': groups
+    }
+
+
+def run(sizes=(100, 1000, 10000, 100000)):
+
+    results = {}
+    for size in sizes:
+        schema = JSONSchema(make_schema(size), recompute_refs=False)
+        start = time.perf_counter()
+        schema.adjust_references()
+        elapsed = time.perf_counter() - start
+        results[size] = {
+            'seconds': elapsed,
+            'microseconds_per_definition': elapsed / size * 1e6
+        }
+    return results
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000])
+    args = parser.parse_args()
+
+    for size, result in run(args.sizes).items():
+        print('{:>8} definitions: {:8.4f}s, {:6.2f}us per definition'.format(
+            size, result['seconds'], result['microseconds_per_definition']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+""" Compare loading schema files through a `SchemaRegistry` with a cold disk cache, a
+    warm one (a fresh registry, as in a new process, over an existing cache) and from
+    memory, against processing them with `JSONSchema` every time. Run with
+    `python -m crest.benchmarks.registry`.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from crest.registry import SchemaRegistry
+from crest.schema import JSONSchema
+from crest.benchmarks.references import make_schema
+
+
+def timed(func):
+
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def run(files=20, definitions=2000):
+
+    with tempfile.TemporaryDirectory() as directory:
+        schemas = os.path.join(directory, 'schemas')
+        cache_dir = os.path.join(directory, 'cache')
+        os.makedirs(schemas)
+        names = ['schema{}'.format(i) for i in range(files)]
+        for name in names:
+            with open(os.path.join(schemas, name + '.json'), 'w') as f:
+                json.dump(make_schema(definitions), f)
+
+        def load_all(registry):
+            for name in names:
+                registry.load(name)
+
+        uncached = timed(lambda: [JSONSchema(os.path.join(schemas, name + '.json')) for name in names])
+        registry = SchemaRegistry(cache_dir, search_paths=[schemas])
+        cold = timed(lambda: load_all(registry))
+        memory = timed(lambda: load_all(registry))
+        warm = timed(lambda: load_all(SchemaRegistry(cache_dir, search_paths=[schemas])))
+
+    return {
+        'uncached': uncached,
+        'cold': cold,
+        'warm': warm,
+        'memory': memory
+    }
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--files', type=int, default=20)
+    parser.add_argument('--definitions', type=int, default=2000)
+    args = parser.parse_args()
+
+    results = run(args.files, args.definitions)
+    for name, seconds in results.items():
+        print('{:>9}: {:9.2f} ms ({:6.1f}x faster than uncached)'.format(
+            name, seconds * 1e3, results['uncached'] / seconds))
+
+
+if __name__ == '__main__':
+    main()
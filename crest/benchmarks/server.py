@@ -0,0 +1,477 @@
+import asyncio
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+
+def echo_payload(method, path, raw_body, default_items=None):
+    """ Build the JSON document the stand-in servers answer every request with. By
+        default it echoes the request; `?items=N` returns an array of N records instead,
+        wrapped in an object under the key given by `&envelope=key` if there is one.
+        With `default_items`, GET requests that don't ask for a number of items get
+        that many.
+    """
+
+    parts = urlsplit(path)
+    query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+    if default_items is not None and method == 'GET':
+        query.setdefault('items', default_items)
+
+    if 'items' in query:
+        records = [{'id': i, 'name': 'item {}'.format(i), 'value': i * 0.5, 'active': i % 2 == 0}
+                   for i in range(int(query['items']))]
+        if 'envelope' in query:
+            return json.dumps({'count': len(records), query['envelope']: records}).encode('utf-8')
+        return json.dumps(records).encode('utf-8')
+
+    try:
+        body = json.loads(raw_body) if raw_body else None
+    except ValueError:
+        body = raw_body.decode('utf-8', 'replace')
+
+    return json.dumps({
+        'method': method,
+        'path': parts.path,
+        'query': query,
+        'body': body
+    }).encode('utf-8')
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super(StandInHandler, self).setup()
+        self.server.register_connection()
+
+    def log_message(self, format, *args):
+        # keep benchmark and test output quiet
+        pass
+
+    def _body_chunks(self, size=64 * 1024):
+        """ The request body as it arrives, with or without chunked transfer encoding """
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while True:
+                length = int(self.rfile.readline().split(b';')[0], 16)
+                if not length:
+                    # the trailer section, if any, ends with an empty line
+                    while self.rfile.readline() not in (b'\r\n', b'\n', b''):
+                        pass
+                    return
+                while length:
+                    chunk = self.rfile.read(min(length, size))
+                    length -= len(chunk)
+                    yield chunk
+                self.rfile.readline()
+        else:
+            length = int(self.headers.get('Content-Length', 0))
+            while length:
+                chunk = self.rfile.read(min(length, size))
+                length -= len(chunk)
+                yield chunk
+
+    def _read_body(self):
+        return b''.join(self._body_chunks())
+
+    def _digest_body(self):
+        """ Hash the request body as it arrives, without keeping it """
+        digest = hashlib.sha256()
+        length = 0
+        for chunk in self._body_chunks():
+            digest.update(chunk)
+            length += len(chunk)
+        return json.dumps({'length': length, 'sha256': digest.hexdigest()}).encode('utf-8')
+
+    def _reject(self, retry_after, quota_headers):
+        payload = json.dumps({'error': 'rate limit exceeded'}).encode('utf-8')
+        self.send_response(429)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Retry-After', str(math.ceil(retry_after)))
+        for name, value in quota_headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _fail(self):
+        payload = json.dumps({'error': 'internal server error'}).encode('utf-8')
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.send_response(500)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _respond(self):
+        self.server.register_request()
+        if 'digest' in parse_qs(urlsplit(self.path).query, keep_blank_values=True):
+            # answers uploads too large to echo with their length and hash
+            digest = self._digest_body()
+            raw_body = None
+        else:
+            raw_body = self._read_body()
+
+        quota_headers = []
+        if self.server.quota is not None:
+            allowed, remaining, reset = self.server.take_quota()
+            quota_headers = [('X-RateLimit-Limit', str(self.server.quota)),
+                             ('X-RateLimit-Remaining', str(remaining)),
+                             ('X-RateLimit-Reset', '{:.3f}'.format(reset))]
+            if not allowed:
+                return self._reject(reset, quota_headers)
+
+        if self.server.fail():
+            return self._fail()
+
+        payload = digest if raw_body is None else echo_payload(self.command, self.path, raw_body,
+                                                                  self.server.payload_items)
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if self.command == 'GET':
+            # the echoed document only depends on the URL, so it can be revalidated
+            etag = '"{}"'.format(hashlib.md5(payload).hexdigest())
+            if (self.headers.get('If-None-Match') == etag or
+                    self.headers.get('If-Modified-Since') == self.server.last_modified):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        for name, value in quota_headers:
+            self.send_header(name, value)
+        if self.command == 'GET':
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', self.server.last_modified)
+        self.send_header('Content-Length', str(len(payload)))
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_PATCH = _respond
+
+
+class StandInServer(ThreadingHTTPServer):
+    """ A local HTTP/1.1 server that echoes requests back as JSON. It is used by the
+        test suite and the benchmarks so that neither needs to hit a live API.
+        `latency` is the number of seconds every response is held back for. GET
+        responses carry an `ETag` and a `Last-Modified` header and honor conditional
+        requests. Request bodies may use chunked transfer encoding, and a request with
+        `?digest` in its query gets the length and SHA-256 of its body instead of an echo.
+
+        With a `quota`, the server accepts that many requests per fixed window of
+        `quota_window` seconds, reports its state in `X-RateLimit-*` headers, and answers
+        the requests over the quota with a 429 and a `Retry-After` header.
+
+        `payload_items` makes GET requests return an array of that many records unless
+        they ask for a number with `?items=N`, and `error_rate` is the fraction of
+        requests, picked at random from a generator seeded with `seed`, answered with
+        a 500.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, handler=StandInHandler, quota=None,
+                 quota_window=1.0, payload_items=None, error_rate=0.0, seed=None):
+
+        super(StandInServer, self).__init__((host, port), handler)
+        self.latency = latency
+        self.payload_items = payload_items
+        self.error_rate = error_rate
+        self.errors = 0
+        self._random = random.Random(seed)
+        self.quota = quota
+        self.quota_window = quota_window
+        self.rejected = 0
+        self._window_end = 0.0
+        self._window_requests = 0
+        self.last_modified = formatdate(usegmt=True)
+        self.connections = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def register_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def register_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def fail(self):
+        """ Decide whether to answer the current request with an error """
+        if not self.error_rate:
+            return False
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+            return failed
+
+    def take_quota(self):
+        """ Count a request against the quota. Returns whether it is allowed, how many
+            requests are left in the window and the seconds until the window resets.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._window_end:
+                self._window_end = now + self.quota_window
+                self._window_requests = 0
+            self._window_requests += 1
+            allowed = self._window_requests <= self.quota
+            if not allowed:
+                self.rejected += 1
+            return allowed, max(self.quota - self._window_requests, 0), self._window_end - now
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+class AsyncStandInServer(object):
+    """ The asyncio flavor of `StandInServer`. It runs its own event loop in a background
+        thread, so it can serve both blocking and asyncio clients, and `latency` delays
+        responses without holding up other connections.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.connections = 0
+        self.requests = 0
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._writers = {}
+
+    @property
+    def url(self):
+        return 'http://{}:{}'.format(self.host, self.port)
+
+    async def _handle(self, reader, writer):
+
+        self.connections += 1
+        self._writers[asyncio.current_task()] = writer
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+                lines = head.decode('latin-1').split('\r\n')
+                method, path, _ = lines[0].split(' ', 2)
+                headers = {}
+                for line in lines[1:]:
+                    if line:
+                        name, value = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                raw_body = await reader.readexactly(length) if length else b''
+                self.requests += 1
+                payload = echo_payload(method, path, raw_body)
+
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+
+                close = headers.get('connection', '').lower() == 'close'
+                response = [
+                    'HTTP/1.1 200 OK',
+                    'Content-Type: application/json',
+                    'Content-Length: {}'.format(len(payload))
+                ]
+                if close:
+                    response.append('Connection: close')
+                writer.write(('\r\n'.join(response) + '\r\n\r\n').encode('latin-1') + payload)
+                await writer.drain()
+
+                if close:
+                    break
+        finally:
+            self._writers.pop(asyncio.current_task(), None)
+            writer.close()
+
+    async def _shutdown(self):
+
+        self._server.close()
+        tasks = list(self._writers)
+        for writer in list(self._writers.values()):
+            writer.close()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def start(self):
+
+        started = threading.Event()
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port))
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            self._loop.run_forever()
+            self._loop.close()
+
+        self._thread = threading.Thread(target=serve, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop(self):
+
+        if self._thread is not None:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+class HTTP2StandInServer(AsyncStandInServer):
+    """ A stand-in server that speaks cleartext HTTP/2 with prior knowledge (h2c), built
+        on the `h2` library, for clients that multiplex their requests. Every stream
+        is answered on its own, so `latency` holds up only the stream it delays, and
+        `max_streams` is the limit on concurrent streams advertised to clients.
+        `peak_streams` is the largest number of streams that were in flight at once.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, max_streams=100):
+
+        super(HTTP2StandInServer, self).__init__(host, port, latency)
+        self.max_streams = max_streams
+        self.peak_streams = 0
+        self._active = 0
+
+    async def _handle(self, reader, writer):
+
+        from h2.config import H2Configuration
+        from h2.connection import H2Connection
+        from h2.exceptions import ProtocolError
+        from h2.settings import SettingCodes
+        from h2 import events
+
+        self.connections += 1
+        self._writers[asyncio.current_task()] = writer
+        connection = H2Connection(config=H2Configuration(client_side=False, header_encoding='utf-8'))
+        connection.initiate_connection()
+        connection.update_settings({SettingCodes.MAX_CONCURRENT_STREAMS: self.max_streams})
+        writer.write(connection.data_to_send())
+
+        requests = {}
+        window_updated = asyncio.Event()
+        tasks = set()
+        try:
+            while True:
+                try:
+                    data = await reader.read(65536)
+                except ConnectionError:
+                    break
+                if not data:
+                    break
+                try:
+                    received = connection.receive_data(data)
+                except ProtocolError:
+                    break
+                for event in received:
+                    if isinstance(event, events.RequestReceived):
+                        requests[event.stream_id] = (dict(event.headers), bytearray())
+                    elif isinstance(event, events.DataReceived):
+                        requests[event.stream_id][1].extend(event.data)
+                        connection.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                    elif isinstance(event, events.StreamEnded):
+                        headers, body = requests.pop(event.stream_id)
+                        task = asyncio.ensure_future(self._respond(connection, writer, event.stream_id, headers,
+                                                                   bytes(body), window_updated))
+                        tasks.add(task)
+                        task.add_done_callback(tasks.discard)
+                    elif isinstance(event, events.StreamReset):
+                        requests.pop(event.stream_id, None)
+                    elif isinstance(event, events.WindowUpdated):
+                        window_updated.set()
+                    elif isinstance(event, events.ConnectionTerminated):
+                        return
+                writer.write(connection.data_to_send())
+                await writer.drain()
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._writers.pop(asyncio.current_task(), None)
+            writer.close()
+
+    async def _respond(self, connection, writer, stream_id, headers, raw_body, window_updated):
+
+        from h2.exceptions import ProtocolError, StreamClosedError
+
+        self.requests += 1
+        self._active += 1
+        self.peak_streams = max(self.peak_streams, self._active)
+        try:
+            payload = echo_payload(headers[':method'], headers[':path'], raw_body)
+            if self.latency:
+                await asyncio.sleep(self.latency)
+
+            connection.send_headers(stream_id, [
+                (':status', '200'),
+                ('content-type', 'application/json'),
+                ('content-length', str(len(payload)))
+            ])
+            while payload:
+                size = min(connection.local_flow_control_window(stream_id), connection.max_outbound_frame_size,
+                           len(payload))
+                if size <= 0:
+                    window_updated.clear()
+                    await window_updated.wait()
+                    continue
+                connection.send_data(stream_id, payload[:size])
+                payload = payload[size:]
+                writer.write(connection.data_to_send())
+                await writer.drain()
+            connection.end_stream(stream_id)
+            writer.write(connection.data_to_send())
+        except (ProtocolError, StreamClosedError, ConnectionError):
+            pass
+        finally:
+            self._active -= 1
@@ -0,0 +1,100 @@
+""" Measure how long it takes to import crest and define a large interface, the way a CLI
+    tool or a short-lived handler would on every start. A module declaring an interface
+    with many endpoints is generated and imported in a fresh interpreter under
+    `python -X importtime`. Run with `python -m crest.benchmarks.startup`.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+
+MODULE_NAME = 'crest_startup_interface'
+
+HEAVY_MODULES = ['marshmallow', 'requests', 'aiohttp', 'simplejson', 'jsonschema', 'asyncio']
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter() - start
+start = time.perf_counter()
+interface = {module}.LargeInterface(None)
+for name in dir({module}.LargeInterface):
+    if name.startswith('endpoint'):
+        getattr(interface, name)._GET
+first_access = time.perf_counter() - start
+print(json.dumps({{
+    'import_seconds': imported,
+    'first_access_seconds': first_access,
+    'loaded': [name for name in {heavy!r} if name in sys.modules]
+}}))
+'''
+
+
+def make_module(endpoints):
+    """ The source of a module declaring a `RESTInterface` with `endpoints` endpoints """
+
+    lines = [
+        'from crest.builder import RESTInterface, Get, GetPost',
+        'from crest.client import Client',
+        '',
+        '',
+        'class LargeInterface(RESTInterface):',
+        "    api_base = 'api/v1'",
+        ''
+    ]
+    for i in range(endpoints):
+        call = 'GetPost' if i % 2 else 'Get'
+        lines.append("    endpoint{0} = {1}('resource{0}/{{id}}/child/{{child_id}}')".format(i, call))
+    return '\n'.join(lines) + '\n'
+
+
+def parse_importtime(stderr):
+    """ The cumulative import time in microseconds of every module in `-X importtime` output """
+
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def run(endpoints=500):
+
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, MODULE_NAME + '.py'), 'w') as f:
+            f.write(make_module(endpoints))
+
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([directory, root, os.environ.get('PYTHONPATH', '')]))
+        probe = PROBE.format(module=MODULE_NAME, heavy=HEAVY_MODULES)
+        process = subprocess.run([sys.executable, '-X', 'importtime', '-c', probe], env=env,
+                                 capture_output=True, text=True, check=True)
+
+    times = parse_importtime(process.stderr)
+    result = json.loads(process.stdout)
+    result.update({
+        'endpoints': endpoints,
+        'crest.builder_microseconds': times.get('crest.builder'),
+        'crest.client_microseconds': times.get('crest.client'),
+        'interface_module_microseconds': times.get(MODULE_NAME)
+    })
+    return result
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--endpoints', type=int, default=500)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.endpoints), indent=2))
+
+
+if __name__ == '__main__':
+    main()
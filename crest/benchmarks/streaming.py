@@ -0,0 +1,62 @@
+""" Compare the peak memory of streaming the elements of a large JSON array with that of
+    decoding the whole document at once. Run with `python -m crest.benchmarks.streaming`.
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from crest.streaming import JSONArrayStream
+
+
+def make_chunks(count, chunk_size=64 * 1024):
+    """ The bytes of a JSON array of `count` records, produced lazily in chunks """
+
+    buffer, size = [b'['], 1
+    for i in range(count):
+        item = json.dumps({'id': i, 'name': 'item {}'.format(i), 'value': i * 0.5}).encode('utf-8')
+        buffer.append(item if i == 0 else b',' + item)
+        size += len(buffer[-1])
+        if size >= chunk_size:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    buffer.append(b']')
+    yield b''.join(buffer)
+
+
+def measure(func):
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'seconds': elapsed, 'peak_bytes': peak}
+
+
+def run(sizes=(10000, 100000, 1000000)):
+
+    results = {}
+    for size in sizes:
+        results[size] = {
+            'stream': measure(lambda: sum(1 for _ in JSONArrayStream(make_chunks(size)))),
+            'buffered': measure(lambda: len(json.loads(b''.join(make_chunks(size)))))
+        }
+    return results
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    for size, result in run(args.sizes).items():
+        for label in ['stream', 'buffered']:
+            print('{:>8} items {:>8}: {:7.3f}s, peak {:10.1f} KiB'.format(
+                size, label, result[label]['seconds'], result[label]['peak_bytes'] / 1024))
+
+
+if __name__ == '__main__':
+    main()
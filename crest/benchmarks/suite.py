@@ -0,0 +1,242 @@
+""" Run the hot-path benchmarks against a local stand-in server and print the results as
+    JSON, so that runs can be saved and compared. Run with
+    `python -m crest.benchmarks.suite [--output results.json] [--compare baseline.json]`.
+"""
+import argparse
+import json
+import math
+import platform
+import sys
+import threading
+import time
+
+from concurrent import futures
+from marshmallow import Schema, fields
+from crest.builder import RESTInterface, Get
+from crest.client import Client
+from crest.codec import get_codec
+from crest.schema import JSONSchema
+from crest.benchmarks.references import make_schema
+from crest.benchmarks.server import StandInServer, echo_payload
+
+
+class ItemSchema(Schema):
+
+    id = fields.Integer()
+    name = fields.String()
+    value = fields.Float()
+    active = fields.Boolean()
+
+
+ITEM_JSONSCHEMA = {
+    'type': 'object',
+    'properties': {
+        'id': {'type': 'integer'},
+        'name': {'type': 'string'},
+        'value': {'type': 'number'},
+        'active': {'type': 'boolean'}
+    },
+    'required': ['id', 'name']
+}
+
+
+class BenchInterface(RESTInterface):
+
+    api_base = 'api'
+
+    items = Get('items/{id}')
+
+
+def percentile(ordered, fraction):
+    """ The nearest-rank percentile of an already sorted list """
+    if not ordered:
+        return None
+    index = min(max(math.ceil(fraction * len(ordered)) - 1, 0), len(ordered) - 1)
+    return ordered[index]
+
+
+def best_of(func, rounds):
+    """ The shortest of `rounds` timings of `func()`, in seconds """
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_calls(calls=2000, concurrency=8, latency=0.0, payload_items=10, error_rate=0.0):
+    """ Throughput and latency percentiles of `RESTInterface` calls made from
+        `concurrency` threads
+    """
+
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    with StandInServer(latency=latency, payload_items=payload_items, error_rate=error_rate, seed=0) as server:
+        with Client(server.url, pool_maxsize=concurrency) as client:
+            interface = BenchInterface(client)
+
+            def call(i):
+                start = time.perf_counter()
+                result = interface.items.get(id=i)
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    if isinstance(result, dict) and 'code' in result:
+                        errors[0] += 1
+
+            start = time.perf_counter()
+            with futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+                list(executor.map(call, range(calls)))
+            elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'calls': calls,
+        'concurrency': concurrency,
+        'latency': latency,
+        'payload_items': payload_items,
+        'error_rate': error_rate,
+        'errors': errors[0],
+        'seconds': elapsed,
+        'calls_per_second': calls / elapsed,
+        'latency_ms': {
+            'p50': percentile(latencies, 0.5) * 1e3,
+            'p90': percentile(latencies, 0.9) * 1e3,
+            'p99': percentile(latencies, 0.99) * 1e3,
+            'max': latencies[-1] * 1e3
+        }
+    }
+
+
+def bench_decode(items=1000, codec=None, rounds=5):
+    """ The cost of decoding a response body with the client's JSON codec """
+
+    codec = get_codec(codec)
+    payload = echo_payload('GET', '/items?items={}'.format(items), b'')
+    elapsed = best_of(lambda: codec.loads(payload), rounds)
+    return {
+        'codec': codec.name,
+        'items': items,
+        'bytes': len(payload),
+        'milliseconds': elapsed * 1e3,
+        'megabytes_per_second': len(payload) / elapsed / 1e6
+    }
+
+
+def bench_load(items=1000, rounds=5):
+    """ The cost of loading a decoded response with a marshmallow `result_schema` """
+
+    data = json.loads(echo_payload('GET', '/items?items={}'.format(items), b''))
+    schema = ItemSchema(many=True)
+    elapsed = best_of(lambda: schema.load(data), rounds)
+    return {
+        'items': items,
+        'milliseconds': elapsed * 1e3,
+        'microseconds_per_item': elapsed / items * 1e6
+    }
+
+
+def bench_jsonschema(definitions=10000, objects=10000, rounds=3):
+    """ The cost of building a `JSONSchema` with many definitions, and of validating
+        many objects against a compiled one, in one batch and one at a time, compared
+        with `jsonschema.validate`, which compiles the schema on every call
+    """
+
+    import jsonschema
+
+    schema_dict = make_schema(definitions)
+    construction = best_of(lambda: JSONSchema(schema_dict), rounds)
+
+    data = json.loads(echo_payload('GET', '/items?items={}'.format(objects), b''))
+    schema = JSONSchema(ITEM_JSONSCHEMA)
+    schema.validator
+    validation = best_of(lambda: schema.validate_many(data), rounds)
+
+    # jsonschema.validate takes milliseconds per object, so only a sample is timed
+    sample = data[:100]
+    compiled = best_of(lambda: [schema.validate(obj) for obj in sample], rounds)
+    uncompiled = best_of(lambda: [jsonschema.validate(obj, ITEM_JSONSCHEMA) for obj in sample], rounds)
+
+    return {
+        'definitions': definitions,
+        'construction_milliseconds': construction * 1e3,
+        'objects': objects,
+        'validation_milliseconds': validation * 1e3,
+        'microseconds_per_object': validation / objects * 1e6,
+        'compiled_microseconds_per_object': compiled / len(sample) * 1e6,
+        'uncompiled_microseconds_per_object': uncompiled / len(sample) * 1e6
+    }
+
+
+def run(calls=2000, concurrency=8, latency=0.0, payload_items=10, error_rate=0.0, items=1000,
+        definitions=10000, objects=10000, codec=None):
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'timestamp': time.time()
+        },
+        'results': {
+            'calls': bench_calls(calls, concurrency, latency, payload_items, error_rate),
+            'decode': bench_decode(items, codec),
+            'load': bench_load(items),
+            'jsonschema': bench_jsonschema(definitions, objects)
+        }
+    }
+
+
+def compare(baseline, current, prefix=''):
+    """ Pair up the numbers of two sets of results, as {path: (baseline, current, ratio)} """
+
+    pairs = {}
+    for key, value in current.items():
+        path = prefix + str(key)
+        if key not in baseline:
+            continue
+        if isinstance(value, dict):
+            pairs.update(compare(baseline[key], value, path + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and baseline[key]:
+            pairs[path] = (baseline[key], value, value / baseline[key])
+    return pairs
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds the server holds every response')
+    parser.add_argument('--payload-items', type=int, default=10, help='records in every response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with a 500')
+    parser.add_argument('--items', type=int, default=1000, help='records decoded and loaded')
+    parser.add_argument('--definitions', type=int, default=10000)
+    parser.add_argument('--objects', type=int, default=10000, help='objects validated against a JSONSchema')
+    parser.add_argument('--codec', help='JSON codec to decode with: json, simplejson or orjson')
+    parser.add_argument('--output', help='write the results to this file instead of stdout')
+    parser.add_argument('--compare', help='results of an earlier run to compare against')
+    args = parser.parse_args()
+
+    results = run(args.calls, args.concurrency, args.latency, args.payload_items, args.error_rate,
+                  args.items, args.definitions, args.objects, args.codec)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for path, (before, after, ratio) in sorted(compare(baseline['results'], results['results']).items()):
+            print('{:<45} {:>14.4f} {:>14.4f} {:>8.2f}x'.format(path, before, after, ratio), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
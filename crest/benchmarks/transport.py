@@ -0,0 +1,68 @@
+""" Profile the client-side cost of a call, building the URL, decoding the body and
+    applying the result schema, in isolation from the network, by sending the calls
+    through an `InProcessTransport` that answers with a ready-made body, and compare it
+    with the same calls over HTTP to a local stand-in server. Run with
+    `python -m crest.benchmarks.transport`.
+"""
+import argparse
+import time
+
+from crest.builder import RESTInterface, Get
+from crest.client import Client
+from crest.schema import JSONSchema
+from crest.transport import InProcessTransport, Response
+from crest.benchmarks.records import ITEMS_SCHEMA
+from crest.benchmarks.server import StandInServer, echo_payload
+
+
+class ItemsREST(RESTInterface):
+
+    api_base = 'api'
+    items = Get('items/{group}')
+    checked_items = Get('items/{group}', result_schema=JSONSchema(ITEMS_SCHEMA))
+
+
+def per_call(func, calls):
+
+    start = time.perf_counter()
+    for i in range(calls):
+        func(i)
+    return (time.perf_counter() - start) / calls
+
+
+def run(calls=2000, items=100):
+
+    payload = echo_payload('GET', '/?items={}'.format(items), b'')
+
+    def handler(request):
+        return Response(200, payload, {'Content-Type': 'application/json'})
+
+    results = {}
+    with Client('http://api.example', transport=InProcessTransport(handler), coalesce=False) as client:
+        rest = ItemsREST(client)
+        results['in-process'] = per_call(lambda i: rest.items.get(group=i), calls)
+        results['in-process, schema'] = per_call(lambda i: rest.checked_items.get(group=i), calls)
+
+    with StandInServer() as server:
+        with Client(server.url, coalesce=False) as client:
+            rest = ItemsREST(client)
+            results['http'] = per_call(lambda i: rest.items.get(group=i, params={'items': items}), calls)
+            results['http, schema'] = per_call(lambda i: rest.checked_items.get(group=i, params={'items': items}),
+                                               calls)
+    return results
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--items', type=int, default=100)
+    args = parser.parse_args()
+
+    results = run(args.calls, args.items)
+    for name, seconds in results.items():
+        print('{:>18}: {:8.1f} us per call'.format(name, seconds * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+""" Compare the peak memory and the time of uploading a growing number of records
+    built as one list and encoded in memory, with streaming them from a generator as a
+    JSON array or as NDJSON, and with sending a file or a memory-mapped file that holds
+    them, to a local stand-in server that only hashes what it receives. Run with
+    `python -m crest.benchmarks.uploads`.
+"""
+import argparse
+import mmap
+import os
+import tempfile
+import time
+import tracemalloc
+
+from crest.client import Client
+from crest.uploads import NDJSONUpload
+from crest.benchmarks.server import StandInServer
+
+
+def make_records(count):
+    return ({'id': i, 'name': 'item {}'.format(i), 'value': i * 0.5, 'active': i % 2 == 0} for i in range(count))
+
+
+def measure(upload):
+    """ The seconds an upload takes, and the peak memory it allocates in bytes, from a
+        second, traced, run
+    """
+
+    start = time.perf_counter()
+    upload()
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        upload()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def run(sizes=(10000, 100000)):
+
+    results = {}
+    with StandInServer() as server, Client(server.url) as client, tempfile.TemporaryDirectory() as directory:
+
+        def post(body):
+            return client.invoke('items?digest', 'POST', body=body)
+
+        for count in sizes:
+            path = os.path.join(directory, 'records.json')
+            with open(path, 'wb') as f:
+                f.write(client.codec.dumps(list(make_records(count))))
+
+            def post_file():
+                with open(path, 'rb') as f:
+                    return post(f)
+
+            def post_mmap():
+                with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return post(mapped)
+
+            uploads = {
+                'in memory': lambda: post(list(make_records(count))),
+                'generator': lambda: post(make_records(count)),
+                'ndjson': lambda: post(NDJSONUpload(make_records(count))),
+                'file': post_file,
+                'mmap': post_mmap
+            }
+            results[count] = {'bytes': os.path.getsize(path)}
+            for label, upload in uploads.items():
+                results[count][label] = measure(upload)
+    return results
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000],
+                        help='numbers of records to upload')
+    args = parser.parse_args()
+
+    for count, result in run(args.sizes).items():
+        print('{} records, {:.1f} MB:'.format(count, result.pop('bytes') / 1e6))
+        for label, (seconds, peak) in result.items():
+            print('  {:>10}: {:8.1f} ms, peak {:8.2f} MB'.format(label, seconds * 1e3, peak / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+""" Compare building URLs from a compiled `EndpointTemplate` against formatting the raw
+    endpoint on every call, with and without encoding the parameters, for endpoints with
+    many path parameters. Run with `python -m crest.benchmarks.urls`.
+"""
+import argparse
+import time
+
+from urllib.parse import quote
+
+from crest.builder import EndpointTemplate, split_kwargs
+
+
+def make_endpoint(params):
+    return 'api/' + '/'.join('level{0}/{{p{0}}}'.format(i) for i in range(params))
+
+
+def run(params=(1, 4, 16), calls=100000):
+
+    results = {}
+    for count in params:
+        endpoint = make_endpoint(count)
+        kwargs = {'p{}'.format(i): 'value {}'.format(i) if i % 2 else i for i in range(count)}
+        host = 'http://localhost:8080'
+
+        start = time.perf_counter()
+        for _ in range(calls):
+            (host + '/' + endpoint).format(**kwargs)
+        legacy = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(calls):
+            (host + '/' + endpoint).format(**{k: quote(str(v), safe='') for k, v in kwargs.items()})
+        quoted = time.perf_counter() - start
+
+        template = EndpointTemplate(host + '/' + endpoint)
+        start = time.perf_counter()
+        for _ in range(calls):
+            call_kwargs = dict(kwargs, params=None)
+            template.expand(**split_kwargs(call_kwargs))
+        compiled = time.perf_counter() - start
+
+        results[count] = {
+            'legacy_us_per_call': legacy / calls * 1e6,
+            'quoted_us_per_call': quoted / calls * 1e6,
+            'compiled_us_per_call': compiled / calls * 1e6
+        }
+    return results
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--params', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--calls', type=int, default=100000)
+    args = parser.parse_args()
+
+    for count, result in run(args.params, args.calls).items():
+        print('{:>3} path params: format {:6.2f}us, format+quote {:6.2f}us, compiled {:6.2f}us per call'.format(
+            count, result['legacy_us_per_call'], result['quoted_us_per_call'], result['compiled_us_per_call']))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,152 @@
+import functools
 import re
 
-from marshmallow import Schema
-from typing import List
+from typing import List, TYPE_CHECKING
+from urllib.parse import quote
+
+from crest.results import check_result
+from crest.streaming import element_schema
+
+if TYPE_CHECKING:
+    from marshmallow import Schema
+
+
+PARAM_REGEX = re.compile(r'\{(.*?)\}')
+
+# keyword arguments of a call that go to the client rather than into the URL
+CALL_KWARGS = frozenset(['params', 'body'])
+
+
+def split_kwargs(kwargs, call_kwargs=CALL_KWARGS):
+    """ Separate the path parameters of a call from the arguments meant for the client """
+    path_kwargs = {}
+    for key in list(kwargs):
+        if key not in call_kwargs:
+            path_kwargs[key] = kwargs.pop(key)
+    return path_kwargs
+
+
+@functools.lru_cache(maxsize=1024)
+def quote_segment(value):
+    return quote(value, safe='')
+
+
+def encode_segment(value):
+    """ Percent-encode a path parameter, including any '/', so it stays a single segment """
+    if type(value) is int:
+        return str(value)
+    value = str(value)
+    if value.isascii() and value.isalnum():
+        return value
+    return quote_segment(value)
+
+
+class ExpandedPath(str):
+    """ An endpoint path whose parameters an `EndpointTemplate` has filled in and
+        encoded, which clients send as it is instead of parsing it again
+    """
+
+    __slots__ = ()
+
+
+class EndpointTemplate(object):
+    """ An endpoint path such as 'api/users/{id}/posts/{post_id}', parsed once into a
+        format string with positional fields, so that building a URL is a single
+        `str.format` call over the URL-encoded parameters
+    """
+
+    def __init__(self, template):
+
+        self.template = template
+        pieces = PARAM_REGEX.split(template)
+        literals = [piece.replace('{', '{{').replace('}', '}}') for piece in pieces[0::2]]
+        self.params = pieces[1::2]
+        self.param_set = frozenset(self.params)
+        self._format = ''.join('{}{{{}}}'.format(literal, index)
+                               for index, literal in enumerate(literals[:-1])) + literals[-1]
+
+    def check(self, kwargs):
+        """ Raise a `TypeError` unless `kwargs` holds exactly the template's parameters """
+        if self.param_set.symmetric_difference(kwargs):
+            missing = sorted(self.param_set.difference(kwargs))
+            unknown = sorted(set(kwargs).difference(self.param_set))
+            problems = []
+            if missing:
+                problems.append('missing path parameters {}'.format(missing))
+            if unknown:
+                problems.append('unknown path parameters {}'.format(unknown))
+            raise TypeError('{}: {}'.format(self.template, ', '.join(problems)))
+
+    def expand(self, **kwargs):
+        self.check(kwargs)
+        return ExpandedPath(self._format.format(*[encode_segment(kwargs[param]) for param in self.params]))
+
+    def __repr__(self):
+        return 'EndpointTemplate({!r})'.format(self.template)
+
+
+class BatchResult(object):
+    """ The outcome of a single call made by one of the `*_many` methods of a `RESTCall`.
+        `index` is the position of the call's kwargs in the input, and exactly one of
+        `result` and `error` is set.
+    """
+
+    def __init__(self, index, kwargs, result=None, error=None):
+
+        self.index = index
+        self.kwargs = kwargs
+        self.result = result
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        if self.ok:
+            return 'BatchResult(index={}, result={!r})'.format(self.index, self.result)
+        return 'BatchResult(index={}, error={!r})'.format(self.index, self.error)
 
 
 class RESTCall(object):
 
-    def __init__(self, methods: List[str], endpoint: str, result_schema: Schema=None,
-                 request_schema: Schema=None, api_base: str=''):
+    def __init__(self, methods: List[str], endpoint: str, result_schema: 'Schema'=None,
+                 request_schema: 'Schema'=None, api_base: str='', cache_ttl: float=None,
+                 pagination=None, weight: float=1, validation=None, result: str=None):
 
         self.methods = methods
         self.api_base = api_base
         self.endpoint = endpoint
         self.result_schema = result_schema
         self.request_schema = request_schema
+        # seconds a cached GET result stays fresh, if the client has a cache;
+        # None falls back to the cache's default
+        self.cache_ttl = cache_ttl
+        # a crest.pagination.Pagination strategy for list endpoints
+        self.pagination = pagination
+        # how many rate limit tokens a call takes, for endpoints that cost the server more
+        self.weight = weight
+        # how the result schema is applied to responses: a crest.validation.Validation,
+        # or its name; None leaves it to the client
+        self.validation = validation
+        # the form successful responses are returned in, one of crest.results.RESULTS;
+        # None returns the decoded JSON
+        self.result = check_result(result)
+        # the compiled EndpointTemplate, set up by RESTBuilder
+        self.template = None
+
+    def __getattr__(self, name):
+        # only called for attributes that aren't set: make the function behind a verb
+        # the first time it's needed, and keep it on the instance
+        builder = self.__dict__.get('_builder')
+        if builder is not None and name[1:2].isupper() and name.startswith('_'):
+            mcs, global_api_base = builder
+            func = mcs.make_function(global_api_base, self, name)
+            if func is not None:
+                bound = func.__get__(self)
+                setattr(self, name, bound)
+                return bound
+        raise AttributeError('{!r} object has no attribute {!r}'.format(type(self).__name__, name))
 
     @property
     def parent(self):
@@ -76,49 +209,189 @@ class RESTCall(object):
         else:
             raise NotImplementedError('HEAD not implemented.')
 
+    def aget(self, **kwargs):
+        if hasattr(self, '_ASYNC_GET'):
+            return self._ASYNC_GET(**kwargs)
+        else:
+            raise NotImplementedError('GET not implemented.')
+
+    def aput(self, **kwargs):
+        if hasattr(self, '_ASYNC_PUT'):
+            return self._ASYNC_PUT(**kwargs)
+        else:
+            raise NotImplementedError('PUT not implemented.')
+
+    def apost(self, **kwargs):
+        if hasattr(self, '_ASYNC_POST'):
+            return self._ASYNC_POST(**kwargs)
+        else:
+            raise NotImplementedError('POST not implemented.')
+
+    def adelete(self, **kwargs):
+        if hasattr(self, '_ASYNC_DELETE'):
+            return self._ASYNC_DELETE(**kwargs)
+        else:
+            raise NotImplementedError('DELETE not implemented.')
+
+    def apatch(self, **kwargs):
+        if hasattr(self, '_ASYNC_PATCH'):
+            return self._ASYNC_PATCH(**kwargs)
+        else:
+            raise NotImplementedError('PATCH not implemented.')
+
+    def aconnect(self, **kwargs):
+        if hasattr(self, '_ASYNC_CONNECT'):
+            return self._ASYNC_CONNECT(**kwargs)
+        else:
+            raise NotImplementedError('CONNECT not implemented.')
+
+    def aoptions(self, **kwargs):
+        if hasattr(self, '_ASYNC_OPTIONS'):
+            return self._ASYNC_OPTIONS(**kwargs)
+        else:
+            raise NotImplementedError('OPTIONS not implemented.')
+
+    def atrace(self, **kwargs):
+        if hasattr(self, '_ASYNC_TRACE'):
+            return self._ASYNC_TRACE(**kwargs)
+        else:
+            raise NotImplementedError('TRACE not implemented.')
+
+    def ahead(self, **kwargs):
+        if hasattr(self, '_ASYNC_HEAD'):
+            return self._ASYNC_HEAD(**kwargs)
+        else:
+            raise NotImplementedError('HEAD not implemented.')
+
+    def stream(self, path=None, validate=False, **kwargs):
+        """ Iterate over the elements of the JSON array returned by the endpoint, or of
+            the array at `path`, without holding the whole response in memory. With
+            `validate=True` every element is loaded with the part of `result_schema` that
+            describes the array's elements.
+        """
+        if hasattr(self, '_STREAM'):
+            return self._STREAM(path=path, validate=validate, **kwargs)
+        else:
+            raise NotImplementedError('Streaming not implemented.')
+
+    def paginate(self, max_items=None, max_pages=None, prefetch=True, **kwargs):
+        """ Lazily iterate over the items of all the pages of the endpoint, following its
+            `pagination` strategy. The next page is fetched in the background while the
+            current one is being consumed; `max_items` and `max_pages` cap the scan.
+        """
+        if self.pagination is None:
+            raise ValueError('No pagination strategy is set for {}.'.format(self.endpoint))
+        if hasattr(self, '_PAGINATE'):
+            return self._PAGINATE(max_items=max_items, max_pages=max_pages, prefetch=prefetch, **kwargs)
+        else:
+            raise NotImplementedError('Pagination not implemented.')
+
+    def call_many(self, method, calls, max_workers=8, as_completed=False):
+        """ Make one call of `method` for every kwargs dict in `calls`, with at most
+            `max_workers` of them in flight at once. A failing call does not abort the
+            batch; its exception is stored on its `BatchResult`. By default the results
+            are returned as a list in input order; with `as_completed=True` they are
+            yielded as soon as they finish instead.
+
+            Calls share the client's connection pool, so `max_workers` should not
+            exceed its `pool_maxsize`.
+        """
+
+        func = getattr(self, '_{}'.format(method.upper()), None)
+        if func is None:
+            raise NotImplementedError('{} not implemented.'.format(method.upper()))
+
+        results = self._iter_many(func, calls, max_workers)
+        if as_completed:
+            return results
+        return sorted(results, key=lambda batch_result: batch_result.index)
+
+    def get_many(self, calls, max_workers=8, as_completed=False):
+        return self.call_many('GET', calls, max_workers=max_workers, as_completed=as_completed)
+
+    def post_many(self, calls, max_workers=8, as_completed=False):
+        return self.call_many('POST', calls, max_workers=max_workers, as_completed=as_completed)
+
+    def put_many(self, calls, max_workers=8, as_completed=False):
+        return self.call_many('PUT', calls, max_workers=max_workers, as_completed=as_completed)
+
+    def delete_many(self, calls, max_workers=8, as_completed=False):
+        return self.call_many('DELETE', calls, max_workers=max_workers, as_completed=as_completed)
+
+    @staticmethod
+    def _iter_many(func, calls, max_workers):
+
+        from concurrent import futures
+
+        def run(index, kwargs):
+            try:
+                return BatchResult(index, kwargs, result=func(**kwargs))
+            except Exception as ex:
+                return BatchResult(index, kwargs, error=ex)
+
+        with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # only keep a bounded window of calls submitted, so that a huge
+            # iterable of kwargs is never materialized all at once
+            pending = set()
+            for index, kwargs in enumerate(calls):
+                if len(pending) >= 2 * max_workers:
+                    done, pending = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                pending.add(executor.submit(run, index, kwargs))
+
+            for future in futures.as_completed(pending):
+                yield future.result()
+
+
 class Get(RESTCall):
 
-    def __init__(self, endpoint, result_schema=None, request_schema=None, api_base=''):
+    def __init__(self, endpoint, result_schema=None, request_schema=None, api_base='', **kwargs):
         super(Get, self).__init__(['GET'], endpoint,
                                   result_schema=result_schema,
                                   request_schema=request_schema,
-                                  api_base=api_base)
+                                  api_base=api_base,
+                                  **kwargs)
 
 
 class Post(RESTCall):
 
-    def __init__(self, endpoint, result_schema=None, request_schema=None, api_base=''):
+    def __init__(self, endpoint, result_schema=None, request_schema=None, api_base='', **kwargs):
         super(Post, self).__init__(['POST'], endpoint,
                                    result_schema=result_schema,
                                    request_schema=request_schema,
-                                   api_base=api_base)
+                                   api_base=api_base,
+                                   **kwargs)
 
 
 class Put(RESTCall):
 
-    def __init__(self, endpoint, result_schema=None, request_schema=None, api_base=''):
+    def __init__(self, endpoint, result_schema=None, request_schema=None, api_base='', **kwargs):
         super(Put, self).__init__(['PUT'], endpoint,
                                   result_schema=result_schema,
                                   request_schema=request_schema,
-                                  api_base=api_base)
+                                  api_base=api_base,
+                                  **kwargs)
 
 
 class Delete(RESTCall):
 
-    def __init__(self, endpoint, result_schema=None, request_schema=None, api_base=''):
+    def __init__(self, endpoint, result_schema=None, request_schema=None, api_base='', **kwargs):
         super(Delete, self).__init__(['DELETE'], endpoint,
                                      result_schema=result_schema,
                                      request_schema=request_schema,
-                                     api_base=api_base)
+                                     api_base=api_base,
+                                     **kwargs)
 
 
 class GetPost(RESTCall):
 
-    def __init__(self, endpoint, result_schema=None, request_schema=None, api_base=''):
+    def __init__(self, endpoint, result_schema=None, request_schema=None, api_base='', **kwargs):
         super(GetPost, self).__init__(['GET', 'POST'], endpoint,
                                       result_schema=result_schema,
                                       request_schema=request_schema,
-                                      api_base=api_base)
+                                      api_base=api_base,
+                                      **kwargs)
 
 
 class RESTBuilder(type):
@@ -129,40 +402,138 @@ class RESTBuilder(type):
 
         global_api_base = namespace.get('api_base', None)
 
+        # the functions behind the verbs are only made when they're first used, by
+        # RESTCall.__getattr__, so that interfaces with many endpoints load quickly
         for key, value in namespace.items():
             if isinstance(value, RESTCall):
-                for method in value.methods:
-                    api_func = mcs.make_method_function(global_api_base, value, method)
-                    setattr(value, '_{}'.format(method.upper()), api_func.__get__(value))
+                mcs.endpoint_template(global_api_base, value)
+                value._builder = (mcs, global_api_base)
 
         return rest_class
 
+    @classmethod
+    def make_function(mcs, global_api_base, obj, name):
+        """ Make the function behind one of the private attributes of a `RESTCall`:
+            `_GET` and the like for its methods, `_ASYNC_GET` and the like for their
+            awaitable versions, `_STREAM` and `_PAGINATE`. Returns None if the endpoint
+            has no such attribute.
+        """
+
+        if name == '_STREAM':
+            return mcs.make_stream_function(global_api_base, obj)
+        if name == '_PAGINATE':
+            return mcs.make_paginate_function(global_api_base, obj)
+
+        is_async = name.startswith('_ASYNC_')
+        verb = name[len('_ASYNC_'):] if is_async else name[1:]
+        for method in obj.methods:
+            if method.upper() == verb:
+                if is_async:
+                    return mcs.make_async_method_function(global_api_base, obj, method)
+                return mcs.make_method_function(global_api_base, obj, method)
+        return None
+
     @classmethod
     def make_method_function(mcs, global_api_base, obj, method):
 
+        template = mcs.endpoint_template(global_api_base, obj)
+
         def api_func(api_call_obj, **kwargs):
-            if api_call_obj.api_base == '' and global_api_base:
-                api_base = global_api_base
-            elif api_call_obj.api_base != '':
-                api_base = api_call_obj.api_base
-            else:
-                api_base = ''
-            url = '{}/{}'.format(api_base, obj.endpoint)
-            return api_call_obj.parent.client.invoke(url, method, result_schema=api_call_obj.result_schema, **kwargs)
+            client = api_call_obj.parent.client
+            timing = client.metrics.timing(template.template, method) if client.metrics is not None else None
+            url = template.expand(**split_kwargs(kwargs))
+            return client.invoke(url, method, result_schema=api_call_obj.result_schema,
+                                 cache_ttl=api_call_obj.cache_ttl, weight=api_call_obj.weight,
+                                 timing=timing, validation=api_call_obj.validation, result=api_call_obj.result,
+                                 **kwargs)
+
+        return api_func
+
+    @classmethod
+    def make_async_method_function(mcs, global_api_base, obj, method):
+        """ Like `make_method_function`, but the function returns a coroutine that
+            awaits the `invoke` of an `AsyncClient`
+        """
+
+        import asyncio
+
+        template = mcs.endpoint_template(global_api_base, obj)
+
+        async def api_func(api_call_obj, **kwargs):
+            url = template.expand(**split_kwargs(kwargs))
+            client = api_call_obj.parent.client
+            if not asyncio.iscoroutinefunction(client.invoke):
+                raise TypeError('{} does not support awaitable calls; use an AsyncClient'.format(
+                    type(client).__name__))
+            return await client.invoke(url, method, result_schema=api_call_obj.result_schema,
+                                       cache_ttl=api_call_obj.cache_ttl, validation=api_call_obj.validation,
+                                       result=api_call_obj.result, **kwargs)
 
         return api_func
 
+    @classmethod
+    def make_stream_function(mcs, global_api_base, obj):
+        """ Make the function behind `RESTCall.stream`, which streams the endpoint's GET,
+            or its first method if it has no GET
+        """
+
+        method = 'GET' if 'GET' in obj.methods else obj.methods[0]
+        template = mcs.endpoint_template(global_api_base, obj)
+
+        def stream_func(api_call_obj, path=None, validate=False, **kwargs):
+            url = template.expand(**split_kwargs(kwargs, CALL_KWARGS.union(['chunk_size'])))
+            item_schema = None
+            if validate and api_call_obj.result_schema is not None:
+                item_schema = element_schema(api_call_obj.result_schema, path)
+            return api_call_obj.parent.client.stream(url, method, path=path, item_schema=item_schema,
+                                                     weight=api_call_obj.weight, **kwargs)
+
+        return stream_func
+
+    @classmethod
+    def make_paginate_function(mcs, global_api_base, obj):
+        """ Make the function behind `RESTCall.paginate`, which pages through the
+            endpoint's GET, or its first method if it has no GET
+        """
+
+        method = 'GET' if 'GET' in obj.methods else obj.methods[0]
+        template = mcs.endpoint_template(global_api_base, obj)
+
+        def paginate_func(api_call_obj, **kwargs):
+            url = template.expand(**split_kwargs(kwargs, CALL_KWARGS.union(['max_items', 'max_pages', 'prefetch'])))
+            return api_call_obj.parent.client.paginate(url, method, api_call_obj.pagination,
+                                                       result_schema=api_call_obj.result_schema,
+                                                       cache_ttl=api_call_obj.cache_ttl, weight=api_call_obj.weight,
+                                                       label=template.template, **kwargs)
+
+        return paginate_func
+
+    @classmethod
+    def make_url(mcs, global_api_base, api_call_obj, endpoint):
+
+        if api_call_obj.api_base == '' and global_api_base:
+            api_base = global_api_base
+        elif api_call_obj.api_base != '':
+            api_base = api_call_obj.api_base
+        else:
+            api_base = ''
+        return '{}/{}'.format(api_base, endpoint)
+
+    @classmethod
+    def endpoint_template(mcs, global_api_base, obj):
+        """ The compiled template of the endpoint's full path, shared by all the
+            functions generated for it
+        """
+        url = mcs.make_url(global_api_base, obj, obj.endpoint)
+        template = obj.template
+        if template is None or template.template != url:
+            template = obj.template = EndpointTemplate(url)
+        return template
 
     @classmethod
     def parse_endpoint(mcs, endpoint: str):
         """ Parameters to the endpoint e.g. /users/{id} must be in curly braces"""
-        param_regex = re.compile(r'\{(.*?)\}')
-        params = param_regex.search(endpoint)
-        if params:
-            expected_kwargs = param_regex.findall(endpoint)
-        else:
-            expected_kwargs = []
-        return expected_kwargs
+        return PARAM_REGEX.findall(endpoint)
 
 
 class RESTInterface(metaclass=RESTBuilder):
@@ -0,0 +1,119 @@
+import threading
+import time
+
+from collections import OrderedDict
+
+
+class CacheEntry(object):
+    """ A decoded response held by a `ResponseCache`, together with the validators the
+        server sent for it. `size` is the length of the raw body, which is what counts
+        against the cache's byte budget, and `headers` are the headers of the response.
+    """
+
+    def __init__(self, value, size, etag=None, last_modified=None, ttl=0, headers=None):
+
+        self.value = value
+        self.size = size
+        self.headers = headers if headers is not None else {}
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires = 0
+        self.refresh(ttl)
+
+    def refresh(self, ttl):
+        self.expires = time.monotonic() + ttl
+
+    @property
+    def fresh(self):
+        return time.monotonic() < self.expires
+
+    @property
+    def validators(self):
+        """ The conditional request headers that revalidate this entry """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache(object):
+    """ An in-memory LRU cache of decoded GET responses, bounded by the total size of the
+        response bodies it holds. Entries are served without a request for as long as
+        their TTL lasts; after that they are revalidated with `If-None-Match` or
+        `If-Modified-Since`, and a 304 hands back the cached object without decoding it
+        again.
+
+        `default_ttl` applies to endpoints that don't declare their own `cache_ttl`. With
+        a TTL of 0 entries are revalidated on every call, and responses without an `ETag`
+        or `Last-Modified` header are not cached at all.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, default_ttl=0):
+
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(method, url, params, auth_identity):
+        if isinstance(params, dict):
+            params = tuple(sorted((k, str(v)) for k, v in params.items()))
+        elif params is not None:
+            params = repr(params)
+        return method, url, params, auth_identity
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        if entry.size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old.size
+            self._entries[key] = entry
+            self.size += entry.size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.size
+                self.evictions += 1
+
+    def record(self, counter):
+        """ Bump one of the `hits`, `misses` or `revalidations` counters """
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidations': self.revalidations,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self.size
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
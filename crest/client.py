@@ -1,10 +1,46 @@
-import simplejson
-import requests
+import functools
 
+from json import JSONDecodeError
+from types import MappingProxyType
+from crest.builder import EndpointTemplate, ExpandedPath
+from crest.cache import CacheEntry, ResponseCache
+from crest.codec import get_codec
+from crest.coalesce import SingleFlight, AsyncSingleFlight
+from crest.pagination import paginate
+from crest.streaming import JSONArrayStream
+from crest.transport import HTTPTransport, HTTP2Transport
+from crest.uploads import encode_body, is_streamed, async_body
+from crest.results import check_result, make_result
+from crest.validation import get_validation
 
-class Client(object):
+# requests, aiohttp and the codec backends are imported when a client first needs them,
+# so that importing crest stays cheap for short-lived processes
 
-    def __init__(self, host, port=80, user=None, password=None, token=None):
+
+@functools.lru_cache(maxsize=1024)
+def compile_endpoint(endpoint):
+    """ The `EndpointTemplate` of an endpoint passed to a client as a string, such as
+        'users/{id}', compiled the first time it's used
+    """
+    return EndpointTemplate(endpoint)
+
+
+class BaseClient(object):
+    """ State shared by the blocking and the asyncio clients: the host, the credentials,
+        the optional `ResponseCache`, the JSON codec and the handling of decoded
+        responses. `codec` is the name of a `crest.codec` JSON backend ('json',
+        'simplejson' or 'orjson') or a `crest.codec.JSONCodec`; simplejson by default.
+        `validation` is the `crest.validation.Validation` strategy, or its name ('eager',
+        'lazy' or 'sampled'), that applies result schemas to responses unless a call
+        asks for another one; eager by default.
+
+        `headers` are sent with every request. They are held in a read-only mapping,
+        and every request assembles its own headers from them, so a client can be
+        shared between threads; to change them, assign a new dict to `headers`.
+    """
+
+    def __init__(self, host, port=80, user=None, password=None, token=None, cache=None, codec=None,
+                 headers=None, validation=None):
 
         self.host = host
         self.port = port
@@ -17,82 +53,483 @@ class Client(object):
         self.password = password
         self.token = token
 
-        self.headers = {}
+        self.headers = headers or {}
 
         self.auth = None
 
         if user and password:
             self.auth = (user, password)
 
-    def invoke(self, endpoint, method, result_schema=None, request_schema=None, **kwargs):
+        self.cache = cache
+        self.codec = get_codec(codec)
+        self.validation = get_validation(validation)
+        self.singleflight = None
+        self.metrics = None
 
-        params = kwargs.pop('params', None)
-        body = kwargs.pop('body', None)
+    @property
+    def headers(self):
+        return self._headers
 
-        url = (self.url + '/' + endpoint).format(**kwargs)
-        if method == 'GET':
-            if self.token:
-                self.headers['Authorization'] = self.token
-                result = requests.get(url, params=params, headers=self.headers)
-            elif self.auth:
-                result = requests.get(url, auth=self.auth, params=params, headers=self.headers)
-            else:
-                result = requests.get(url, params=params, headers=self.headers)
-
-        elif method == 'POST':
-            if request_schema is not None:
-                request_schema.load(params)
-            self.headers['Content-Type'] = 'application/json'
-            if self.token:
-                self.headers['Authorization'] = self.token
-                result = requests.post(url, json=body, headers=self.headers)
-            elif self.auth:
-                result = requests.post(url, auth=self.auth, json=body, headers=self.headers)
-            else:
-                result = requests.post(url, json=body, headers=self.headers)
-
-        elif method == 'PUT':
-            if request_schema is not None:
-                request_schema.load(params)
-            self.headers['Content-Type'] = 'application/json'
-            if self.token:
-                self.headers['Authorization'] = self.token
-                result = requests.put(url, json=body, headers=self.headers)
-            elif self.auth:
-                result = requests.put(url, auth=self.auth, json=body, headers=self.headers)
-            else:
-                result = requests.put(url, json=body, headers=self.headers)
-
-        elif method == 'DELETE':
-            self.headers['Content-Type'] = 'application/json'
-            if self.token:
-                self.headers['Authorization'] = self.token
-                result = requests.delete(url, params=params, headers=self.headers)
-            elif self.auth:
-                result = requests.delete(url, auth=self.auth, params=params, headers=self.headers)
-            else:
-                result = requests.delete(url, params=params, headers=self.headers)
+    @headers.setter
+    def headers(self, headers):
+        self._headers = MappingProxyType(dict(headers))
 
-        else:
-            raise NotImplementedError('{} is not implemented'.format(method))
+    def _endpoint_url(self, endpoint, kwargs):
+        """ The URL of `endpoint` with its path parameters filled in from `kwargs` and
+            encoded as the interfaces encode them; a missing or unknown one raises a
+            `TypeError` before anything is sent
+        """
+        if not kwargs and '{' not in endpoint:
+            return self.url + '/' + endpoint
+        return self.url + '/' + compile_endpoint(endpoint).expand(**kwargs)
+
+    def _request_headers(self, method, entry=None, content_type=None):
+        """ A new dict with the headers of one request: the client's defaults, the
+            token, the content type of the body, JSON unless given, and the validators
+            of a cached entry
+        """
+        headers = dict(self._headers)
+        if self.token:
+            headers['Authorization'] = self.token
+        if method != 'GET':
+            headers['Content-Type'] = content_type or 'application/json'
+        if entry is not None:
+            headers.update(entry.validators)
+        return headers
+
+    def _coalesce_key(self, method, url, params, result_schema, validation=None, result=None):
+        """ The key under which identical concurrent calls are coalesced, or None if the
+            call mustn't be shared with others
+        """
+        if self.singleflight is None or method != 'GET':
+            return None
+        # the result is loaded once for every waiter, so they have to share the schema,
+        # the way it is applied and the form the result is returned in
+        return (ResponseCache.make_key(method, url, params, self.token or self.user), id(result_schema),
+                id(validation), result)
+
+    def _cache_lookup(self, method, url, params, result_schema=None, validation=None, result=None):
+        """ Returns the cache key of a request, or None if it can't be cached, and the
+            entry currently cached under that key
+        """
+        if self.cache is None or method != 'GET':
+            return None, None
+        # what is cached is the loaded result, so the same response loaded with another
+        # schema, applied another way or returned in another form is cached separately
+        key = self.cache.make_key(method, url, params, self.token or self.user) + (
+            id(result_schema), id(validation or self.validation), result or 'json')
+        return key, self.cache.get(key)
+
+    def _cache_revalidated(self, entry, cache_ttl):
+        self.cache.record('revalidations')
+        entry.refresh(cache_ttl if cache_ttl is not None else self.cache.default_ttl)
+        return entry.value
+
+    def _cache_store(self, cache_key, headers, content, value, cache_ttl):
+
+        ttl = cache_ttl if cache_ttl is not None else self.cache.default_ttl
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if ttl > 0 or etag or last_modified:
+            self.cache.put(cache_key, CacheEntry(value, len(content), etag=etag, last_modified=last_modified,
+                                                 ttl=ttl, headers=headers))
+
+    def _handle_response(self, status_code, reason, content, result_schema,
+                         headers=None, cache_key=None, cache_ttl=None, timing=None, validation=None,
+                         result=None):
 
         try:
-            result_json = result.json()
-        except simplejson.JSONDecodeError as ex:
+            result_json = self.codec.loads(content)
+            if timing is not None:
+                timing.mark('decode')
+        except JSONDecodeError as ex:
             return {
-                'code': result.status_code,
-                'content': result.content,
-                'message': result.reason,
+                'code': status_code,
+                'content': content,
+                'message': reason,
                 'error': ex.msg
             }
 
-        if result.status_code in [200, 201, 202] and result_schema:
-            return result_schema.load(result_json)
-        elif result.status_code in [200, 201, 202] and not result_schema:
-            return result_json
+        if status_code in [200, 201, 202]:
+            value = result_json
+            if result_schema:
+                value = (validation or self.validation).apply(result_schema, result_json)
+            value = make_result(result, result_schema, value)
+            if timing is not None and result_schema:
+                timing.mark('load')
+            if cache_key is not None and status_code == 200:
+                self._cache_store(cache_key, headers, content, value, cache_ttl)
+            return value
         else:
             return {
-                'code': result.status_code,
+                'code': status_code,
                 'response': result_json,
-                'message': result.reason
-            }
\ No newline at end of file
+                'message': reason
+            }
+
+
+class Client(BaseClient):
+    """ Holds the connection state for a REST API. Every request made through a client
+        goes over a single pooled `requests.Session`, so connections to the host are kept
+        alive and reused across all the endpoints of every interface bound to it.
+
+        `pool_connections` is the number of per-host pools to cache, `pool_maxsize` the
+        maximum number of connections kept open to a single host, and `pool_block`
+        whether to wait for a free connection instead of opening an extra one. Passing
+        `keep_alive=False` asks the server to close the connection after each request.
+
+        Passing a `crest.cache.ResponseCache` as `cache` caches the decoded results of
+        GET requests, keyed on the URL, the params and the credentials.
+
+        With `coalesce`, concurrent identical GET requests from different threads share a
+        single round trip and a single decode, and all of them get the same result; the
+        `crest.coalesce.SingleFlight` in `singleflight` counts the calls it coalesced.
+
+        A `crest.ratelimit.RateLimiter` passed as `rate_limiter` paces the requests to
+        each host, queueing calls while the host is saturated and retrying the ones it
+        throttles.
+
+        A `crest.metrics.Metrics` passed as `metrics` records how long each call spends
+        building its URL, connecting, waiting for and reading the response, decoding it
+        and loading it with the result schema, along with response sizes and statuses.
+
+        A `crest.transport.Transport` passed as `transport` replaces the pooled HTTP
+        session, e.g. to call a WSGI app in the same process or to replay recorded
+        exchanges; the pool options only apply to the default `HTTPTransport`. With
+        `http2`, the client speaks HTTP/2 through a `crest.transport.HTTP2Transport`,
+        which multiplexes the calls of all its threads over one connection per host.
+
+        A client is safe to share between threads: it never modifies its own state while
+        making a request, and the session, cache, rate limiter and metrics it uses lock
+        what they share. One client per host, sized with `pool_maxsize` to the number
+        of threads, keeps the number of connections down.
+    """
+
+    def __init__(self, host, port=80, user=None, password=None, token=None, cache=None,
+                 pool_connections=10, pool_maxsize=10, pool_block=False, keep_alive=True,
+                 coalesce=False, rate_limiter=None, metrics=None, codec=None, headers=None, validation=None,
+                 transport=None, http2=False):
+
+        super(Client, self).__init__(host, port=port, user=user, password=password, token=token,
+                                     cache=cache, codec=codec, headers=headers, validation=validation)
+
+        if coalesce:
+            self.singleflight = SingleFlight()
+        self.rate_limiter = rate_limiter
+        self.metrics = metrics
+        self.keep_alive = keep_alive
+        if transport is None and http2:
+            transport = HTTP2Transport(keep_alive=keep_alive, metrics=metrics)
+        elif transport is None:
+            transport = HTTPTransport(pool_connections, pool_maxsize, pool_block, keep_alive=keep_alive,
+                                      metrics=metrics)
+        self.transport = transport
+
+    @property
+    def session(self):
+        """ The `requests.Session` of the default HTTP transport, or None """
+        return getattr(self.transport, 'session', None)
+
+    def close(self):
+        """ Close every pooled connection held by this client """
+        self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def invoke(self, endpoint, method, result_schema=None, request_schema=None, cache_ttl=None, weight=1,
+               timing=None, validation=None, result=None, **kwargs):
+
+        if timing is None and self.metrics is not None:
+            timing = self.metrics.timing(endpoint, method)
+
+        params = kwargs.pop('params', None)
+        body = kwargs.pop('body', None)
+
+        # the interfaces pass their paths already expanded
+        if type(endpoint) is ExpandedPath:
+            url = self.url + '/' + endpoint
+        else:
+            url = self._endpoint_url(endpoint, kwargs)
+        if timing is not None:
+            timing.mark('url')
+
+        value, _, _ = self.fetch(url, method, params=params, body=body, result_schema=result_schema,
+                                 request_schema=request_schema, cache_ttl=cache_ttl, weight=weight, timing=timing,
+                                 validation=validation, result=result)
+        return value
+
+    def fetch(self, url, method, params=None, body=None, result_schema=None, request_schema=None, cache_ttl=None,
+              weight=1, timing=None, validation=None, result=None):
+        """ Make a request to a fully formatted URL and return the handled response
+            together with its status code and headers. `timing` is the
+            `crest.metrics.CallTiming` the call is recorded with, if any,
+            `validation` overrides the client's validation strategy for this call, and
+            `result` is the form a successful response is returned in, one of
+            `crest.results.RESULTS`.
+        """
+
+        validation = get_validation(validation) if validation is not None else self.validation
+        result = check_result(result)
+        coalesce_key = self._coalesce_key(method, url, params, result_schema, validation, result)
+        if coalesce_key is not None:
+            return self.singleflight.do(coalesce_key, self._fetch, url, method, params, body,
+                                        result_schema, request_schema, cache_ttl, weight, timing, validation,
+                                        result)
+        return self._fetch(url, method, params, body, result_schema, request_schema, cache_ttl, weight, timing,
+                           validation, result)
+
+    def _fetch(self, url, method, params, body, result_schema, request_schema, cache_ttl, weight, timing,
+               validation=None, result=None):
+
+        cache_key, entry = self._cache_lookup(method, url, params, result_schema, validation, result)
+        if entry is not None and entry.fresh:
+            self.cache.record('hits')
+            if timing is not None:
+                self.metrics.record(timing, 200)
+            return entry.value, 200, entry.headers
+
+        data, content_type = encode_body(body, self.codec)
+        if self.rate_limiter is not None:
+            # a body that is streamed is gone once it has been sent, so it can't be retried
+            response = self.rate_limiter.call(url, weight, self._send, url, method, params, data,
+                                              request_schema, entry, timing, content_type,
+                                              retry=not is_streamed(data))
+        else:
+            response = self._send(url, method, params, data, request_schema, entry, timing, content_type)
+
+        if cache_key is not None:
+            if entry is not None and response.status_code == 304:
+                if timing is not None:
+                    self.metrics.record(timing, 304, 0)
+                return self._cache_revalidated(entry, cache_ttl), 200, entry.headers
+            self.cache.record('misses')
+
+        if timing is not None:
+            timing.mark()
+        value = self._handle_response(response.status_code, response.reason, response.content, result_schema,
+                                      headers=response.headers, cache_key=cache_key, cache_ttl=cache_ttl,
+                                      timing=timing, validation=validation, result=result)
+        if timing is not None:
+            self.metrics.record(timing, response.status_code, len(response.content))
+        return value, response.status_code, response.headers
+
+    def _send(self, url, method, params, data, request_schema, entry, timing=None, content_type=None):
+        """ Send one request; `data` is the request body, already encoded """
+
+        if timing is not None:
+            timing.begin_request()
+            result = self._send(url, method, params, data, request_schema, entry, content_type=content_type)
+            timing.end_request()
+            return result
+
+        if method in ('GET', 'DELETE'):
+            request_kwargs = {'params': params}
+        elif method in ('POST', 'PUT'):
+            if request_schema is not None:
+                request_schema.load(params)
+            request_kwargs = {'data': data}
+        else:
+            raise NotImplementedError('{} is not implemented'.format(method))
+
+        if self.auth and not self.token:
+            request_kwargs['auth'] = self.auth
+
+        return self.transport.request(method, url, headers=self._request_headers(method, entry, content_type),
+                                      **request_kwargs)
+
+    def paginate(self, endpoint, method, pagination, result_schema=None, cache_ttl=None, weight=1,
+                 max_items=None, max_pages=None, prefetch=True, label=None, **kwargs):
+        """ Lazily iterate over the items of every page of a list endpoint, walking the
+            pages with the `crest.pagination.Pagination` strategy given. Each page is
+            loaded with `result_schema`, and a non-2xx page raises `requests.HTTPError`.
+            `label` is the name the pages are recorded under in the client's metrics,
+            by default `endpoint`. See `crest.pagination.paginate` for the other
+            arguments.
+        """
+
+        label = label or endpoint
+
+        params = kwargs.pop('params', None)
+        # the interfaces pass their paths already expanded
+        if type(endpoint) is ExpandedPath:
+            url = self.url + '/' + endpoint
+        else:
+            url = self._endpoint_url(endpoint, kwargs)
+
+        def fetch_page(page_url, page_params):
+            timing = self.metrics.timing(label, method) if self.metrics is not None else None
+            value, status_code, headers = self.fetch(page_url, method, params=page_params,
+                                                     result_schema=result_schema, cache_ttl=cache_ttl,
+                                                     weight=weight, timing=timing)
+            if status_code not in [200, 201, 202]:
+                from requests import HTTPError
+                raise HTTPError('{} {} for url: {}'.format(status_code, value.get('message'), page_url))
+            return value, headers
+
+        return paginate(fetch_page, pagination, url, params, max_items=max_items, max_pages=max_pages,
+                        prefetch=prefetch)
+
+    def stream(self, endpoint, method, path=None, item_schema=None, chunk_size=64 * 1024, weight=1, **kwargs):
+        """ Send a request and lazily yield the elements of the JSON array in its response,
+            or of the array found at `path` (e.g. 'data' or 'data.items'), decoding the
+            body incrementally as it arrives. If `item_schema` is given every element is
+            loaded with it before it is yielded. The request is only sent once iteration
+            starts, and a non-2xx response raises `requests.HTTPError`.
+        """
+
+        params = kwargs.pop('params', None)
+        body = kwargs.pop('body', None)
+
+        # the URL is built right away, so a missing path parameter raises here; the
+        # interfaces pass their paths already expanded
+        if type(endpoint) is ExpandedPath:
+            url = self.url + '/' + endpoint
+        else:
+            url = self._endpoint_url(endpoint, kwargs)
+        return self._stream(url, method, path, item_schema, chunk_size, weight, params, body)
+
+    def _stream(self, url, method, path, item_schema, chunk_size, weight, params, body):
+
+        headers = self._request_headers('GET')
+        auth = self.auth if not self.token else None
+
+        data, content_type = encode_body(body, self.codec)
+        if data is not None:
+            headers['Content-Type'] = content_type or 'application/json'
+
+        request_kwargs = {'params': params, 'data': data, 'headers': headers, 'auth': auth, 'stream': True}
+        if self.rate_limiter is not None:
+            result = self.rate_limiter.call(url, weight, self.transport.request, method, url,
+                                            retry=not is_streamed(data), **request_kwargs)
+        else:
+            result = self.transport.request(method, url, **request_kwargs)
+
+        with result:
+            result.raise_for_status()
+            for item in JSONArrayStream(result.iter_content(chunk_size), path=path):
+                if item_schema is None:
+                    yield item
+                elif hasattr(item_schema, 'load'):
+                    yield item_schema.load(item, many=False)
+                else:
+                    item_schema.validate(item)
+                    yield item
+
+
+class AsyncClient(BaseClient):
+    """ The asyncio counterpart of `Client`, built on an `aiohttp.ClientSession`. Its
+        `invoke` is a coroutine, so interfaces bound to it are called through the
+        awaitable verbs of their endpoints, e.g. `await my_interface.user.aget(id=2)`.
+
+        `max_connections` caps the total number of open connections, `max_per_host` the
+        number of connections to a single host (0 means no limit), and
+        `keepalive_timeout` how many seconds an idle connection is kept for reuse.
+
+        With `coalesce`, concurrent identical GET requests share one round trip, as with
+        `Client`, through the `crest.coalesce.AsyncSingleFlight` in `singleflight`.
+    """
+
+    def __init__(self, host, port=80, user=None, password=None, token=None, cache=None,
+                 max_connections=100, max_per_host=0, keepalive_timeout=15.0, coalesce=False, codec=None,
+                 headers=None, validation=None):
+
+        try:
+            import aiohttp
+        except ImportError:
+            raise ImportError('AsyncClient requires aiohttp; install it with `pip install cREST[async]`') from None
+
+        super(AsyncClient, self).__init__(host, port=port, user=user, password=password, token=token,
+                                          cache=cache, codec=codec, headers=headers, validation=validation)
+
+        if coalesce:
+            self.singleflight = AsyncSingleFlight()
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.keepalive_timeout = keepalive_timeout
+        if self.auth:
+            self.auth = aiohttp.BasicAuth(*self.auth)
+
+        # aiohttp sessions have to be created inside a running event loop
+        self._session = None
+
+    @property
+    def session(self):
+        if self._session is None:
+            import aiohttp
+            connector = aiohttp.TCPConnector(limit=self.max_connections,
+                                             limit_per_host=self.max_per_host,
+                                             keepalive_timeout=self.keepalive_timeout)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        """ Close every pooled connection held by this client """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def invoke(self, endpoint, method, result_schema=None, request_schema=None, cache_ttl=None,
+                     validation=None, result=None, **kwargs):
+
+        params = kwargs.pop('params', None)
+        body = kwargs.pop('body', None)
+
+        # the interfaces pass their paths already expanded
+        if type(endpoint) is ExpandedPath:
+            url = self.url + '/' + endpoint
+        else:
+            url = self._endpoint_url(endpoint, kwargs)
+
+        validation = get_validation(validation) if validation is not None else self.validation
+        result = check_result(result)
+        coalesce_key = self._coalesce_key(method, url, params, result_schema, validation, result)
+        if coalesce_key is not None:
+            return await self.singleflight.do(coalesce_key, self._request, url, method, params, body,
+                                              result_schema, request_schema, cache_ttl, validation, result)
+        return await self._request(url, method, params, body, result_schema, request_schema, cache_ttl,
+                                   validation, result)
+
+    async def _request(self, url, method, params, body, result_schema, request_schema, cache_ttl,
+                       validation=None, result=None):
+
+        cache_key, entry = self._cache_lookup(method, url, params, result_schema, validation, result)
+        if entry is not None and entry.fresh:
+            self.cache.record('hits')
+            return entry.value
+
+        content_type = None
+        if method in ('GET', 'DELETE'):
+            request_kwargs = {'params': params}
+        elif method in ('POST', 'PUT'):
+            if request_schema is not None:
+                request_schema.load(params)
+            data, content_type = encode_body(body, self.codec)
+            request_kwargs = {'data': async_body(data)}
+        else:
+            raise NotImplementedError('{} is not implemented'.format(method))
+
+        if self.auth and not self.token:
+            request_kwargs['auth'] = self.auth
+
+        headers = self._request_headers(method, entry, content_type)
+        async with self.session.request(method, url, headers=headers, **request_kwargs) as response:
+            content = await response.read()
+
+        if cache_key is not None:
+            if entry is not None and response.status == 304:
+                return self._cache_revalidated(entry, cache_ttl)
+            self.cache.record('misses')
+
+        return self._handle_response(response.status, response.reason, content, result_schema,
+                                     headers=response.headers, cache_key=cache_key, cache_ttl=cache_ttl,
+                                     validation=validation, result=result)
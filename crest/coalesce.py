@@ -0,0 +1,104 @@
+import threading
+
+
+class _Call(object):
+    """ The outcome of a call in flight, for the callers waiting on it """
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """ Coalesces concurrent calls made with the same key: the first caller runs the
+        call, and every caller that arrives while it is in flight waits for it and gets
+        the same result, or the same exception, instead of repeating the work.
+        `calls` counts every call and `coalesced` the ones that were served by another
+        caller's call.
+    """
+
+    def __init__(self):
+
+        self.calls = 0
+        self.coalesced = 0
+
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+
+        leader = None
+        with self._lock:
+            self.calls += 1
+            call = self._in_flight.get(key)
+            if call is not None:
+                self.coalesced += 1
+            else:
+                call = self._in_flight[key] = _Call()
+                leader = call
+
+        if call is not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as ex:
+            call.error = ex
+            raise
+        finally:
+            self._forget(key)
+            call.done.set()
+        return call.result
+
+    def _forget(self, key):
+        with self._lock:
+            del self._in_flight[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._in_flight)
+            }
+
+
+class AsyncSingleFlight(object):
+    """ The asyncio counterpart of `SingleFlight`, for coroutines running on one event
+        loop. The first caller's coroutine runs as a task that every caller awaits, so a
+        caller that is cancelled doesn't cancel the call for the others.
+    """
+
+    def __init__(self):
+
+        self.calls = 0
+        self.coalesced = 0
+
+        self._in_flight = {}
+
+    async def do(self, key, func, *args, **kwargs):
+
+        import asyncio
+
+        self.calls += 1
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = self._in_flight[key] = asyncio.ensure_future(func(*args, **kwargs))
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._in_flight)
+        }
@@ -0,0 +1,128 @@
+import importlib.util
+import json
+
+
+def decode_error(ex, data):
+    """ Turn whatever a backend raised on bad input into a `json.JSONDecodeError` """
+    if isinstance(ex, UnicodeDecodeError):
+        msg, pos = 'Invalid UTF-8: {}'.format(ex.reason), ex.start
+    else:
+        msg, pos = getattr(ex, 'msg', str(ex)), getattr(ex, 'pos', 0) or 0
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data).decode('utf-8', 'replace')
+    return json.JSONDecodeError(msg, data, min(pos, len(data)))
+
+
+class JSONCodec(object):
+    """ Decodes response bodies straight from their bytes and encodes request bodies to
+        bytes. Whatever the backend, `loads` raises `json.JSONDecodeError` on malformed
+        input and `dumps` raises `TypeError` for objects it can't serialize.
+    """
+
+    name = None
+
+    def _loads(self, data):
+        raise NotImplementedError
+
+    def _dumps(self, obj):
+        raise NotImplementedError
+
+    def loads(self, data):
+        try:
+            return self._loads(data)
+        except ValueError as ex:
+            raise decode_error(ex, data) from ex
+
+    def dumps(self, obj):
+        try:
+            return self._dumps(obj)
+        except TypeError:
+            raise
+        except ValueError as ex:
+            raise TypeError(str(ex)) from ex
+
+    def __repr__(self):
+        return '{}()'.format(type(self).__name__)
+
+
+class StdlibCodec(JSONCodec):
+
+    name = 'json'
+
+    def __init__(self):
+        # json.dumps makes a new encoder for every call with these options
+        self._encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+    def _loads(self, data):
+        return json.loads(data)
+
+    def _dumps(self, obj):
+        return self._encode(obj).encode('utf-8')
+
+
+class SimpleJSONCodec(JSONCodec):
+
+    name = 'simplejson'
+
+    def __init__(self):
+        import simplejson
+        self._simplejson = simplejson
+        self._encode = simplejson.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+    def _loads(self, data):
+        # simplejson decodes bytes itself, but no other buffer
+        if not isinstance(data, (bytes, str)):
+            data = bytes(data)
+        return self._simplejson.loads(data)
+
+    def _dumps(self, obj):
+        return self._encode(obj).encode('utf-8')
+
+
+class OrjsonCodec(JSONCodec):
+    """ The fastest of the backends. orjson only handles integers that fit in 64 bits and
+        always decodes numbers with a fraction as floats.
+    """
+
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def _loads(self, data):
+        return self._orjson.loads(data)
+
+    def _dumps(self, obj):
+        return self._orjson.dumps(obj)
+
+
+# the backends are only imported when a codec using them is created
+CODECS = {
+    'json': StdlibCodec,
+    'simplejson': SimpleJSONCodec,
+    'orjson': OrjsonCodec
+}
+
+DEFAULT_CODEC = 'simplejson'
+
+
+def available_codecs():
+    """ The names of the codecs whose backend is installed """
+    return [name for name in CODECS if importlib.util.find_spec(name) is not None]
+
+
+def get_codec(codec=None):
+    """ Look a codec up by name ('json', 'simplejson' or 'orjson'), or pass a `JSONCodec`
+        instance through. None gives the default, simplejson.
+    """
+
+    if isinstance(codec, JSONCodec):
+        return codec
+    name = DEFAULT_CODEC if codec is None else codec
+    if name not in CODECS:
+        raise ValueError('Unknown JSON codec {!r}, expected one of {}'.format(name, sorted(CODECS)))
+    try:
+        return CODECS[name]()
+    except ImportError:
+        raise ImportError('The {0} codec requires {0}; install it with `pip install {0}`'.format(name)) from None
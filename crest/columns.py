@@ -0,0 +1,176 @@
+from crest.records import RecordBuilder
+
+# numpy is imported when a response is first decoded into columns, so that it is only
+# needed by the callers that ask for them
+
+
+DTYPES = {
+    'integer': 'int64',
+    'number': 'float64',
+    'boolean': 'bool',
+    'string': 'object'
+}
+
+# the Python types the values of a column of each JSON type are decoded as; NumPy
+# would convert others silently, e.g. 1.5 to 1 or 'no' to True
+PYTHON_TYPES = {
+    'integer': frozenset([int, float, type(None)]),
+    'number': frozenset([int, float, type(None)]),
+    'boolean': frozenset([bool, type(None)]),
+    'string': frozenset([str, type(None)])
+}
+
+FILL_VALUES = {
+    'integer': 0,
+    'number': float('nan'),
+    'boolean': False
+}
+
+
+class Column(object):
+    """ One column of a table of JSON objects: the value found at `path`, a tuple of
+        keys, in every object, named by the dotted path. `type` is the JSON type of the
+        column, or None if it is untyped or mixed, in which case its values are kept as
+        Python objects. A `nullable` column may be null or missing in some rows.
+    """
+
+    __slots__ = ('name', 'path', 'type', 'nullable')
+
+    def __init__(self, path, type, nullable):
+
+        self.name = '.'.join(path)
+        self.path = path
+        self.type = type
+        self.nullable = nullable
+
+    @property
+    def dtype(self):
+        return DTYPES.get(self.type, 'object')
+
+    def values(self, rows):
+        """ The values of the column in every row, with None where they're missing """
+        if len(self.path) == 1:
+            key = self.path[0]
+            return [row.get(key) for row in rows]
+        values = []
+        for row in rows:
+            for key in self.path:
+                row = row.get(key) if isinstance(row, dict) else None
+            values.append(row)
+        return values
+
+    def __repr__(self):
+        return 'Column({!r}, {!r}, nullable={})'.format(self.name, self.type, self.nullable)
+
+
+def table_columns(root, schema=None):
+    """ The columns of the objects described by `schema`, or by the elements of the
+        array `root` describes. Nested objects are flattened into dotted columns, e.g.
+        'address.city'; a property is nullable if its type allows null, or if it or
+        any object it is nested in is not `required`.
+    """
+
+    builder = RecordBuilder(root)
+    if schema is None:
+        schema = builder.resolve(root)
+        if 'array' in builder.types(schema) and 'items' in schema:
+            schema = schema['items']
+    schema = builder.resolve(schema)
+    if not builder.is_record(schema):
+        raise ValueError('Columns can only be made from object schemas with properties')
+
+    columns = []
+
+    def flatten(obj, prefix, optional, seen):
+        required = obj.get('required', [])
+        for key, value in obj['properties'].items():
+            value = builder.resolve(value)
+            path = prefix + (key,)
+            types = builder.types(value) if isinstance(value, dict) else []
+            nullable = optional or key not in required or 'null' in types
+            if builder.is_record(value) and id(value) not in seen:
+                flatten(value, path, nullable, seen | {id(value)})
+                continue
+            types = [t for t in types if t != 'null']
+            if set(types) == {'integer', 'number'}:
+                types = ['number']
+            columns.append(Column(path, types[0] if len(types) == 1 else None, nullable))
+
+    flatten(schema, (), False, {id(schema)})
+    return columns
+
+
+def check_types(column, values):
+    """ Raise a `ValueError` if any of `values` isn't of the column's JSON type. As in
+        jsonschema, a float with no fractional part is an integer
+    """
+
+    allowed = PYTHON_TYPES.get(column.type)
+    if allowed is None:
+        return
+    kinds = set(map(type, values))
+    if kinds <= allowed and not (column.type == 'integer' and float in kinds):
+        return
+    for index, value in enumerate(values):
+        if type(value) not in allowed or (column.type == 'integer' and type(value) is float
+                                          and not value.is_integer()):
+            raise ValueError('Column {!r} does not hold {} values: {!r} in row {}'.format(
+                column.name, column.type, value, index))
+
+
+def to_columns(columns, rows):
+    """ Decode a list of JSON objects into a dict of NumPy arrays, one per column. The
+        columns that may be null or missing are `numpy.ma.MaskedArray`s whose mask is
+        set where they are; in a column that may not be, a missing value raises a
+        `ValueError`, as does a value NumPy can't convert to the column's type.
+    """
+
+    import numpy
+
+    arrays = {}
+    count = len(rows)
+    for column in columns:
+        values = column.values(rows)
+        check_types(column, values)
+        mask = None
+        if column.nullable:
+            mask = numpy.fromiter((value is None for value in values), dtype=bool, count=count)
+            if mask.any():
+                fill = FILL_VALUES.get(column.type)
+                values = [fill if value is None else value for value in values]
+        elif None in values:
+            raise ValueError('Column {!r} is missing in row {}'.format(column.name, values.index(None)))
+
+        try:
+            if column.dtype == 'object':
+                array = numpy.empty(count, dtype=object)
+                array[:] = values
+            else:
+                array = numpy.fromiter(values, dtype=column.dtype, count=count)
+        except (TypeError, ValueError, OverflowError) as ex:
+            raise ValueError('Column {!r} does not hold {} values: {}'.format(column.name, column.type, ex)) from ex
+
+        arrays[column.name] = array if mask is None else numpy.ma.MaskedArray(array, mask=mask)
+    return arrays
+
+
+def to_structured(columns, rows):
+    """ Decode a list of JSON objects into a NumPy structured array with a field for
+        every column. If any column may be null or missing, it is a
+        `numpy.ma.MaskedArray` with a mask for every field.
+    """
+
+    import numpy
+
+    arrays = to_columns(columns, rows)
+    dtype = numpy.dtype([(column.name, column.dtype) for column in columns])
+    table = numpy.empty(len(rows), dtype=dtype)
+    for name, array in arrays.items():
+        table[name] = numpy.ma.getdata(array)
+
+    if not any(column.nullable for column in columns):
+        return table
+    mask = numpy.zeros(len(rows), dtype=numpy.dtype([(column.name, bool) for column in columns]))
+    for name, array in arrays.items():
+        mask[name] = numpy.ma.getmaskarray(array)
+    return numpy.ma.MaskedArray(table, mask=mask)
@@ -0,0 +1,260 @@
+import threading
+
+from bisect import bisect_left
+from time import perf_counter
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+# upper bounds, in seconds, of the buckets of phase histograms
+TIME_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                1.0, 2.5, 5.0, 10.0)
+# upper bounds, in bytes, of the buckets of response size histograms
+SIZE_BUCKETS = (128, 512, 2048, 8192, 32768, 131072, 524288, 2097152, 8388608, 33554432)
+
+# the phases of a call, in the order they happen
+PHASES = ('url', 'connect', 'ttfb', 'read', 'decode', 'load', 'total')
+
+# what the connections and the session of an instrumented client measure for the
+# request in progress on each thread
+_network = threading.local()
+
+
+class Histogram(object):
+    """ Counts observations in buckets with fixed upper bounds, plus one bucket for
+        everything above the last bound
+    """
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """ (upper bound, number of observations up to it) pairs, ending with infinity """
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+    def snapshot(self):
+        return {
+            'buckets': [[bound, count] for bound, count in self.cumulative()],
+            'sum': self.sum,
+            'count': self.count
+        }
+
+
+class CallTiming(object):
+    """ The durations of the phases of one call, measured with `mark` as the call
+        goes along, and the status and size of its response
+    """
+
+    __slots__ = ('endpoint', 'method', 'phases', 'status', 'size', 'start', '_last')
+
+    def __init__(self, endpoint, method):
+
+        self.endpoint = endpoint
+        self.method = method
+        self.phases = {}
+        self.status = None
+        self.size = None
+        self.start = self._last = perf_counter()
+
+    def mark(self, phase=None):
+        """ Record the time since the previous mark as the duration of `phase`, or just
+            restart the clock if `phase` is None
+        """
+        now = perf_counter()
+        if phase is not None:
+            self.phases[phase] = now - self._last
+        self._last = now
+
+    def begin_request(self):
+        _network.connect = 0.0
+        _network.headers_at = None
+        self.mark()
+
+    def end_request(self):
+        """ Split the time since `begin_request` into connecting, waiting for the
+            response headers and reading the body
+        """
+        now = perf_counter()
+        headers_at = _network.headers_at or now
+        connect = _network.connect
+        self.phases['connect'] = connect
+        self.phases['ttfb'] = max(headers_at - self._last - connect, 0.0)
+        self.phases['read'] = now - headers_at
+        self._last = now
+
+
+class Metrics(object):
+    """ Collects the timings of the calls made by a client into fixed-bucket histograms
+        for every endpoint template and method: one per phase of the call, one for the
+        size of the responses and a count of the status codes. Hooks added with
+        `add_hook` are called with every finished `CallTiming`.
+    """
+
+    def __init__(self, time_buckets=TIME_BUCKETS, size_buckets=SIZE_BUCKETS):
+
+        self.time_buckets = tuple(time_buckets)
+        self.size_buckets = tuple(size_buckets)
+        self.hooks = []
+
+        self._phases = {}
+        self._sizes = {}
+        self._statuses = {}
+        self._lock = threading.Lock()
+
+    def timing(self, endpoint, method):
+        return CallTiming(endpoint, method)
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def record(self, timing, status, size=None):
+
+        timing.phases['total'] = perf_counter() - timing.start
+        timing.status = status
+        timing.size = size
+        key = (timing.endpoint, timing.method)
+
+        with self._lock:
+            for phase, duration in timing.phases.items():
+                histogram = self._phases.get(key + (phase,))
+                if histogram is None:
+                    histogram = self._phases[key + (phase,)] = Histogram(self.time_buckets)
+                histogram.observe(duration)
+            if size is not None:
+                histogram = self._sizes.get(key)
+                if histogram is None:
+                    histogram = self._sizes[key] = Histogram(self.size_buckets)
+                histogram.observe(size)
+            status_key = key + (status,)
+            self._statuses[status_key] = self._statuses.get(status_key, 0) + 1
+
+        for hook in self.hooks:
+            hook(timing)
+
+    def snapshot(self):
+        """ The state of every histogram, as a list of one dict per endpoint and method """
+
+        with self._lock:
+            calls = {}
+            for (endpoint, method, phase), histogram in self._phases.items():
+                call = calls.setdefault((endpoint, method), {'phases': {}, 'response_bytes': None, 'statuses': {}})
+                call['phases'][phase] = histogram.snapshot()
+            for (endpoint, method), histogram in self._sizes.items():
+                calls[(endpoint, method)]['response_bytes'] = histogram.snapshot()
+            for (endpoint, method, status), count in self._statuses.items():
+                calls[(endpoint, method)]['statuses'][status] = count
+
+        return [dict(endpoint=endpoint, method=method, **call) for (endpoint, method), call in sorted(calls.items())]
+
+    def prometheus(self, prefix='crest'):
+        """ The metrics in the Prometheus text exposition format """
+
+        lines = []
+
+        def histogram_lines(name, labels, histogram):
+            for bound, count in histogram['buckets']:
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                lines.append('{}_bucket{{{},le="{}"}} {}'.format(name, labels, le, count))
+            lines.append('{}_sum{{{}}} {!r}'.format(name, labels, float(histogram['sum'])))
+            lines.append('{}_count{{{}}} {}'.format(name, labels, histogram['count']))
+
+        snapshot = self.snapshot()
+
+        name = prefix + '_call_phase_seconds'
+        lines.append('# HELP {} Time spent in each phase of a call.'.format(name))
+        lines.append('# TYPE {} histogram'.format(name))
+        for call in snapshot:
+            for phase in sorted(call['phases'], key=PHASES.index):
+                labels = format_labels(endpoint=call['endpoint'], method=call['method'], phase=phase)
+                histogram_lines(name, labels, call['phases'][phase])
+
+        name = prefix + '_response_bytes'
+        lines.append('# HELP {} Size of the response bodies.'.format(name))
+        lines.append('# TYPE {} histogram'.format(name))
+        for call in snapshot:
+            if call['response_bytes'] is not None:
+                labels = format_labels(endpoint=call['endpoint'], method=call['method'])
+                histogram_lines(name, labels, call['response_bytes'])
+
+        name = prefix + '_responses_total'
+        lines.append('# HELP {} Responses by status code.'.format(name))
+        lines.append('# TYPE {} counter'.format(name))
+        for call in snapshot:
+            for status, count in sorted(call['statuses'].items()):
+                labels = format_labels(endpoint=call['endpoint'], method=call['method'], status=status)
+                lines.append('{}{{{}}} {}'.format(name, labels, count))
+
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._phases.clear()
+            self._sizes.clear()
+            self._statuses.clear()
+
+
+def format_labels(**labels):
+    return ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                    for name, value in labels.items())
+
+
+def mark_headers(response, *args, **kwargs):
+    """ A `requests` response hook, called once the headers of a response have arrived
+        and before its body is read
+    """
+    _network.headers_at = perf_counter()
+
+
+class TimedHTTPConnection(HTTPConnection):
+
+    def connect(self):
+        start = perf_counter()
+        super(TimedHTTPConnection, self).connect()
+        _network.connect = getattr(_network, 'connect', 0.0) + perf_counter() - start
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+
+    def connect(self):
+        start = perf_counter()
+        super(TimedHTTPSConnection, self).connect()
+        _network.connect = getattr(_network, 'connect', 0.0) + perf_counter() - start
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """ An `HTTPAdapter` whose connections record how long it took to open them,
+        including the TLS handshake
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(TimedHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool
+        }
@@ -0,0 +1,186 @@
+import re
+
+from urllib.parse import urljoin
+
+from crest.streaming import split_path
+
+
+LINK_REGEX = re.compile(r'<([^>]*)>\s*((?:;\s*[^;,]*)*)')
+REL_NEXT_REGEX = re.compile(r';\s*rel\s*=\s*"?([^";,]*)"?')
+
+
+def get_path(obj, path):
+    """ Look up a dotted path, e.g. 'meta.next_cursor', in a decoded response """
+    for key in split_path(path):
+        if not isinstance(obj, dict) or key not in obj:
+            return None
+        obj = obj[key]
+    return obj
+
+
+class PageRequest(object):
+    """ The URL and query parameters of one page """
+
+    def __init__(self, url, params):
+
+        self.url = url
+        self.params = params
+
+
+class Pagination(object):
+    """ A strategy for walking through the pages of a list endpoint. `items` is the
+        dotted path to the list of items in each page, or None if the page itself is
+        the list. Subclasses work out the request for the page after a given one.
+    """
+
+    def __init__(self, items=None):
+
+        self.items_path = items
+
+    def items(self, page):
+        items = get_path(page, self.items_path) if self.items_path else page
+        return items if items is not None else []
+
+    def first_request(self, url, params):
+        return PageRequest(url, dict(params or {}))
+
+    def next_request(self, request, page, headers, items):
+        raise NotImplementedError
+
+
+class PageNumberPagination(Pagination):
+    """ Pages addressed by number in the `page_param` query parameter, starting at
+        `start`. If `total_pages` names a field of the response, iteration stops at
+        that page; it always stops at the first empty page, or at a page shorter than
+        `page_size` when one is given.
+    """
+
+    def __init__(self, items=None, page_param='page', start=1, size_param=None, page_size=None,
+                 total_pages=None):
+
+        super(PageNumberPagination, self).__init__(items)
+        self.page_param = page_param
+        self.start = start
+        self.size_param = size_param
+        self.page_size = page_size
+        self.total_pages = total_pages
+
+    def first_request(self, url, params):
+        params = dict(params or {})
+        params.setdefault(self.page_param, self.start)
+        if self.size_param and self.page_size:
+            params[self.size_param] = self.page_size
+        return PageRequest(url, params)
+
+    def next_request(self, request, page, headers, items):
+        if not items or (self.page_size and len(items) < self.page_size):
+            return None
+        current = int(request.params[self.page_param])
+        if self.total_pages and get_path(page, self.total_pages) is not None:
+            if current >= int(get_path(page, self.total_pages)):
+                return None
+        return PageRequest(request.url, dict(request.params, **{self.page_param: current + 1}))
+
+
+class OffsetPagination(Pagination):
+    """ Pages addressed by the offset of their first item in `offset_param`, with `limit`
+        items requested per page through `limit_param`
+    """
+
+    def __init__(self, items=None, offset_param='offset', limit_param='limit', limit=100):
+
+        super(OffsetPagination, self).__init__(items)
+        self.offset_param = offset_param
+        self.limit_param = limit_param
+        self.limit = limit
+
+    def first_request(self, url, params):
+        params = dict(params or {})
+        params.setdefault(self.offset_param, 0)
+        params[self.limit_param] = self.limit
+        return PageRequest(url, params)
+
+    def next_request(self, request, page, headers, items):
+        if len(items) < self.limit:
+            return None
+        offset = int(request.params[self.offset_param]) + len(items)
+        return PageRequest(request.url, dict(request.params, **{self.offset_param: offset}))
+
+
+class CursorPagination(Pagination):
+    """ Pages chained by an opaque cursor: the response field at the dotted path `cursor`
+        holds the value to send in `cursor_param` to get the next page, and is empty on
+        the last one
+    """
+
+    def __init__(self, items=None, cursor='next_cursor', cursor_param='cursor'):
+
+        super(CursorPagination, self).__init__(items)
+        self.cursor = cursor
+        self.cursor_param = cursor_param
+
+    def next_request(self, request, page, headers, items):
+        cursor = get_path(page, self.cursor)
+        if not cursor:
+            return None
+        return PageRequest(request.url, dict(request.params, **{self.cursor_param: cursor}))
+
+
+class LinkHeaderPagination(Pagination):
+    """ Pages chained by the `rel="next"` entry of the RFC 5988 `Link` header, as used by
+        e.g. the GitHub API. The next URL already carries its query, so the original
+        params are not sent again.
+    """
+
+    def next_request(self, request, page, headers, items):
+        for url, attributes in LINK_REGEX.findall(headers.get('Link', '')):
+            rels = REL_NEXT_REGEX.findall(attributes)
+            if any('next' in rel.split() for rel in rels):
+                return PageRequest(urljoin(request.url, url), None)
+        return None
+
+
+def paginate(fetch, pagination, url, params=None, max_items=None, max_pages=None, prefetch=True):
+    """ Lazily iterate over the items of every page. `fetch(url, params)` returns the
+        decoded page and its headers. With `prefetch`, the request for the next page is
+        sent in the background as soon as the current one has arrived, so the network
+        round trip overlaps with consuming the current page. `max_items` and `max_pages`
+        stop the scan early, without fetching pages that won't be needed.
+    """
+
+    executor = None
+    if prefetch:
+        from concurrent import futures
+        executor = futures.ThreadPoolExecutor(max_workers=1)
+    request = pagination.first_request(url, params)
+    pending = None
+    pages = 0
+    count = 0
+    try:
+        while request is not None:
+            if pending is not None:
+                page, headers = pending.result()
+                pending = None
+            else:
+                page, headers = fetch(request.url, request.params)
+            pages += 1
+            items = pagination.items(page)
+
+            next_request = None
+            if ((max_items is None or count + len(items) < max_items) and
+                    (max_pages is None or pages < max_pages)):
+                next_request = pagination.next_request(request, page, headers, items)
+            if next_request is not None and executor is not None:
+                pending = executor.submit(fetch, next_request.url, next_request.params)
+            request = next_request
+
+            for item in items:
+                if max_items is not None and count >= max_items:
+                    return
+                count += 1
+                yield item
+    finally:
+        if pending is not None:
+            pending.cancel()
+        if executor is not None:
+            executor.shutdown(wait=False)
@@ -0,0 +1,241 @@
+import threading
+import time
+
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+
+# statuses that mean the server is shedding load and the request can be sent again
+THROTTLE_STATUSES = frozenset([429, 503])
+
+
+def parse_retry_after(value, now=None):
+    """ Seconds to wait according to a `Retry-After` header, which holds either a number
+        of seconds or an HTTP date; None if the header is missing or malformed
+    """
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(date.timestamp() - (now if now is not None else time.time()), 0.0)
+
+
+def parse_reset(value, now=None):
+    """ Seconds until the quota resets according to an `X-RateLimit-Reset` header. Servers
+        send either the number of seconds left or the epoch time of the reset.
+    """
+    try:
+        reset = float(value)
+    except (TypeError, ValueError):
+        return None
+    if reset > 1e9:
+        reset -= now if now is not None else time.time()
+    return max(reset, 0.0)
+
+
+def parse_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class HostLimiter(object):
+    """ Paces the requests sent to a single host. A token bucket holding up to `burst`
+        tokens and refilled at `rate` tokens per second caps the request rate, with each
+        request taking as many tokens as its weight, and the number of requests in flight
+        is capped by a window that grows by one request per round of successful responses
+        and is cut by the factor `decrease` whenever the server throttles (AIMD).
+
+        The server's own limits are learned from its responses: `Retry-After` and an
+        exhausted `X-RateLimit-Remaining` hold every request back until the given time,
+        and `X-RateLimit-Remaining` with `X-RateLimit-Reset` pace requests so the
+        remaining quota lasts until the reset. Callers that can't go yet are queued,
+        not failed.
+    """
+
+    def __init__(self, rate=None, burst=None, max_concurrency=32, min_concurrency=1, decrease=0.5,
+                 backoff=0.1, max_backoff=30.0):
+
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.decrease = decrease
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.concurrency = float(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.throttled = 0
+        self.tokens = float(self._capacity(rate))
+        self.blocked_until = 0.0
+
+        self._learned_rate = None
+        self._learned_until = 0.0
+        self._last_decrease = 0.0
+        self._consecutive_throttles = 0
+        self._updated = time.monotonic()
+        self._condition = threading.Condition()
+
+    def _capacity(self, rate):
+        if self.burst is not None:
+            return self.burst
+        return max(rate or 1, 1)
+
+    def _current_rate(self, now):
+        rate = self.rate
+        if self._learned_rate is not None and now < self._learned_until:
+            rate = self._learned_rate if rate is None else min(rate, self._learned_rate)
+        return rate
+
+    def acquire(self, weight=1):
+        """ Wait until a request of the given weight may be sent, and return the time at
+            which it was let through, to be handed back to `release`
+        """
+
+        with self._condition:
+            self.waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    rate = self._current_rate(now)
+                    capacity = self._capacity(rate)
+                    if rate is not None:
+                        self.tokens = min(capacity, self.tokens + (now - self._updated) * rate)
+                    self._updated = now
+
+                    if now < self.blocked_until:
+                        timeout = self.blocked_until - now
+                    elif self.in_flight >= max(int(self.concurrency), self.min_concurrency):
+                        # woken up by release
+                        timeout = None
+                    elif rate is None:
+                        break
+                    else:
+                        # a request heavier than the bucket only needs a full bucket, and
+                        # leaves it in debt
+                        needed = min(weight, capacity)
+                        if self.tokens >= needed:
+                            self.tokens -= weight
+                            break
+                        timeout = (needed - self.tokens) / rate
+                    self._condition.wait(timeout)
+
+                self.in_flight += 1
+                return now
+            finally:
+                self.waiting -= 1
+
+    def release(self, started, status=None, headers=None):
+        """ Record the outcome of a request let through at `started`. Returns True if the
+            server throttled it, in which case it may be sent again.
+        """
+
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            headers = headers if headers is not None else {}
+            throttled = status in THROTTLE_STATUSES
+
+            if throttled:
+                self.throttled += 1
+                self._consecutive_throttles += 1
+                # only requests sent after the last cut can cut the window again
+                if started >= self._last_decrease:
+                    self.concurrency = max(self.min_concurrency, self.concurrency * self.decrease)
+                    self._last_decrease = now
+                delay = parse_retry_after(headers.get('Retry-After'))
+                if delay is None:
+                    delay = min(self.max_backoff, self.backoff * 2 ** (self._consecutive_throttles - 1))
+                self.blocked_until = max(self.blocked_until, now + delay)
+            elif status is not None:
+                self._consecutive_throttles = 0
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1.0 / self.concurrency)
+
+            remaining = parse_int(headers.get('X-RateLimit-Remaining'))
+            reset = parse_reset(headers.get('X-RateLimit-Reset'))
+            if remaining is not None and reset is not None:
+                if remaining <= 0:
+                    self.blocked_until = max(self.blocked_until, now + reset)
+                elif reset > 0:
+                    self._learned_rate = remaining / reset
+                    self._learned_until = now + reset
+
+            self._condition.notify_all()
+            return throttled
+
+    def stats(self):
+        with self._condition:
+            now = time.monotonic()
+            return {
+                'rate': self._current_rate(now),
+                'concurrency': self.concurrency,
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                'throttled': self.throttled,
+                'blocked_for': max(self.blocked_until - now, 0.0)
+            }
+
+
+class RateLimiter(object):
+    """ Keeps a `HostLimiter` for every host requests are sent to, all created with the
+        keyword arguments given here, and retries throttled requests up to `max_retries`
+        times once their host lets them through again. The limiter can be shared by
+        several clients talking to the same hosts.
+    """
+
+    def __init__(self, max_retries=5, **limits):
+
+        self.max_retries = max_retries
+        self.limits = limits
+        self.retries = 0
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def host(self, url):
+        netloc = urlsplit(url).netloc
+        with self._lock:
+            limiter = self._hosts.get(netloc)
+            if limiter is None:
+                limiter = self._hosts[netloc] = HostLimiter(**self.limits)
+            return limiter
+
+    def call(self, url, weight, send, *args, retry=True, **kwargs):
+        """ Send a request with `send(*args, **kwargs)`, which returns a response with a
+            `status_code` and `headers`, once the host of `url` can take it. Without
+            `retry`, a throttled request is returned as it is rather than sent again.
+        """
+
+        limiter = self.host(url)
+        attempt = 0
+        while True:
+            started = limiter.acquire(weight)
+            try:
+                result = send(*args, **kwargs)
+            except BaseException:
+                limiter.release(started)
+                raise
+            throttled = limiter.release(started, result.status_code, result.headers)
+            if not throttled or not retry or attempt >= self.max_retries:
+                return result
+            attempt += 1
+            with self._lock:
+                self.retries += 1
+            result.close()
+
+    def stats(self):
+        with self._lock:
+            hosts = dict(self._hosts)
+            retries = self.retries
+        return {
+            'retries': retries,
+            'hosts': {netloc: limiter.stats() for netloc, limiter in hosts.items()}
+        }
@@ -0,0 +1,235 @@
+import keyword
+import re
+
+from typing import Any, List, Optional
+
+
+JSON_TYPES = {
+    'integer': int,
+    'number': float,
+    'string': str,
+    'boolean': bool,
+    'array': list,
+    'object': dict,
+    'null': type(None)
+}
+
+IDENTIFIER_REGEX = re.compile(r'\W|^(?=\d)')
+
+
+def attribute_name(key):
+    """ The name of the attribute that holds the property `key` of a JSON object. Names
+        that are keywords or members of `Record` get a trailing underscore, and names
+        with two leading underscores, which Python would mangle, lose all but one; one
+        made only of underscores becomes their count, e.g. '__' -> '_2_'.
+    """
+    name = IDENTIFIER_REGEX.sub('_', key) or '_'
+    if name.startswith('__'):
+        name = '_{}_'.format(name.lstrip('_') or len(name))
+    if keyword.iskeyword(name) or name in RESERVED_NAMES:
+        name += '_'
+    return name
+
+
+def class_name(name):
+    """ 'user_posts' or 'user posts' -> 'UserPosts' """
+    words = re.split(r'[^0-9a-zA-Z]+', name)
+    name = ''.join(word[:1].upper() + word[1:] for word in words)
+    if not name or name[0].isdigit():
+        name = 'Record' + name
+    return name
+
+
+def resolve_pointer(root, ref):
+    """ The part of the schema `root` that the local reference `ref`, e.g.
+        '#/definitions/a/definitions/b', points to
+    """
+    node = root
+    for key in ref.lstrip('#').split('/')[1:]:
+        key = key.replace('~1', '/').replace('~0', '~')
+        node = node[int(key)] if isinstance(node, list) else node[key]
+    return node
+
+
+class Record(object):
+    """ The base of the record classes generated from object schemas by `RecordBuilder`.
+        Every property of the schema is held in a slot, so records take a fraction of
+        the memory of the dicts they are decoded from. Properties missing from the
+        decoded object are None, and keys the schema doesn't declare are dropped.
+
+        `_fields` are the names of the attributes and `_keys` the keys of the JSON
+        properties they hold, in the same order.
+    """
+
+    __slots__ = ()
+
+    _fields = ()
+    _keys = ()
+
+    def __init__(self, **kwargs):
+
+        unknown = set(kwargs).difference(self._fields)
+        if unknown:
+            raise TypeError('{} has no fields {}'.format(type(self).__name__, sorted(unknown)))
+        for field in self._fields:
+            setattr(self, field, kwargs.get(field))
+
+    @classmethod
+    def from_dict(cls, data):
+        """ Make a record from a decoded JSON object; replaced in every generated class """
+        return cls(**{field: data.get(key) for field, key in zip(cls._fields, cls._keys)})
+
+    @classmethod
+    def from_list(cls, items):
+        from_dict = cls.from_dict
+        return [from_dict(item) for item in items]
+
+    def to_dict(self):
+        """ The record as a JSON object again, with nested records turned back into dicts """
+        return {key: _to_json(getattr(self, field)) for field, key in zip(self._fields, self._keys)}
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self._fields)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, ', '.join(
+            '{}={!r}'.format(field, getattr(self, field)) for field in self._fields))
+
+
+# the members of Record and the class attributes of the generated classes, which a
+# property mustn't shadow
+RESERVED_NAMES = frozenset(name for name in dir(Record) if not name.startswith('__')).union(['_schema'])
+
+
+def _to_json(value):
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [_to_json(item) for item in value]
+    return value
+
+
+class RecordBuilder(object):
+    """ Generates a `Record` subclass for every object schema reachable from a schema,
+        following `$ref`s to `definitions` within `root`. The same object schema always
+        gets the same class, so recursive schemas get recursive classes.
+    """
+
+    def __init__(self, root):
+
+        self.root = root
+        self._classes = {}
+
+    def resolve(self, schema):
+        seen = set()
+        while isinstance(schema, dict) and isinstance(schema.get('$ref'), str) and schema['$ref'].startswith('#'):
+            if schema['$ref'] in seen:
+                raise ValueError('Circular $ref {}'.format(schema['$ref']))
+            seen.add(schema['$ref'])
+            schema = resolve_pointer(self.root, schema['$ref'])
+        return schema
+
+    @staticmethod
+    def types(schema):
+        types = schema.get('type')
+        if types is None:
+            return ['object'] if 'properties' in schema else []
+        return [types] if isinstance(types, str) else list(types)
+
+    def is_record(self, schema):
+        return (isinstance(schema, dict) and 'object' in self.types(schema)
+                and isinstance(schema.get('properties'), dict))
+
+    def record_class(self, schema, name='Record'):
+        """ The record class of an object schema, after following its `$ref`s. The
+            class is named after the schema's title, or else the definition a `$ref`
+            points to, or else `name`.
+        """
+
+        if isinstance(schema, dict) and isinstance(schema.get('$ref'), str):
+            name = schema['$ref'].rsplit('/', 1)[-1]
+        schema = self.resolve(schema)
+        if not self.is_record(schema):
+            raise ValueError('Records can only be made from object schemas with properties')
+
+        record_class = self._classes.get(id(schema))
+        if record_class is not None:
+            return record_class
+
+        keys = list(schema['properties'])
+        fields = [attribute_name(key) for key in keys]
+        if len(set(fields)) != len(fields):
+            raise ValueError('Properties {} map to clashing attribute names'.format(keys))
+
+        name = class_name(schema.get('title') or name)
+        record_class = type(name, (Record,), {
+            '__slots__': tuple(fields),
+            '__module__': __name__,
+            '_fields': tuple(fields),
+            '_keys': tuple(keys),
+            '_schema': schema
+        })
+        # registered before the properties are looked at, so that they can refer back to it
+        self._classes[id(schema)] = record_class
+
+        annotations = {}
+        converters = {}
+        for field, key in zip(fields, keys):
+            annotations[field], converters[field] = self.field(schema['properties'][key], name + class_name(key))
+        record_class.__annotations__ = annotations
+        record_class.from_dict = classmethod(self.make_from_dict(record_class, converters))
+        return record_class
+
+    def field(self, schema, name):
+        """ The type annotation of a property and the record class or classes its value
+            has to be converted with, if any
+        """
+
+        resolved = self.resolve(schema)
+        if not isinstance(resolved, dict):
+            return Any, None
+        types = self.types(resolved)
+        nullable = 'null' in types
+
+        if self.is_record(resolved):
+            record_class = self.record_class(schema, name)
+            annotation, converter = record_class, ('record', record_class)
+        elif 'array' in types and self.is_record(self.resolve(resolved.get('items'))):
+            record_class = self.record_class(resolved['items'], name[:-1] if name.endswith('s') else name + 'Item')
+            annotation, converter = List[record_class], ('list', record_class)
+        else:
+            python_types = [JSON_TYPES[t] for t in types if t in JSON_TYPES and t != 'null']
+            annotation = python_types[0] if len(python_types) == 1 else Any
+            converter = None
+
+        return (Optional[annotation] if nullable else annotation), converter
+
+    @staticmethod
+    def make_from_dict(record_class, converters):
+        """ Compile the `from_dict` of a record class: one assignment per slot, with the
+            nested records converted inline
+        """
+
+        namespace = {'new': object.__new__, 'cls': record_class}
+        lines = ['def from_dict(_, data):', '    record = new(cls)', '    get = data.get']
+        for field, key in zip(record_class._fields, record_class._keys):
+            converter = converters[field]
+            if converter is None:
+                lines.append('    record.{} = get({!r})'.format(field, key))
+                continue
+            kind, nested = converter
+            namespace['nested_' + field] = nested
+            lines.append('    value = get({!r})'.format(key))
+            if kind == 'record':
+                expression = 'nested_{}.from_dict(value)'.format(field)
+            else:
+                expression = 'nested_{}.from_list(value)'.format(field)
+            lines.append('    record.{} = None if value is None else {}'.format(field, expression))
+        lines.append('    return record')
+
+        exec('\n'.join(lines), namespace)
+        return namespace['from_dict']
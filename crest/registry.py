@@ -0,0 +1,153 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+from crest.codec import get_codec
+from crest.schema import JSONSchema
+
+
+# bump whenever the processing of schemas or the layout of cache files changes
+CACHE_VERSION = 1
+
+
+class SchemaRegistry(object):
+    """ Loads `JSONSchema`s from files, by path or by name, and keeps every schema it has
+        loaded, so that each file is only processed once per process. A name is looked
+        up as `<name>` or `<name>.json` in each of the `search_paths` in turn.
+
+        With a `cache_dir`, the processed form of every schema, with its nested schemas
+        replaced and its references adjusted, is also saved there, keyed on the path of
+        the file, its modification time and the hash of its contents. Other processes
+        using the same directory then load it as is: a file whose modification time
+        hasn't changed isn't even read, and one that was touched but not modified is
+        recognized by its hash.
+
+        The cache files are read and written with `codec`, by default the same codec as
+        the clients use. `stats()` counts the loads served from memory, from the disk cache, and the
+        misses that had to process a file.
+    """
+
+    def __init__(self, cache_dir=None, search_paths=(), codec=None):
+
+        self.cache_dir = cache_dir
+        self.search_paths = list(search_paths)
+        self.codec = get_codec(codec)
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._schemas = {}
+        self._lock = threading.Lock()
+
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def resolve(self, name):
+        """ The absolute path of the file holding the schema called `name` """
+
+        candidates = [name]
+        for directory in self.search_paths:
+            candidates.extend([os.path.join(directory, name), os.path.join(directory, name + '.json')])
+        for candidate in candidates:
+            if os.path.isfile(candidate):
+                return os.path.abspath(candidate)
+        raise FileNotFoundError('No schema file found for {!r} in {}'.format(name, self.search_paths))
+
+    def load(self, name):
+        """ The `JSONSchema` in the file `name` refers to, loaded from memory if the file
+            hasn't changed since it was last loaded, otherwise from the disk cache or from
+            the file itself
+        """
+
+        path = self.resolve(name)
+        mtime = os.stat(path).st_mtime_ns
+
+        with self._lock:
+            loaded = self._schemas.get(path)
+            if loaded is not None and loaded[0] == mtime:
+                self.memory_hits += 1
+                return loaded[1]
+
+            schema, source = self._load_cached(path, mtime)
+            if schema is not None:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+                if source is None:
+                    with open(path, 'rb') as f:
+                        source = f.read()
+                schema = JSONSchema(self.codec.loads(source))
+                self._store(path, mtime, source, schema)
+
+            self._schemas[path] = (mtime, schema)
+            return schema
+
+    def _cache_path(self, path):
+        return os.path.join(self.cache_dir, hashlib.sha256(path.encode('utf-8')).hexdigest() + '.json')
+
+    def _load_cached(self, path, mtime):
+        """ The schema saved for `path`, or None, and the contents of the file if they had
+            to be read to check the hash
+        """
+
+        if self.cache_dir is None:
+            return None, None
+
+        try:
+            with open(self._cache_path(path), 'rb') as f:
+                entry = self.codec.loads(f.read())
+        except (OSError, ValueError):
+            return None, None
+        if not isinstance(entry, dict) or entry.get('version') != CACHE_VERSION or entry.get('path') != path:
+            return None, None
+
+        if entry.get('mtime') == mtime:
+            return JSONSchema.from_processed(entry['schema']), None
+
+        with open(path, 'rb') as f:
+            source = f.read()
+        if entry.get('hash') != hashlib.sha256(source).hexdigest():
+            return None, source
+
+        # touched but unchanged; remember the new time so the next load needn't hash again
+        schema = JSONSchema.from_processed(entry['schema'])
+        self._store(path, mtime, source, schema)
+        return schema, source
+
+    def _store(self, path, mtime, source, schema):
+
+        if self.cache_dir is None:
+            return
+
+        entry = {
+            'version': CACHE_VERSION,
+            'path': path,
+            'mtime': mtime,
+            'hash': hashlib.sha256(source).hexdigest(),
+            'schema': schema.schema
+        }
+        # write to a temporary file first, so that other processes never see half of one
+        fd, temporary = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self.codec.dumps(entry))
+            os.replace(temporary, self._cache_path(path))
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def stats(self):
+        with self._lock:
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'schemas': len(self._schemas)
+            }
+
+    def clear(self):
+        """ Forget the schemas held in memory; the disk cache is left alone """
+        with self._lock:
+            self._schemas.clear()
@@ -0,0 +1,39 @@
+from collections.abc import Sequence
+
+
+# the forms a call can return a successful response in: 'json' is the decoded JSON as it
+# is, 'records' the compact records generated from a crest.schema.JSONSchema, and
+# 'columns' and 'structured' a list response decoded into a dict of NumPy arrays, one
+# per column of the schema, or into a NumPy structured array
+RESULTS = ('json', 'records', 'columns', 'structured')
+
+
+def check_result(result):
+    """ Raise a `ValueError` unless `result` names one of the `RESULTS`; None is 'json' """
+    if result is not None and result not in RESULTS:
+        raise ValueError('Unknown result {!r}, expected one of {}'.format(result, list(RESULTS)))
+    return result
+
+
+def make_result(result, result_schema, value):
+    """ Turn a decoded, validated response into the form `result` asks for """
+
+    if result is None or result == 'json':
+        return value
+
+    if not hasattr(result_schema, 'record_class'):
+        raise ValueError('{!r} results need a JSONSchema result schema, not {!r}'.format(result, result_schema))
+
+    if result in ('columns', 'structured'):
+        if not isinstance(value, Sequence) or isinstance(value, (str, bytes)):
+            raise ValueError('{!r} results need a list response, not {}'.format(result, type(value).__name__))
+        # e.g. the `LazyRecords` of lazy validation, which every column would go through
+        value = list(value)
+        from crest.columns import to_columns, to_structured
+        convert = to_columns if result == 'columns' else to_structured
+        return convert(result_schema.columns(), value)
+
+    record_class = result_schema.record_class()
+    if isinstance(value, dict):
+        return record_class.from_dict(value)
+    return record_class.from_list(value)
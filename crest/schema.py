@@ -1,9 +1,274 @@
-import copy
+import functools
 import json
-import jsonschema
 import os
 from abc import abstractmethod
 
+# jsonschema is imported when a schema is first compiled, to keep importing crest cheap
+
+
+def _map_children(node, func):
+    """ Apply `func` to every child of a dict or list and return the result. The
+        container is shallow-copied only if some child actually changed, otherwise
+        the original node is returned, so unchanged subtrees stay shared.
+    """
+
+    copied = None
+    items = node.items() if isinstance(node, dict) else enumerate(node)
+    for key, value in items:
+        new_value = func(key, value)
+        if new_value is not value:
+            if copied is None:
+                copied = dict(node) if isinstance(node, dict) else list(node)
+            copied[key] = new_value
+    return node if copied is None else copied
+
+
+# keywords that don't constrain instances, so a batch validator can ignore them
+ANNOTATION_KEYWORDS = frozenset(['title', 'description', 'default', 'examples', '$comment', 'readOnly',
+                                 'writeOnly', 'deprecated'])
+
+# the keywords of an array schema whose elements a batch validator can validate for it
+BATCH_ARRAY_KEYWORDS = frozenset(['type', 'items', 'definitions', '$defs', '$schema']) | ANNOTATION_KEYWORDS
+
+# the keywords a batch validator checks column by column, on an item schema and on the
+# schemas of its properties
+BATCH_OBJECT_KEYWORDS = frozenset(['type', 'properties', 'required']) | ANNOTATION_KEYWORDS
+BATCH_PROPERTY_KEYWORDS = frozenset(['type', 'enum', 'minimum', 'maximum', 'minLength', 'maxLength']) | \
+    ANNOTATION_KEYWORDS
+
+JSON_TYPE_NAMES = frozenset(['null', 'boolean', 'integer', 'number', 'string', 'array', 'object'])
+
+_MISSING = object()
+
+
+@functools.lru_cache(maxsize=None)
+def _has_numpy():
+    import importlib.util
+    return importlib.util.find_spec('numpy') is not None
+
+
+def sub_validator(validator, schema):
+    """ A validator of the same draft as `validator` for `schema`, a part of the schema
+        it validates, which still resolves references against the whole schema
+    """
+    evolve = getattr(validator, 'evolve', None)
+    if evolve is not None:
+        return evolve(schema=schema)
+    # jsonschema before 4.0 has no evolve, but validators share a resolver there
+    return type(validator)(schema, resolver=validator.resolver, format_checker=validator.format_checker)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class PropertyCheck(object):
+    """ The `type`, `enum`, `minimum`, `maximum`, `minLength` and `maxLength` of the
+        schema of one property, checked over the values of that property in a batch of
+        objects at once
+    """
+
+    def __init__(self, key, schema, float_integers):
+
+        self.key = key
+        types = schema.get('type')
+        self.types = None if types is None else frozenset([types] if isinstance(types, str) else types)
+        self.enum = schema.get('enum')
+        self.minimum = schema.get('minimum')
+        self.maximum = schema.get('maximum')
+        self.min_length = schema.get('minLength')
+        self.max_length = schema.get('maxLength')
+        # whether 1.0 counts as an integer, which it does from draft 6 on
+        self.float_integers = float_integers
+
+    @classmethod
+    def compile(cls, key, schema, float_integers):
+        """ The check for a property schema, or None if it uses anything else """
+        if not isinstance(schema, dict) or not BATCH_PROPERTY_KEYWORDS.issuperset(schema):
+            return None
+        types = schema.get('type', [])
+        types = [types] if isinstance(types, str) else types
+        if not isinstance(types, list) or not JSON_TYPE_NAMES.issuperset(types):
+            return None
+        enum = schema.get('enum', [])
+        if not isinstance(enum, list) or not all(value is None or isinstance(value, (bool, int, float, str))
+                                                 for value in enum):
+            return None
+        if not all(_is_number(schema.get(keyword, 0)) for keyword in ['minimum', 'maximum']):
+            return None
+        if not all(type(schema.get(keyword, 0)) is int for keyword in ['minLength', 'maxLength']):
+            return None
+        return cls(key, schema, float_integers)
+
+    def check(self, values):
+        """ Returns whether each of `values`, an object array, is valid, and whether it is
+            of a type the check can't classify and has to be validated generically
+        """
+
+        import numpy
+
+        count = len(values)
+        kinds = numpy.fromiter(map(type, values), dtype=object, count=count)
+        is_bool = kinds == bool
+        is_int = kinds == int
+        is_float = kinds == float
+        is_str = kinds == str
+        is_number = is_int | is_float
+        unknown = ~(is_bool | is_number | is_str | (kinds == type(None)) | (kinds == list) | (kinds == dict))
+        valid = numpy.ones(count, dtype=bool)
+
+        if self.types is not None:
+            matches = {
+                'null': lambda: kinds == type(None),
+                'boolean': lambda: is_bool,
+                'number': lambda: is_number,
+                'string': lambda: is_str,
+                'array': lambda: kinds == list,
+                'object': lambda: kinds == dict,
+                'integer': lambda: is_int | self._integral(values, is_float) if self.float_integers else is_int
+            }
+            of_type = numpy.zeros(count, dtype=bool)
+            for name in self.types:
+                of_type |= matches[name]()
+            valid &= of_type
+
+        if self.enum is not None:
+            # as in jsonschema, booleans only equal booleans, and 1 equals 1.0
+            in_enum = numpy.zeros(count, dtype=bool)
+            for member in self.enum:
+                rows = is_bool if isinstance(member, bool) else ~is_bool
+                in_enum |= rows & (values == member)
+            valid &= in_enum
+
+        for bound, failed in [(self.minimum, numpy.less), (self.maximum, numpy.greater)]:
+            if bound is not None and is_number.any():
+                valid[is_number] &= ~failed(values[is_number], bound).astype(bool)
+
+        if (self.min_length is not None or self.max_length is not None) and is_str.any():
+            lengths = numpy.fromiter(map(len, values[is_str]), dtype=numpy.int64, count=int(is_str.sum()))
+            if self.min_length is not None:
+                valid[is_str] &= lengths >= self.min_length
+            if self.max_length is not None:
+                valid[is_str] &= lengths <= self.max_length
+
+        return valid, unknown
+
+    @staticmethod
+    def _integral(values, is_float):
+        import numpy
+        result = numpy.zeros(len(values), dtype=bool)
+        if is_float.any():
+            floats = values[is_float].astype(numpy.float64)
+            with numpy.errstate(invalid='ignore'):
+                result[is_float] = numpy.isfinite(floats) & (numpy.mod(floats, 1) == 0)
+        return result
+
+
+class BatchValidator(object):
+    """ Validates a batch of objects against one schema, checking each constraint over
+        all the objects at once instead of walking them one by one. The `type`,
+        `required` and `properties` of an object schema are checked column by column,
+        as are the `type`, `enum`, `minimum`, `maximum`, `minLength` and `maxLength` of
+        the schemas of its properties.
+
+        Properties whose schemas use anything else are validated with the generic
+        validator, one object at a time, and only for the objects that passed the
+        vectorized checks; a schema that uses anything else at the top level is
+        validated generically altogether. Either way, the verdicts are those of the
+        generic validator, `validator`, which also supplies the draft's notion of an
+        integer and resolves references. Needs NumPy.
+    """
+
+    def __init__(self, validator, schema):
+
+        self.schema = schema
+        self.validator = sub_validator(validator, schema)
+        self.vectorized = False
+        self.required = []
+        self.checks = []
+        self.residual = None
+
+        if not isinstance(schema, dict) or not BATCH_OBJECT_KEYWORDS.issuperset(schema):
+            return
+        if schema.get('type', 'object') != 'object' or getattr(validator, 'format_checker', None) is not None:
+            return
+        from jsonschema.validators import Draft3Validator
+        if isinstance(validator, Draft3Validator):
+            # draft 3 spells `required` differently
+            return
+        required = schema.get('required', [])
+        properties = schema.get('properties', {})
+        if not isinstance(required, list) or not isinstance(properties, dict):
+            return
+
+        float_integers = validator.is_type(1.0, 'integer')
+        residual = {}
+        for key, subschema in properties.items():
+            check = PropertyCheck.compile(key, subschema, float_integers)
+            if check is None:
+                residual[key] = subschema
+            elif set(subschema).difference(ANNOTATION_KEYWORDS):
+                self.checks.append(check)
+
+        self.vectorized = True
+        self.required = required
+        if residual:
+            self.residual = sub_validator(validator, {'properties': residual})
+
+    def invalid_indices(self, objs):
+        """ The indices of the objects in `objs` that don't match the schema, in order """
+
+        if not self.vectorized:
+            return [index for index, obj in enumerate(objs) if not self.validator.is_valid(obj)]
+
+        import numpy
+
+        objs = objs if isinstance(objs, list) else list(objs)
+        count = len(objs)
+        is_dict = numpy.fromiter((type(obj) is dict for obj in objs), dtype=bool, count=count)
+        # anything that isn't a plain dict is left to the generic validator
+        recheck = ~is_dict
+        valid = is_dict.copy()
+
+        for key in self.required:
+            valid &= numpy.fromiter((is_object and key in obj for is_object, obj in zip(is_dict, objs)),
+                                    dtype=bool, count=count)
+
+        for check in self.checks:
+            values = [obj.get(check.key, _MISSING) if is_object else _MISSING
+                      for is_object, obj in zip(is_dict, objs)]
+            present = numpy.fromiter((value is not _MISSING for value in values), dtype=bool, count=count)
+            if not present.all():
+                values = [value for value in values if value is not _MISSING]
+            checked, unknown = check.check(numpy.fromiter(values, dtype=object, count=len(values)))
+            valid[present] &= checked
+            recheck[present] |= unknown
+
+        if self.residual is not None:
+            for index in numpy.flatnonzero(valid & ~recheck):
+                valid[index] = self.residual.is_valid(objs[index])
+        for index in numpy.flatnonzero(recheck):
+            valid[index] = self.validator.is_valid(objs[index])
+
+        return numpy.flatnonzero(~valid).tolist()
+
+    def is_valid(self, objs):
+        return not self.invalid_indices(objs)
+
+    def validate(self, objs):
+        """ Raise the error of the first invalid object, with its index prepended to the
+            error's path, like `JSONSchema.validate_many`
+        """
+        objs = objs if isinstance(objs, list) else list(objs)
+        invalid = self.invalid_indices(objs)
+        if invalid:
+            from jsonschema.exceptions import best_match
+            index = invalid[0]
+            error = best_match(self.validator.iter_errors(objs[index]))
+            error.path.appendleft(index)
+            raise error
+        return True
+
 
 class BaseSchema(object):
 
@@ -22,6 +287,11 @@ class BaseSchema(object):
 
 
 class JSONSchema(BaseSchema):
+    """ A JSON schema that can nest other `JSONSchema` objects. The validator for the
+        schema is compiled once, on first use, and reused for every validation until
+        `replace_objects` or `adjust_references` change the schema. If you modify the
+        dict returned by `schema` directly, call `invalidate` afterwards.
+    """
 
     def __init__(self, schema, recompute_refs=True):
 
@@ -34,39 +304,149 @@ class JSONSchema(BaseSchema):
                 # maybe this is a path to a file
                 schema = json.load(open(os.path.abspath(schema)))
 
-        super(JSONSchema, self).__init__(schema)
+        self._setup(schema)
         self.replace_objects()
         if recompute_refs:
             self.adjust_references()
 
+    def _setup(self, schema):
+        """ Hold `schema`, with nothing compiled from it yet """
+        super(JSONSchema, self).__init__(schema)
+        self.invalidate()
+
+    @classmethod
+    def from_processed(cls, schema):
+        """ Wrap a schema dict whose nested schemas have already been replaced and whose
+            references have already been adjusted, e.g. one saved from the `schema` of
+            another `JSONSchema`, without processing it again
+        """
+        obj = cls.__new__(cls)
+        obj._setup(schema)
+        return obj
+
     @property
     def schema(self):
         return self._schema
 
+    @property
+    def validator(self):
+        """ The compiled validator for the schema, checking the schema itself on first use """
+        if self._validator is None:
+            import jsonschema.validators
+            cls = jsonschema.validators.validator_for(self._schema)
+            cls.check_schema(self._schema)
+            self._validator = cls(self._schema)
+        return self._validator
+
+    def invalidate(self):
+        """ Drop the compiled validators, record class and columns so that they are
+            rebuilt from the current schema
+        """
+        self._validator = None
+        self._record_class = None
+        self._columns = None
+        self._batch_validators = {}
+
+    def batch_validator(self, items=False):
+        """ A `BatchValidator` for a batch of objects that should each match this schema,
+            or, with `items`, for the elements of the array this schema describes
+        """
+        if items not in self._batch_validators:
+            from crest.records import resolve_pointer
+            schema = self._schema
+            if items:
+                if schema.get('type') != 'array' or not isinstance(schema.get('items'), dict):
+                    raise ValueError('The schema does not describe an array of items')
+                schema = schema['items']
+            while isinstance(schema, dict) and list(schema) == ['$ref'] and schema['$ref'].startswith('#'):
+                schema = resolve_pointer(self._schema, schema['$ref'])
+            self._batch_validators[items] = BatchValidator(self.validator, schema)
+        return self._batch_validators[items]
+
+    def _validates_items(self, obj):
+        """ Whether validating `obj` comes down to validating the elements of a list """
+        schema = self._schema
+        return (isinstance(obj, list) and schema.get('type') == 'array' and isinstance(schema.get('items'), dict)
+                and BATCH_ARRAY_KEYWORDS.issuperset(schema))
+
+    def record_class(self):
+        """ A compact `crest.records.Record` class for the objects this schema describes,
+            or for the elements of the array it describes, with a slot for every property.
+            Properties that are objects themselves, directly or through a `$ref`, hold
+            records of their own classes, and arrays of objects hold lists of them.
+        """
+        if self._record_class is None:
+            from crest.records import RecordBuilder
+            builder = RecordBuilder(self._schema)
+            schema = builder.resolve(self._schema)
+            name = schema.get('title') or 'Record'
+            if 'array' in builder.types(schema) and 'items' in schema:
+                schema = schema['items']
+            self._record_class = builder.record_class(schema, name)
+        return self._record_class
+
+    def columns(self):
+        """ The `crest.columns.Column`s of a table of the objects this schema describes,
+            or of the elements of the array it describes, with nested objects flattened
+            into dotted columns
+        """
+        if self._columns is None:
+            from crest.columns import table_columns
+            self._columns = table_columns(self._schema)
+        return self._columns
+
     def validate(self, obj):
-        jsonschema.validate(obj, self._schema)
+        """ Raise the most relevant error if `obj` doesn't match the schema. A list
+            checked against a schema that only constrains its elements is validated in
+            one batch, if NumPy is available, and raises the error of its first invalid
+            element, with the element's index prepended to the error's path.
+        """
+        if self._validates_items(obj) and _has_numpy():
+            return self.batch_validator(items=True).validate(obj)
+
+        from jsonschema.exceptions import best_match
+        error = best_match(self.validator.iter_errors(obj))
+        if error is not None:
+            raise error
+        return True
+
+    def validate_many(self, objs):
+        """ Validate every object in `objs` with the same compiled validator. The first
+            invalid object raises its error, with the object's index prepended to the
+            error's path. With NumPy available the objects are checked in one batch by
+            a `BatchValidator`.
+        """
+        if _has_numpy():
+            return self.batch_validator().validate(objs)
+
+        from jsonschema.exceptions import best_match
+        validator = self.validator
+        for index, obj in enumerate(objs):
+            error = best_match(validator.iter_errors(obj))
+            if error is not None:
+                error.path.appendleft(index)
+                raise error
         return True
 
     def replace_objects(self):
         """ Recursively traverse the current schema, replacing
-            any schema objects found in it with copies of their dicts
+            any schema objects found in it with their dicts. The dicts are not
+            copied; instead, every dict or list on the way to a nested schema
+            is, so neither the nested schema nor the dict this schema was built
+            from are ever modified.
         """
 
-        def recursive_traverse(schema, key):
-            value = schema[key]
-            if isinstance(value, dict):
-                for subkey in value:
-                    recursive_traverse(value, subkey)
-            elif isinstance(value, list):
-                for index, item in enumerate(value):
-                    recursive_traverse(item, index)
-            elif isinstance(value, JSONSchema):
-                value = schema[key] = copy.deepcopy(value.schema)
-                for subkey in value:
-                    recursive_traverse(value, subkey)
-
-        for key in self.schema:
-            recursive_traverse(self.schema, key)
+        self.invalidate()
+
+        def recursive_traverse(key, value):
+            if isinstance(value, JSONSchema):
+                # a nested schema has already replaced the objects inside it
+                return value.schema
+            if isinstance(value, (dict, list)):
+                return _map_children(value, recursive_traverse)
+            return value
+
+        self._schema = recursive_traverse(None, self._schema)
 
     def adjust_references(self):
         """ Recursively crawl the tree and relabel all the references that are
@@ -74,43 +454,100 @@ class JSONSchema(BaseSchema):
             are actually defined in. This logic depends on definitions always
             living inside the `definitions` object, so if that's not true,
             ¯\_(ツ)_/¯
+
+            Every schema object with a `definitions` key opens a scope, and a `$ref` to
+            `#/.../definitions/<name>` resolves to the definition of exactly that name in
+            the nearest enclosing scope. A reference to a name that no enclosing scope
+            defines falls back to a definition of that name anywhere in the tree, and
+            raises a `ValueError` if there are none or more than one.
+
+            Only the objects on the way to a rewritten reference are copied; everything
+            else stays shared with the nested schemas it came from.
         """
 
-        element_references = set()
-        defined_objects = set()
-
-        def recursive_adjust(schema, key, path):
-            value = schema[key]
-            current_path = path + '/' + str(key)
-            parent = path.split('/')[-1]
-            if parent == 'definitions':
-                defined_objects.add(current_path)
-            if key == '$ref':
-                element = value.split('/')[-1]
-                element_references.add((element, current_path))
-            if isinstance(value, dict):
-                for subkey in value:
-                    recursive_adjust(value, subkey, current_path)
-            elif isinstance(value, list):
-                for index, item in enumerate(value):
-                    recursive_adjust(item, index, current_path)
-
-        for key in self.schema:
-            recursive_adjust(self.schema, key, '#')
-
-        for element, location in element_references:
-            new_location = [item for item in defined_objects if item.endswith(element)][0]
-            self._set_element_by_path(location.lstrip('#/'), new_location)
-
-    def _set_element_by_path(self, path, value):
-        """ Takes a slash-delimited absolute path and sets the thing at that path to the value """
-        path = path.split('/')
-        current_element = self.schema
-        for elem in path[:-1]:
-            if elem.isnumeric():
-                elem = int(elem)
-            current_element = current_element[elem]
-        current_element[path[-1]] = value
+        self.invalidate()
+
+        # every definition in the tree by exact name, for references that point
+        # outside of their enclosing scopes; only built if such a reference exists
+        definitions_by_name = {}
+
+        def index_definitions(node, path):
+            if isinstance(node, dict):
+                definitions = node.get('definitions')
+                if isinstance(definitions, dict):
+                    for name in definitions:
+                        definitions_by_name.setdefault(name, []).append('{}/definitions/{}'.format(path, name))
+                items = node.items()
+            elif isinstance(node, list):
+                items = enumerate(node)
+            else:
+                return
+            for key, value in items:
+                index_definitions(value, '{}/{}'.format(path, key))
+
+        def resolve(ref, name, rest, scopes, path):
+            for scope in reversed(scopes):
+                if name in scope:
+                    return scope[name] + rest
+
+            if not definitions_by_name:
+                index_definitions(self._schema, '#')
+            candidates = definitions_by_name.get(name, [])
+            if len(candidates) != 1:
+                problem = 'no definition' if not candidates else 'ambiguous definitions {}'.format(candidates)
+                raise ValueError('Cannot relabel $ref {} at {}/$ref: {} named {!r}'.format(
+                    ref, pointer(path), problem, name))
+            return candidates[0] + rest
+
+        # ids of the subtrees that contain references, so that subtrees shared
+        # between several parents are only inspected once and skipped if clean
+        has_refs_memo = {}
+
+        def has_refs(node):
+            node_id = id(node)
+            if node_id not in has_refs_memo:
+                if isinstance(node, dict):
+                    found = '$ref' in node or any(has_refs(v) for v in node.values() if isinstance(v, (dict, list)))
+                else:
+                    found = any(has_refs(v) for v in node if isinstance(v, (dict, list)))
+                has_refs_memo[node_id] = found
+            return has_refs_memo[node_id]
+
+        def pointer(path):
+            # paths are built as (parent, key) pairs and only formatted when needed
+            keys = []
+            while path is not None:
+                path, key = path
+                keys.append(str(key))
+            return '/'.join(['#'] + keys[::-1])
+
+        def relabel(node, path, scopes):
+            if not isinstance(node, (dict, list)) or not has_refs(node):
+                return node
+
+            if isinstance(node, list):
+                return _map_children(node, lambda index, item: relabel(item, (path, index), scopes))
+
+            definitions = node.get('definitions')
+            if isinstance(definitions, dict):
+                prefix = pointer(path)
+                scopes = scopes + [{name: '{}/definitions/{}'.format(prefix, name) for name in definitions}]
+
+            new_node = _map_children(node, lambda key, value: relabel(value, (path, key), scopes))
+
+            ref = node.get('$ref')
+            if isinstance(ref, str) and ref.startswith('#') and '/definitions/' in ref:
+                # '#/definitions/a/definitions/b/properties/c' -> ('b', '/properties/c')
+                name, _, rest = ref.rsplit('/definitions/', 1)[1].partition('/')
+                rest = '/' + rest if rest else ''
+                new_ref = resolve(ref, name, rest, scopes, path)
+                if new_ref != ref:
+                    if new_node is node:
+                        new_node = dict(node)
+                    new_node['$ref'] = new_ref
+            return new_node
+
+        self._schema = relabel(self._schema, None, [])
 
     def __str__(self):
         return json.dumps(self.schema)
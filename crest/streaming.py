@@ -0,0 +1,148 @@
+import codecs
+import json
+
+
+WHITESPACE = ' \t\n\r'
+
+
+def split_path(path):
+    """ Accept a JSON path either as a dotted string, e.g. 'data.items', or as a
+        sequence of keys, and return it as a tuple
+    """
+    if path is None or path == '':
+        return ()
+    if isinstance(path, str):
+        return tuple(path.split('.'))
+    return tuple(path)
+
+
+def element_schema(result_schema, path=None):
+    """ Find the schema of the elements of the array at `path` in a response described
+        by `result_schema`: for a marshmallow schema by following `Nested` and `List`
+        fields, and for a `crest.schema.JSONSchema` by following `$ref`s, `properties`
+        and finally `items`, in which case the result is a validator for the elements,
+        or None if the schema doesn't describe them
+    """
+
+    if not hasattr(result_schema, 'fields'):
+        return _json_element_schema(result_schema, path)
+
+    schema = result_schema
+    for key in split_path(path):
+        field = schema.fields[key]
+        # List(Nested(...)) keeps the nested field in `inner`
+        field = getattr(field, 'inner', field)
+        schema = field.schema
+    return schema
+
+
+def _json_element_schema(result_schema, path):
+
+    from crest.records import RecordBuilder
+    from crest.schema import sub_validator
+
+    builder = RecordBuilder(result_schema.schema)
+    schema = builder.resolve(result_schema.schema)
+    for key in split_path(path):
+        if not isinstance(schema, dict):
+            return None
+        schema = builder.resolve(schema.get('properties', {}).get(key))
+    items = builder.resolve(schema.get('items')) if isinstance(schema, dict) else None
+    if not isinstance(items, dict):
+        return None
+    return sub_validator(result_schema.validator, items)
+
+
+class JSONArrayStream(object):
+    """ Incrementally parse a JSON document arriving as an iterable of byte chunks, and
+        yield the elements of the array found at `path` one at a time. Only the element
+        being decoded is held in memory, so arbitrarily long arrays can be consumed in
+        constant space.
+    """
+
+    def __init__(self, chunks, path=None, encoding='utf-8'):
+
+        self.path = split_path(path)
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._json = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        """ Append the next chunk to the buffer; returns False once the input is exhausted """
+        if self._eof:
+            return False
+
+        for chunk in self._chunks:
+            text = self._decoder.decode(chunk)
+            if text:
+                # drop what has already been consumed before growing the buffer
+                self._buffer = self._buffer[self._pos:] + text
+                self._pos = 0
+                return True
+
+        self._buffer = self._buffer[self._pos:] + self._decoder.decode(b'', final=True)
+        self._pos = 0
+        self._eof = True
+        return False
+
+    def _peek(self):
+        """ Skip whitespace and return the next character without consuming it """
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError('Unexpected end of JSON input')
+
+    def _expect(self, chars):
+        char = self._peek()
+        if char not in chars:
+            raise ValueError('Expected one of {!r} at offset {}, got {!r}'.format(chars, self._pos, char))
+        self._pos += 1
+        return char
+
+    def _value(self):
+        """ Decode the next complete JSON value """
+        self._peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buffer, self._pos)
+            except ValueError:
+                if not self._fill():
+                    raise
+                continue
+            # a number at the very end of the buffer may continue in the next chunk
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def _descend(self):
+        """ Move to the start of the array at `path` """
+        for key in self.path:
+            self._expect('{')
+            if self._peek() == '}':
+                raise ValueError('Key {!r} not found in JSON input'.format(key))
+            while True:
+                current = self._value()
+                self._expect(':')
+                if current == key:
+                    break
+                self._value()
+                if self._expect(',}') == '}':
+                    raise ValueError('Key {!r} not found in JSON input'.format(key))
+
+    def __iter__(self):
+
+        self._descend()
+        self._expect('[')
+        if self._peek() == ']':
+            return
+        while True:
+            yield self._value()
+            if self._expect(',]') == ']':
+                return
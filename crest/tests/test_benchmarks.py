@@ -0,0 +1,52 @@
+import json
+import unittest
+
+from crest.client import Client
+from crest.benchmarks import suite
+from crest.benchmarks.server import StandInServer
+
+
+class TestStandInServer(unittest.TestCase):
+
+    def test_payload_items(self):
+
+        with StandInServer(payload_items=7) as server, Client(server.url) as client:
+            self.assertEqual(len(client.invoke('anything', 'GET')), 7)
+            self.assertEqual(len(client.invoke('anything', 'GET', params={'items': 2})), 2)
+            self.assertEqual(client.invoke('anything', 'POST', body={})['method'], 'POST')
+
+    def test_error_rate(self):
+
+        with StandInServer(error_rate=0.5, seed=1) as server, Client(server.url, coalesce=False) as client:
+            results = [client.invoke('users/{id}', 'GET', id=i) for i in range(40)]
+
+        failed = [result for result in results if result.get('code') == 500]
+        self.assertEqual(len(failed), server.errors)
+        self.assertTrue(5 < len(failed) < 35)
+
+
+class TestSuite(unittest.TestCase):
+
+    def test_run(self):
+
+        results = suite.run(calls=40, concurrency=4, payload_items=3, error_rate=0.25, items=50,
+                            definitions=20, objects=50)
+        results = json.loads(json.dumps(results))['results']
+
+        self.assertEqual(set(results), {'calls', 'decode', 'load', 'jsonschema'})
+        self.assertGreater(results['calls']['errors'], 0)
+        latency = results['calls']['latency_ms']
+        self.assertLessEqual(latency['p50'], latency['p90'])
+        self.assertLessEqual(latency['p90'], latency['p99'])
+
+        pairs = suite.compare(results, results)
+        self.assertEqual(pairs['decode.bytes'][2], 1.0)
+        self.assertNotIn('calls.latency_ms', pairs)
+
+    def test_percentile(self):
+
+        values = list(range(1, 101))
+        self.assertEqual(suite.percentile(values, 0.5), 50)
+        self.assertEqual(suite.percentile(values, 0.99), 99)
+        self.assertEqual(suite.percentile([3], 0.9), 3)
+        self.assertIsNone(suite.percentile([], 0.5))
@@ -1,9 +1,13 @@
+import os
+import subprocess
+import sys
 import unittest
 import marshmallow
 
 from marshmallow import Schema, fields
-from crest.builder import RESTInterface, RESTBuilder, Get, Post, Delete, Put, GetPost
-from crest.client import Client
+from crest.builder import RESTInterface, RESTBuilder, BatchResult, EndpointTemplate, Get, Post, Delete, Put, GetPost
+from crest.client import Client, AsyncClient
+from crest.benchmarks.server import StandInServer, AsyncStandInServer
 
 
 class TestBuilder(unittest.TestCase):
@@ -185,5 +189,196 @@ class TestBuilder(unittest.TestCase):
         with self.assertRaises(NotImplementedError):
             test_rest.user.delete(id=2)
 
+
+class TestLazyLoading(unittest.TestCase):
+
+    def test_functions_are_made_on_first_use(self):
+
+        class TestREST(RESTInterface):
+            user = GetPost('users/{id}')
+
+        user = TestREST(Client('http://localhost')).user
+        self.assertNotIn('_GET', vars(user))
+
+        get = user._GET
+        self.assertIs(user._GET, get)
+        self.assertTrue(hasattr(user, '_ASYNC_POST'))
+        self.assertFalse(hasattr(user, '_DELETE'))
+        self.assertFalse(hasattr(user, '_other'))
+        with self.assertRaises(NotImplementedError):
+            user.delete(id=1)
+
+    def test_import_is_light(self):
+
+        probe = ('import sys, crest.builder, crest.client, crest.schema; '
+                 'print(sorted(m for m in ("marshmallow", "requests", "aiohttp", "simplejson", "jsonschema") '
+                 'if m in sys.modules))')
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        output = subprocess.run([sys.executable, '-c', probe], cwd=root, capture_output=True, text=True,
+                                check=True).stdout
+        self.assertEqual(output.strip(), '[]')
+
+
+class TestEndpointTemplate(unittest.TestCase):
+
+    def setUp(self):
+
+        class TestREST(RESTInterface):
+            api_base = 'api'
+
+            post = GetPost('users/{user_id}/posts/{post_id}')
+
+        self.server = StandInServer().start()
+        self.client = Client(self.server.url)
+        self.test_rest = TestREST(self.client)
+
+    def tearDown(self):
+
+        self.client.close()
+        self.server.stop()
+
+    def test_expand(self):
+
+        template = EndpointTemplate('api/{a}/x/{b}')
+        self.assertEqual(template.params, ['a', 'b'])
+        self.assertEqual(template.expand(a=1, b='c d/e?'), 'api/1/x/c%20d%2Fe%3F')
+
+    def test_compiled_once(self):
+
+        self.assertIsInstance(self.test_rest.post.template, EndpointTemplate)
+        self.assertEqual(self.test_rest.post.template.param_set, frozenset(['user_id', 'post_id']))
+
+    def test_path_params_are_encoded(self):
+
+        result = self.test_rest.post.get(user_id='a/b', post_id='ü 1', params={'q': 1})
+        self.assertEqual(result['path'], '/api/users/a%2Fb/posts/%C3%BC%201')
+
+    def test_bad_params_rejected_before_io(self):
+
+        with self.assertRaisesRegex(TypeError, r"missing path parameters \['post_id'\]"):
+            self.test_rest.post.get(user_id=1)
+        with self.assertRaisesRegex(TypeError, r"unknown path parameters \['postid'\]"):
+            self.test_rest.post.post(user_id=1, post_id=2, postid=3)
+
+        self.assertEqual(self.server.requests, 0)
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+
+        class TestREST(RESTInterface):
+            api_base = 'api'
+
+            users = Get('users')
+            user = GetPost('users/{id}')
+
+        self.server = StandInServer(latency=0.01).start()
+        self.client = Client(self.server.url)
+        self.test_rest = TestREST(self.client)
+
+    def tearDown(self):
+
+        self.client.close()
+        self.server.stop()
+
+    def test_get_many_in_order(self):
+
+        results = self.test_rest.user.get_many([{'id': i} for i in range(30)], max_workers=4)
+
+        self.assertEqual([r.index for r in results], list(range(30)))
+        self.assertTrue(all(isinstance(r, BatchResult) and r.ok for r in results))
+        self.assertEqual([r.result['path'] for r in results], ['/api/users/{}'.format(i) for i in range(30)])
+        self.assertLessEqual(self.server.connections, 4)
+
+    def test_post_many(self):
+
+        calls = ({'id': i, 'body': {'name': str(i)}} for i in range(10))
+        results = self.test_rest.user.post_many(calls, max_workers=3)
+
+        self.assertEqual([r.result['body'] for r in results], [{'name': str(i)} for i in range(10)])
+
+    def test_as_completed(self):
+
+        results = list(self.test_rest.user.get_many([{'id': i} for i in range(10)], as_completed=True))
+
+        self.assertEqual(sorted(r.index for r in results), list(range(10)))
+
+    def test_errors_do_not_abort_batch(self):
+
+        results = self.test_rest.user.get_many([{'id': 1}, {}, {'id': 3}])
+
+        self.assertTrue(results[0].ok)
+        self.assertFalse(results[1].ok)
+        self.assertIsInstance(results[1].error, TypeError)
+        self.assertEqual(results[1].kwargs, {})
+        self.assertTrue(results[2].ok)
+
+    def test_not_implemented(self):
+
+        with self.assertRaises(NotImplementedError):
+            self.test_rest.users.post_many([{}])
+
+
+class TestAsyncBuilder(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+
+        class TestREST(RESTInterface):
+            api_base = 'api'
+
+            users = Get('users')
+            user = GetPost('users/{id}')
+
+        self.interface_class = TestREST
+        self.server = AsyncStandInServer().start()
+
+    def tearDown(self):
+
+        self.server.stop()
+
+    def test_class_members_have_async_method_functions(self):
+
+        test_rest = self.interface_class(Client(self.server.url))
+        self.assertTrue(hasattr(test_rest.users, '_ASYNC_GET'))
+        self.assertTrue(hasattr(test_rest.user, '_ASYNC_POST'))
+        self.assertFalse(hasattr(test_rest.users, '_ASYNC_POST'))
+
+    async def test_async_calls(self):
+
+        async with AsyncClient(self.server.url) as client:
+            test_rest = self.interface_class(client)
+            result = await test_rest.user.aget(id=2)
+            self.assertEqual(result['path'], '/api/users/2')
+
+            result = await test_rest.user.apost(id=2, body={'name': 'morpheus'})
+            self.assertEqual(result['body'], {'name': 'morpheus'})
+
+    async def test_async_with_schema_validation(self):
+
+        class BadEchoSchema(Schema):
+            path = fields.Integer()
+
+        class TestREST(RESTInterface):
+            user = Get('users/{id}', api_base='api', result_schema=BadEchoSchema(unknown=marshmallow.EXCLUDE))
+
+        async with AsyncClient(self.server.url) as client:
+            test_rest = TestREST(client)
+            with self.assertRaises(marshmallow.exceptions.ValidationError):
+                await test_rest.user.aget(id=2)
+
+    async def test_async_not_implemented(self):
+
+        async with AsyncClient(self.server.url) as client:
+            test_rest = self.interface_class(client)
+            with self.assertRaises(NotImplementedError):
+                await test_rest.users.apost()
+
+    async def test_async_requires_async_client(self):
+
+        test_rest = self.interface_class(Client(self.server.url))
+        with self.assertRaises(TypeError):
+            await test_rest.users.aget()
+
 # TODO: write some tests for validating on the request schema
 # TODO: refactor tests
\ No newline at end of file
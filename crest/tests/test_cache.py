@@ -0,0 +1,166 @@
+import time
+import unittest
+
+from marshmallow import Schema, fields, EXCLUDE
+from crest.builder import RESTInterface, Get
+from crest.cache import CacheEntry, ResponseCache
+from crest.client import Client
+from crest.benchmarks.server import StandInServer
+
+
+class CountingSchema(Schema):
+
+    path = fields.String()
+
+    def __init__(self, *args, **kwargs):
+        super(CountingSchema, self).__init__(*args, unknown=EXCLUDE, **kwargs)
+        self.loads = 0
+
+    def load(self, *args, **kwargs):
+        self.loads += 1
+        return super(CountingSchema, self).load(*args, **kwargs)
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def test_lru_eviction_by_bytes(self):
+
+        cache = ResponseCache(max_bytes=100)
+        cache.put('a', CacheEntry('a', 40, etag='"a"'))
+        cache.put('b', CacheEntry('b', 40, etag='"b"'))
+        # touching a makes b the least recently used entry
+        cache.get('a')
+        cache.put('c', CacheEntry('c', 40, etag='"c"'))
+
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual(cache.size, 80)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_oversized_entries_are_not_cached(self):
+
+        cache = ResponseCache(max_bytes=10)
+        cache.put('a', CacheEntry('a', 11))
+        self.assertEqual(len(cache), 0)
+
+    def test_replacing_entry_updates_size(self):
+
+        cache = ResponseCache(max_bytes=100)
+        cache.put('a', CacheEntry('a', 40))
+        cache.put('a', CacheEntry('a', 10))
+        self.assertEqual(cache.size, 10)
+
+    def test_entry_freshness(self):
+
+        entry = CacheEntry('a', 1, etag='"a"', last_modified='yesterday', ttl=0)
+        self.assertFalse(entry.fresh)
+        self.assertEqual(entry.validators, {'If-None-Match': '"a"', 'If-Modified-Since': 'yesterday'})
+        entry.refresh(60)
+        self.assertTrue(entry.fresh)
+
+    def test_keys(self):
+
+        key1 = ResponseCache.make_key('GET', 'http://host/users', {'a': 1, 'b': 2}, 'token')
+        key2 = ResponseCache.make_key('GET', 'http://host/users', {'b': 2, 'a': 1}, 'token')
+        key3 = ResponseCache.make_key('GET', 'http://host/users', {'b': 2, 'a': 1}, 'other')
+        self.assertEqual(key1, key2)
+        self.assertNotEqual(key1, key3)
+
+
+class TestClientCache(unittest.TestCase):
+
+    def setUp(self):
+
+        self.server = StandInServer().start()
+        self.cache = ResponseCache()
+        self.client = Client(self.server.url, cache=self.cache)
+
+    def tearDown(self):
+
+        self.client.close()
+        self.server.stop()
+
+    def test_revalidation_skips_decoding(self):
+
+        schema = CountingSchema()
+        first = self.client.invoke('users/{id}', 'GET', result_schema=schema, id=2)
+        second = self.client.invoke('users/{id}', 'GET', result_schema=schema, id=2)
+
+        self.assertIs(first, second)
+        self.assertEqual(schema.loads, 1)
+        self.assertEqual(self.server.requests, 2)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+        self.assertEqual(self.cache.stats()['revalidations'], 1)
+
+    def test_ttl_serves_without_request(self):
+
+        for _ in range(3):
+            self.client.invoke('users', 'GET', cache_ttl=60)
+
+        self.assertEqual(self.server.requests, 1)
+        self.assertEqual(self.cache.hits, 2)
+
+    def test_ttl_expiry(self):
+
+        self.client.invoke('users', 'GET', cache_ttl=0.05)
+        time.sleep(0.1)
+        self.client.invoke('users', 'GET', cache_ttl=0.05)
+
+        self.assertEqual(self.server.requests, 2)
+        self.assertEqual(self.cache.revalidations, 1)
+
+    def test_key_includes_params(self):
+
+        self.client.invoke('users', 'GET', params={'page': 1}, cache_ttl=60)
+        result = self.client.invoke('users', 'GET', params={'page': 2}, cache_ttl=60)
+
+        self.assertEqual(result['query'], {'page': '2'})
+        self.assertEqual(self.server.requests, 2)
+
+    def test_only_gets_are_cached(self):
+
+        self.client.invoke('users', 'POST', body={'name': 'morpheus'})
+        self.client.invoke('users', 'POST', body={'name': 'morpheus'})
+
+        self.assertEqual(self.server.requests, 2)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_endpoint_ttl(self):
+
+        class TestREST(RESTInterface):
+            users = Get('users', cache_ttl=60)
+            user = Get('users/{id}')
+
+        test_rest = TestREST(self.client)
+        test_rest.users.get()
+        test_rest.users.get()
+        test_rest.user.get(id=1)
+        test_rest.user.get(id=1)
+
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.revalidations, 1)
+
+    def test_key_includes_how_the_result_is_loaded(self):
+
+        schema = CountingSchema(many=True)
+
+        class TestREST(RESTInterface):
+            users = Get('users', cache_ttl=60)
+            loaded_users = Get('users', cache_ttl=60, result_schema=schema)
+            lazy_users = Get('users', cache_ttl=60, result_schema=schema, validation='lazy')
+
+        test_rest = TestREST(self.client)
+        params = {'items': 2}
+        lazy = test_rest.lazy_users.get(params=params)
+        loaded = test_rest.loaded_users.get(params=params)
+        raw = test_rest.users.get(params=params)
+
+        # the same URL loaded three ways is three entries, none of which is served for another
+        self.assertEqual(type(lazy).__name__, 'LazyRecords')
+        self.assertIsInstance(loaded, list)
+        self.assertEqual(raw[0]['name'], 'item 0')
+        self.assertEqual(len(self.cache), 3)
+        self.assertIs(test_rest.lazy_users.get(params=params), lazy)
+        self.assertIs(test_rest.users.get(params=params), raw)
+        self.assertEqual(self.cache.hits, 2)
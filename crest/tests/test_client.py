@@ -1,9 +1,12 @@
+import asyncio
 import unittest
 import marshmallow
 
 from marshmallow import Schema, fields
-from crest.client import Client
+from crest.client import Client, AsyncClient
+from crest.pagination import PageNumberPagination
 from crest.schema import JSONSchema
+from crest.benchmarks.server import StandInServer, AsyncStandInServer
 
 
 class TestClient(unittest.TestCase):
@@ -150,3 +153,133 @@ class TestClient(unittest.TestCase):
 
         with self.assertRaises(marshmallow.exceptions.ValidationError):
             result = self.client.invoke('api/users/{id}', 'GET', result_schema=result_schema, id=2)
+
+
+class TestClientPooling(unittest.TestCase):
+
+    def setUp(self):
+
+        self.server = StandInServer().start()
+
+    def tearDown(self):
+
+        self.server.stop()
+
+    def test_connection_is_reused(self):
+
+        with Client(self.server.url) as client:
+            for i in range(20):
+                result = client.invoke('users/{id}', 'GET', id=i)
+                self.assertEqual(result['path'], '/users/{}'.format(i))
+            client.invoke('users', 'POST', body={'name': 'morpheus'})
+
+        self.assertEqual(self.server.connections, 1)
+
+    def test_without_keep_alive(self):
+
+        with Client(self.server.url, keep_alive=False) as client:
+            for i in range(5):
+                client.invoke('users/{id}', 'GET', id=i)
+
+        self.assertEqual(self.server.connections, 5)
+
+    def test_pool_is_configurable(self):
+
+        client = Client(self.server.url, pool_connections=2, pool_maxsize=4, pool_block=True)
+        adapter = client.session.get_adapter(self.server.url)
+        self.assertEqual(adapter._pool_connections, 2)
+        self.assertEqual(adapter._pool_maxsize, 4)
+        self.assertTrue(adapter._pool_block)
+        client.close()
+
+    def test_missing_path_params(self):
+
+        with Client(self.server.url) as client:
+            with self.assertRaises(TypeError):
+                client.invoke('users/{id}', 'GET')
+            with self.assertRaises(TypeError):
+                client.invoke('users/{id}/posts/{post_id}', 'GET', id=1)
+            with self.assertRaises(TypeError):
+                client.paginate('users/{id}/posts', 'GET', PageNumberPagination())
+            with self.assertRaises(TypeError):
+                client.stream('users/{id}/posts', 'GET')
+
+        self.assertEqual(self.server.requests, 0)
+
+    def test_path_params_are_encoded(self):
+
+        with Client(self.server.url) as client:
+            # as the interfaces do it, so the same call goes to the same URL either way
+            result = client.invoke('users/{id}/posts', 'GET', id='a/b c')
+            self.assertEqual(result['path'], '/users/a%2Fb%20c/posts')
+            with self.assertRaises(TypeError):
+                client.invoke('users/{id}', 'GET', id=1, other=2)
+
+    def test_close(self):
+
+        client = Client(self.server.url)
+        client.invoke('users', 'GET')
+        client.close()
+        adapter = client.session.get_adapter(self.server.url)
+        self.assertEqual(len(adapter.poolmanager.pools), 0)
+
+
+class TestAsyncClient(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+
+        self.server = AsyncStandInServer().start()
+
+    def tearDown(self):
+
+        self.server.stop()
+
+    async def test_get(self):
+
+        async with AsyncClient(self.server.url) as client:
+            result = await client.invoke('users/{id}', 'GET', id=2, params={'page': 2})
+
+        self.assertEqual(result['method'], 'GET')
+        self.assertEqual(result['path'], '/users/2')
+        self.assertEqual(result['query'], {'page': '2'})
+
+    async def test_missing_path_params(self):
+
+        async with AsyncClient(self.server.url) as client:
+            with self.assertRaises(TypeError):
+                await client.invoke('users/{id}', 'GET')
+
+        self.assertEqual(self.server.requests, 0)
+
+    async def test_post(self):
+
+        data = {'name': 'morpheus', 'job': 'leader'}
+        async with AsyncClient(self.server.url) as client:
+            result = await client.invoke('users', 'POST', body=data)
+
+        self.assertEqual(result['method'], 'POST')
+        self.assertEqual(result['body'], data)
+
+    async def test_concurrent_calls_share_connections(self):
+
+        async with AsyncClient(self.server.url, max_connections=4) as client:
+            results = await asyncio.gather(*[client.invoke('users/{id}', 'GET', id=i) for i in range(20)])
+
+        self.assertEqual([r['path'] for r in results], ['/users/{}'.format(i) for i in range(20)])
+        self.assertLessEqual(self.server.connections, 4)
+
+    async def test_with_schema_validation(self):
+
+        class EchoSchema(Schema):
+            method = fields.String()
+            path = fields.String()
+
+        class BadEchoSchema(Schema):
+            method = fields.Integer()
+
+        async with AsyncClient(self.server.url) as client:
+            result = await client.invoke('users', 'GET', result_schema=EchoSchema(unknown=marshmallow.EXCLUDE))
+            self.assertEqual(result, {'method': 'GET', 'path': '/users'})
+
+            with self.assertRaises(marshmallow.exceptions.ValidationError):
+                await client.invoke('users', 'GET', result_schema=BadEchoSchema(unknown=marshmallow.EXCLUDE))
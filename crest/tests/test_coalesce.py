@@ -0,0 +1,161 @@
+import asyncio
+import threading
+import unittest
+
+from marshmallow import Schema, fields
+from crest.builder import RESTInterface, GetPost
+from crest.client import Client, AsyncClient
+from crest.coalesce import SingleFlight, AsyncSingleFlight
+from crest.benchmarks.server import StandInServer, AsyncStandInServer
+
+
+class CountingSchema(Schema):
+    """ Counts how many times a response is loaded """
+
+    path = fields.String()
+    loads = 0
+
+    def load(self, data, *args, **kwargs):
+        CountingSchema.loads += 1
+        return super(CountingSchema, self).load(data, *args, **kwargs)
+
+    class Meta:
+        unknown = 'exclude'
+
+
+def run_concurrently(func, count):
+    """ Call `func` from `count` threads at once, returning what each call returned or raised """
+
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def run(index):
+        barrier.wait()
+        try:
+            results[index] = func()
+        except Exception as ex:
+            results[index] = ex
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_exceptions_are_shared(self):
+
+        singleflight = SingleFlight()
+        release = threading.Event()
+
+        def fail():
+            release.wait(1)
+            raise ValueError('boom')
+
+        def call():
+            return singleflight.do('key', fail)
+
+        threading.Timer(0.2, release.set).start()
+        results = run_concurrently(call, 5)
+
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+        self.assertEqual(singleflight.stats(), {'calls': 5, 'coalesced': 4, 'in_flight': 0})
+
+    def test_sequential_calls_are_not_coalesced(self):
+
+        singleflight = SingleFlight()
+        self.assertEqual([singleflight.do('key', lambda: i) for i in range(3)], [0, 1, 2])
+        self.assertEqual(singleflight.coalesced, 0)
+
+
+class TestClientCoalescing(unittest.TestCase):
+
+    def setUp(self):
+
+        class TestREST(RESTInterface):
+            user = GetPost('users/{id}', result_schema=CountingSchema())
+
+        CountingSchema.loads = 0
+        self.server = StandInServer(latency=0.2).start()
+        self.client = Client(self.server.url, pool_maxsize=20, coalesce=True)
+        self.test_rest = TestREST(self.client)
+
+    def tearDown(self):
+
+        self.client.close()
+        self.server.stop()
+
+    def test_identical_gets_share_a_request(self):
+
+        results = run_concurrently(lambda: self.test_rest.user.get(id=2), 10)
+
+        self.assertEqual(self.server.requests, 1)
+        self.assertEqual(CountingSchema.loads, 1)
+        self.assertTrue(all(r is results[0] for r in results))
+        self.assertEqual(results[0], {'path': '/users/2'})
+        self.assertEqual(self.client.singleflight.stats(), {'calls': 10, 'coalesced': 9, 'in_flight': 0})
+
+    def test_different_calls_are_not_coalesced(self):
+
+        results = run_concurrently(lambda: self.test_rest.user.get(id=threading.get_ident()), 5)
+        run_concurrently(lambda: self.test_rest.user.post(id=2, body={}), 5)
+
+        self.assertEqual(len(set(r['path'] for r in results)), 5)
+        self.assertEqual(self.server.requests, 10)
+        self.assertEqual(self.client.singleflight.coalesced, 0)
+
+    def test_disabled_by_default(self):
+
+        client = Client(self.server.url)
+        run_concurrently(lambda: client.invoke('users/2', 'GET'), 4)
+
+        self.assertIsNone(client.singleflight)
+        self.assertEqual(self.server.requests, 4)
+        client.close()
+
+
+class TestAsyncClientCoalescing(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+
+        self.server = AsyncStandInServer(latency=0.2).start()
+
+    def tearDown(self):
+
+        self.server.stop()
+
+    async def test_identical_gets_share_a_request(self):
+
+        async with AsyncClient(self.server.url, coalesce=True) as client:
+            results = await asyncio.gather(*[client.invoke('users/{id}', 'GET', id=2) for _ in range(10)],
+                                           client.invoke('users/{id}', 'GET', id=3))
+
+        self.assertEqual(self.server.requests, 2)
+        self.assertTrue(all(r is results[0] for r in results[:10]))
+        self.assertEqual(results[10]['path'], '/users/3')
+        self.assertEqual(client.singleflight.stats(), {'calls': 11, 'coalesced': 9, 'in_flight': 0})
+
+    async def test_cancelled_waiter_does_not_cancel_others(self):
+
+        async with AsyncClient(self.server.url, coalesce=True) as client:
+            first = asyncio.ensure_future(client.invoke('users/2', 'GET'))
+            second = asyncio.ensure_future(client.invoke('users/2', 'GET'))
+            await asyncio.sleep(0.05)
+            first.cancel()
+            self.assertEqual((await second)['path'], '/users/2')
+
+        self.assertTrue(first.cancelled())
+
+    async def test_async_single_flight(self):
+
+        singleflight = AsyncSingleFlight()
+
+        async def compute(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(*[singleflight.do('key', compute, i) for i in range(3)])
+        self.assertEqual(results, [0, 0, 0])
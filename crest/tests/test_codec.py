@@ -0,0 +1,81 @@
+import json
+import unittest
+
+from crest.client import Client
+from crest.codec import JSONCodec, StdlibCodec, available_codecs, get_codec
+from crest.benchmarks.server import StandInServer, StandInHandler
+
+
+class GarbageHandler(StandInHandler):
+    """ Answers every request with a body that isn't JSON """
+
+    def _respond(self):
+        self.server.register_request()
+        self._read_body()
+        payload = b'{"truncated": '
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = _respond
+
+
+class TestCodecs(unittest.TestCase):
+
+    def test_available(self):
+
+        self.assertIn('json', available_codecs())
+        self.assertIsInstance(get_codec(), JSONCodec)
+        codec = StdlibCodec()
+        self.assertIs(get_codec(codec), codec)
+        with self.assertRaises(ValueError):
+            get_codec('yaml')
+
+    def test_round_trip(self):
+
+        document = {'id': 1, 'name': 'é ü', 'values': [1.5, None, True], 'nested': {'a': []}}
+        for name in available_codecs():
+            codec = get_codec(name)
+            encoded = codec.dumps(document)
+            self.assertIsInstance(encoded, bytes)
+            self.assertEqual(codec.loads(encoded), document)
+            self.assertEqual(codec.loads(bytearray(encoded)), document)
+            self.assertEqual(json.loads(encoded), document)
+
+    def test_consistent_errors(self):
+
+        for name in available_codecs():
+            codec = get_codec(name)
+            with self.assertRaises(json.JSONDecodeError) as context:
+                codec.loads(b'{"a": 1')
+            self.assertEqual(context.exception.pos, 7, name)
+            self.assertTrue(context.exception.msg)
+
+            with self.assertRaises(json.JSONDecodeError) as context:
+                codec.loads(b'"\xff"')
+
+            with self.assertRaises(TypeError):
+                codec.dumps({'a': object()})
+
+
+class TestClientCodecs(unittest.TestCase):
+
+    def test_requests_and_responses(self):
+
+        with StandInServer() as server:
+            for name in available_codecs():
+                with Client(server.url, codec=name) as client:
+                    result = client.invoke('users/{id}', 'POST', id=2, body={'name': 'ü'})
+                    self.assertEqual(result['body'], {'name': 'ü'})
+                    self.assertEqual(client.invoke('items', 'GET', params={'items': 3})[2]['id'], 2)
+
+    def test_decode_errors(self):
+
+        with StandInServer(handler=GarbageHandler) as server:
+            for name in available_codecs():
+                with Client(server.url, codec=name) as client:
+                    result = client.invoke('users', 'GET')
+                    self.assertEqual(result['code'], 200)
+                    self.assertEqual(result['content'], b'{"truncated": ')
+                    self.assertIsInstance(result['error'], str)
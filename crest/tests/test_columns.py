@@ -0,0 +1,187 @@
+import math
+import unittest
+
+import numpy
+
+from crest.builder import RESTInterface, Get
+from crest.client import Client
+from crest.columns import to_columns, to_structured
+from crest.schema import JSONSchema
+from crest.benchmarks.server import StandInServer
+
+
+PEOPLE_SCHEMA = JSONSchema({
+    'type': 'array',
+    'items': {'$ref': '#/definitions/person'},
+    'definitions': {
+        'person': {
+            'type': 'object',
+            'required': ['id', 'name', 'address'],
+            'properties': {
+                'id': {'type': 'integer'},
+                'name': {'type': 'string'},
+                'score': {'type': ['number', 'null']},
+                'active': {'type': 'boolean'},
+                'address': {
+                    'type': 'object',
+                    'required': ['city'],
+                    'properties': {
+                        'city': {'type': 'string'},
+                        'zip': {'type': 'integer'}
+                    }
+                },
+                'tags': {'type': 'array', 'items': {'type': 'string'}}
+            }
+        }
+    }
+})
+
+ROWS = [
+    {'id': 1, 'name': 'Ann', 'score': 1.5, 'active': True, 'address': {'city': 'Oslo', 'zip': 150}, 'tags': ['a']},
+    {'id': 2, 'name': 'Bob', 'score': None, 'address': {'city': 'Rome'}, 'extra': 'ignored'},
+    {'id': 3, 'name': 'Cy', 'active': False, 'address': {'city': 'Lima', 'zip': 15001}, 'tags': []}
+]
+
+
+class TestColumns(unittest.TestCase):
+
+    def test_columns(self):
+
+        columns = PEOPLE_SCHEMA.columns()
+        self.assertIs(PEOPLE_SCHEMA.columns(), columns)
+        self.assertEqual([(column.name, column.type, column.nullable) for column in columns], [
+            ('id', 'integer', False),
+            ('name', 'string', False),
+            ('score', 'number', True),
+            ('active', 'boolean', True),
+            ('address.city', 'string', False),
+            ('address.zip', 'integer', True),
+            ('tags', 'array', True)
+        ])
+
+    def test_to_columns(self):
+
+        arrays = to_columns(PEOPLE_SCHEMA.columns(), ROWS)
+
+        self.assertEqual(arrays['id'].dtype, numpy.int64)
+        self.assertNotIsInstance(arrays['id'], numpy.ma.MaskedArray)
+        self.assertEqual(arrays['id'].tolist(), [1, 2, 3])
+        self.assertEqual(arrays['address.city'].tolist(), ['Oslo', 'Rome', 'Lima'])
+
+        # null and missing values are masked, the rest keep their types
+        self.assertEqual(arrays['score'].dtype, numpy.float64)
+        self.assertEqual(arrays['score'].mask.tolist(), [False, True, True])
+        self.assertTrue(math.isnan(arrays['score'].data[1]))
+        self.assertEqual(arrays['active'].tolist(), [True, None, False])
+        self.assertEqual(arrays['address.zip'].dtype, numpy.int64)
+        self.assertEqual(arrays['address.zip'].tolist(), [150, None, 15001])
+        self.assertEqual(arrays['tags'].tolist(), [['a'], None, []])
+
+        # nullable columns are masked even when nothing is missing
+        self.assertIsInstance(to_columns(PEOPLE_SCHEMA.columns(), ROWS[:1])['score'], numpy.ma.MaskedArray)
+        self.assertEqual(to_columns(PEOPLE_SCHEMA.columns(), [])['id'].shape, (0,))
+
+    def test_to_structured(self):
+
+        table = to_structured(PEOPLE_SCHEMA.columns(), ROWS)
+        self.assertIsInstance(table, numpy.ma.MaskedArray)
+        self.assertEqual(table.dtype.names, ('id', 'name', 'score', 'active', 'address.city', 'address.zip', 'tags'))
+        self.assertEqual(table['id'].tolist(), [1, 2, 3])
+        self.assertEqual(table['address.zip'].tolist(), [150, None, 15001])
+        self.assertEqual(table['score'].mask.tolist(), [False, True, True])
+
+        required = [column for column in PEOPLE_SCHEMA.columns() if not column.nullable]
+        table = to_structured(required, ROWS)
+        self.assertNotIsInstance(table, numpy.ma.MaskedArray)
+        self.assertEqual(table[1]['name'], 'Bob')
+
+    def test_errors(self):
+
+        with self.assertRaises(ValueError) as context:
+            to_columns(PEOPLE_SCHEMA.columns(), [{'id': 1, 'address': {'city': 'Oslo'}}])
+        self.assertIn("'name' is missing in row 0", str(context.exception))
+
+        with self.assertRaises(ValueError):
+            to_columns(PEOPLE_SCHEMA.columns(), [{'id': 'one', 'name': 'Ann', 'address': {'city': 'Oslo'}}])
+
+        with self.assertRaises(ValueError):
+            JSONSchema({'type': 'array', 'items': {'type': 'integer'}}).columns()
+
+    def test_values_are_not_converted(self):
+
+        # NumPy would silently truncate, parse or test these for truth
+        person = {'id': 1, 'name': 'Ann', 'address': {'city': 'Oslo'}}
+        for key, value in [('id', 1.5), ('id', '7'), ('id', True), ('active', 'no'), ('active', []),
+                           ('active', 1), ('score', '1.5'), ('score', False), ('name', 3)]:
+            with self.assertRaises(ValueError) as context:
+                to_columns(PEOPLE_SCHEMA.columns(), [person, dict(person, **{key: value})])
+            self.assertIn('in row 1', str(context.exception))
+
+        # as in jsonschema, a float without a fractional part is an integer
+        arrays = to_columns(PEOPLE_SCHEMA.columns(), [dict(person, id=2.0), dict(person, score=3)])
+        self.assertEqual(arrays['id'].tolist(), [2, 1])
+        self.assertEqual(arrays['score'].tolist(), [None, 3.0])
+
+
+class TestColumnResults(unittest.TestCase):
+
+    def setUp(self):
+
+        schema = JSONSchema({
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'required': ['id', 'name', 'value', 'active'],
+                'properties': {
+                    'id': {'type': 'integer'},
+                    'name': {'type': 'string'},
+                    'value': {'type': 'number'},
+                    'active': {'type': 'boolean'}
+                }
+            }
+        })
+
+        class TestREST(RESTInterface):
+
+            columns = Get('items', result_schema=schema, result='columns')
+            table = Get('items', result_schema=schema, result='structured')
+            lazy_columns = Get('items', result_schema=schema, result='columns', validation='lazy')
+            lazy_table = Get('items', result_schema=schema, result='structured', validation='lazy')
+
+        self.server = StandInServer().start()
+        self.client = Client(self.server.url)
+        self.test_rest = TestREST(self.client)
+
+    def tearDown(self):
+
+        self.client.close()
+        self.server.stop()
+
+    def test_results(self):
+
+        columns = self.test_rest.columns.get(params={'items': 10})
+        self.assertEqual(sorted(columns), ['active', 'id', 'name', 'value'])
+        self.assertEqual(columns['value'].sum(), 22.5)
+        self.assertEqual(columns['active'].sum(), 5)
+
+        table = self.test_rest.table.get(params={'items': 10})
+        self.assertEqual(table.shape, (10,))
+        self.assertEqual(table[3]['name'], 'item 3')
+
+        # an object response can't be turned into columns
+        echo_schema = JSONSchema({'type': 'object', 'properties': {'method': {'type': 'string'}}})
+        with self.assertRaises(ValueError):
+            self.client.invoke('echo', 'GET', result_schema=echo_schema, result='columns')
+
+    def test_lazy_validation(self):
+
+        columns = self.test_rest.lazy_columns.get(params={'items': 10})
+        self.assertEqual(sorted(columns), ['active', 'id', 'name', 'value'])
+        self.assertEqual(columns['id'].tolist(), list(range(10)))
+
+        table = self.test_rest.lazy_table.get(params={'items': 10})
+        self.assertEqual(table[3]['name'], 'item 3')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import json
+import unittest
+
+from marshmallow import Schema, fields
+from requests.adapters import HTTPAdapter
+from crest.builder import RESTInterface, Get, GetPost
+from crest.client import Client
+from crest.metrics import Histogram, Metrics, format_labels
+from crest.pagination import PageNumberPagination
+from crest.benchmarks.server import StandInServer
+
+
+class EchoSchema(Schema):
+
+    method = fields.String()
+    path = fields.String()
+
+    class Meta:
+        unknown = 'exclude'
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_buckets(self):
+
+        histogram = Histogram((1, 5, 10))
+        for value in [0.5, 1, 3, 7, 20, 30]:
+            histogram.observe(value)
+
+        self.assertEqual(histogram.counts, [2, 1, 1, 2])
+        self.assertEqual(histogram.cumulative(), [(1, 2), (5, 3), (10, 4), (float('inf'), 6)])
+        self.assertEqual(histogram.sum, 61.5)
+        self.assertEqual(histogram.count, 6)
+
+    def test_labels_are_escaped(self):
+
+        self.assertEqual(format_labels(a='x"y', b='c\\d\n'), 'a="x\\"y",b="c\\\\d\\n"')
+
+
+class TestClientMetrics(unittest.TestCase):
+
+    def setUp(self):
+
+        class TestREST(RESTInterface):
+            api_base = 'api'
+
+            user = GetPost('users/{id}', result_schema=EchoSchema())
+            items = Get('items', pagination=PageNumberPagination(page_size=5, size_param='items'))
+
+        self.server = StandInServer(latency=0.01).start()
+        self.metrics = Metrics()
+        self.client = Client(self.server.url, metrics=self.metrics, coalesce=False)
+        self.test_rest = TestREST(self.client)
+
+    def tearDown(self):
+
+        self.client.close()
+        self.server.stop()
+
+    def snapshot(self):
+        return {(call['endpoint'], call['method']): call for call in self.metrics.snapshot()}
+
+    def test_phases_are_recorded(self):
+
+        for i in range(3):
+            self.test_rest.user.get(id=i)
+        self.test_rest.user.post(id=1, body={})
+
+        calls = self.snapshot()
+        get = calls[('api/users/{id}', 'GET')]
+
+        self.assertEqual(set(get['phases']), {'url', 'connect', 'ttfb', 'read', 'decode', 'load', 'total'})
+        self.assertTrue(all(phase['count'] == 3 for phase in get['phases'].values()))
+        self.assertGreaterEqual(get['phases']['ttfb']['sum'], 0.03)
+        self.assertGreaterEqual(get['phases']['total']['sum'], get['phases']['ttfb']['sum'])
+        self.assertEqual(get['statuses'], {200: 3})
+        self.assertEqual(get['response_bytes']['count'], 3)
+        self.assertEqual(calls[('api/users/{id}', 'POST')]['statuses'], {200: 1})
+
+        # the pooled connection is only opened once
+        connects = get['phases']['connect']['buckets']
+        self.assertGreaterEqual(connects[0][1], 2)
+
+        json.dumps(self.metrics.snapshot())
+
+    def test_direct_and_paginated_calls(self):
+
+        self.client.invoke('users/{id}', 'GET', id=4)
+        list(self.test_rest.items.paginate(max_pages=2))
+
+        calls = self.snapshot()
+        self.assertEqual(calls[('users/{id}', 'GET')]['phases']['total']['count'], 1)
+        self.assertEqual(calls[('api/items', 'GET')]['phases']['total']['count'], 2)
+
+    def test_prometheus(self):
+
+        self.test_rest.user.get(id=1)
+        text = self.metrics.prometheus()
+
+        self.assertIn('# TYPE crest_call_phase_seconds histogram', text)
+        self.assertIn('crest_call_phase_seconds_bucket'
+                      '{endpoint="api/users/{id}",method="GET",phase="ttfb",le="+Inf"} 1', text)
+        self.assertIn('crest_call_phase_seconds_count{endpoint="api/users/{id}",method="GET",phase="load"} 1', text)
+        self.assertIn('crest_responses_total{endpoint="api/users/{id}",method="GET",status="200"} 1', text)
+        self.assertIn('crest_response_bytes_count{endpoint="api/users/{id}",method="GET"} 1', text)
+        self.assertTrue(text.endswith('\n'))
+
+    def test_hooks(self):
+
+        timings = []
+        self.metrics.add_hook(timings.append)
+        self.test_rest.user.get(id=1)
+
+        self.assertEqual(len(timings), 1)
+        self.assertEqual(timings[0].status, 200)
+        self.assertEqual(timings[0].endpoint, 'api/users/{id}')
+        self.assertGreater(timings[0].size, 0)
+
+    def test_disabled(self):
+
+        client = Client(self.server.url)
+
+        self.assertIsNone(client.metrics)
+        self.assertIs(type(client.session.get_adapter(self.server.url)), HTTPAdapter)
+        self.assertEqual(client.session.hooks['response'], [])
+        client.close()
@@ -0,0 +1,170 @@
+import json
+import time
+import unittest
+
+import requests
+
+from urllib.parse import urlsplit, parse_qs
+from crest.builder import RESTInterface, Get
+from crest.client import Client
+from crest.pagination import (PageNumberPagination, OffsetPagination, CursorPagination,
+                              LinkHeaderPagination, paginate)
+from crest.benchmarks.server import StandInServer, StandInHandler
+
+
+TOTAL_ITEMS = 25
+
+
+class PagingHandler(StandInHandler):
+    """ Serves TOTAL_ITEMS items in pages, addressable by page number, offset or cursor """
+
+    def _respond(self):
+        self.server.register_request()
+        parts = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+
+        if parts.path != '/items':
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        per_page = int(query.get('per_page', query.get('limit', 10)))
+        if 'offset' in query:
+            start = int(query['offset'])
+        elif 'cursor' in query:
+            start = int(query['cursor'])
+        else:
+            start = (int(query.get('page', 1)) - 1) * per_page
+        end = min(start + per_page, TOTAL_ITEMS)
+        page = start // per_page + 1
+        total_pages = (TOTAL_ITEMS + per_page - 1) // per_page
+
+        payload = json.dumps({
+            'page': page,
+            'total_pages': total_pages,
+            'data': [{'id': i} for i in range(start, end)],
+            'meta': {'next_cursor': str(end) if end < TOTAL_ITEMS else None}
+        }).encode('utf-8')
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        if page < total_pages:
+            link = '</items?page={0}&per_page={1}>; rel="next", </items?page={2}&per_page={1}>; rel="last"'
+            self.send_header('Link', link.format(page + 1, per_page, total_pages))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = _respond
+
+
+class TestPagination(unittest.TestCase):
+
+    def setUp(self):
+
+        self.server = StandInServer(handler=PagingHandler).start()
+        self.client = Client(self.server.url)
+
+    def tearDown(self):
+
+        self.client.close()
+        self.server.stop()
+
+    def ids(self, pagination, **kwargs):
+        return [item['id'] for item in self.client.paginate('items', 'GET', pagination, **kwargs)]
+
+    def test_page_number(self):
+
+        pagination = PageNumberPagination(items='data', size_param='per_page', page_size=10)
+        self.assertEqual(self.ids(pagination), list(range(TOTAL_ITEMS)))
+        self.assertEqual(self.server.requests, 3)
+
+    def test_total_pages(self):
+
+        pagination = PageNumberPagination(items='data', total_pages='total_pages')
+        self.assertEqual(self.ids(pagination, params={'per_page': 5}), list(range(TOTAL_ITEMS)))
+        self.assertEqual(self.server.requests, 5)
+
+    def test_offset(self):
+
+        pagination = OffsetPagination(items='data', limit=7)
+        self.assertEqual(self.ids(pagination), list(range(TOTAL_ITEMS)))
+
+    def test_cursor(self):
+
+        pagination = CursorPagination(items='data', cursor='meta.next_cursor')
+        self.assertEqual(self.ids(pagination), list(range(TOTAL_ITEMS)))
+
+    def test_link_header(self):
+
+        pagination = LinkHeaderPagination(items='data')
+        self.assertEqual(self.ids(pagination, params={'per_page': 4}), list(range(TOTAL_ITEMS)))
+        self.assertEqual(self.server.requests, 7)
+
+    def test_caps(self):
+
+        pagination = PageNumberPagination(items='data', size_param='per_page', page_size=5)
+
+        self.assertEqual(self.ids(pagination, max_items=7), list(range(7)))
+        self.assertEqual(self.server.requests, 2)
+
+        self.assertEqual(self.ids(pagination, max_pages=3), list(range(15)))
+        self.assertEqual(self.server.requests, 5)
+
+        # a page that satisfies max_items on its own isn't followed by another
+        self.assertEqual(self.ids(pagination, max_items=5), list(range(5)))
+        self.assertEqual(self.server.requests, 6)
+
+    def test_lazy(self):
+
+        items = self.client.paginate('items', 'GET', CursorPagination(items='data', cursor='meta.next_cursor'))
+        self.assertEqual(self.server.requests, 0)
+        next(items)
+        items.close()
+
+    def test_http_error(self):
+
+        with self.assertRaises(requests.HTTPError):
+            list(self.client.paginate('missing', 'GET', CursorPagination(items='data')))
+
+    def test_prefetch_overlaps_consumption(self):
+
+        self.server.latency = 0.1
+        pagination = PageNumberPagination(items='data', size_param='per_page', page_size=5)
+
+        def consume(prefetch):
+            start = time.perf_counter()
+            for item in self.client.paginate('items', 'GET', pagination, prefetch=prefetch):
+                if item['id'] % 5 == 0:
+                    time.sleep(0.1)
+            return time.perf_counter() - start
+
+        serial = consume(prefetch=False)
+        prefetched = consume(prefetch=True)
+        self.assertLess(prefetched, serial * 0.85)
+
+    def test_rest_call(self):
+
+        class TestREST(RESTInterface):
+            items = Get('items', pagination=CursorPagination(items='data', cursor='meta.next_cursor'))
+            other = Get('items')
+
+        test_rest = TestREST(self.client)
+        self.assertEqual([item['id'] for item in test_rest.items.paginate(max_items=12)], list(range(12)))
+
+        with self.assertRaises(ValueError):
+            test_rest.other.paginate()
+
+    def test_paginate_with_plain_fetch(self):
+
+        pages = {None: ([1, 2], 'b'), 'b': ([3], None)}
+
+        def fetch(url, params):
+            items, cursor = pages[params.get('cursor')]
+            return {'items': items, 'next_cursor': cursor}, {}
+
+        self.assertEqual(list(paginate(fetch, CursorPagination(items='items'), 'url')), [1, 2, 3])
@@ -0,0 +1,167 @@
+import threading
+import time
+import unittest
+
+from email.utils import formatdate
+from crest.builder import RESTInterface, Get
+from crest.client import Client
+from crest.ratelimit import HostLimiter, RateLimiter, parse_retry_after, parse_reset
+from crest.benchmarks.server import StandInServer
+
+
+class TestHeaders(unittest.TestCase):
+
+    def test_retry_after(self):
+
+        now = time.time()
+        self.assertEqual(parse_retry_after('3'), 3.0)
+        self.assertAlmostEqual(parse_retry_after(formatdate(now + 10, usegmt=True), now=now), 10.0, delta=1)
+        self.assertEqual(parse_retry_after(formatdate(now - 10, usegmt=True), now=now), 0.0)
+        self.assertIsNone(parse_retry_after('soon'))
+        self.assertIsNone(parse_retry_after(None))
+
+    def test_reset(self):
+
+        self.assertEqual(parse_reset('1.5'), 1.5)
+        self.assertEqual(parse_reset('1700000060', now=1700000000), 60.0)
+        self.assertIsNone(parse_reset(None))
+
+
+class TestHostLimiter(unittest.TestCase):
+
+    def take(self, limiter, count, weight=1):
+
+        start = time.perf_counter()
+        for _ in range(count):
+            limiter.release(limiter.acquire(weight), 200)
+        return time.perf_counter() - start
+
+    def test_token_bucket(self):
+
+        self.assertGreater(self.take(HostLimiter(rate=20, burst=1), 11), 0.45)
+        self.assertLess(self.take(HostLimiter(), 100), 0.1)
+
+    def test_weights(self):
+
+        # a call of weight 4 takes as long to be allowed as four calls of weight 1
+        self.assertGreater(self.take(HostLimiter(rate=40, burst=4), 5, weight=4), 0.35)
+
+    def test_aimd(self):
+
+        limiter = HostLimiter(max_concurrency=8, backoff=0)
+
+        # every request in flight when the server throttles counts as one congestion event
+        started = [limiter.acquire() for _ in range(4)]
+        for request in started:
+            limiter.release(request, 503)
+        self.assertEqual(limiter.concurrency, 4)
+
+        limiter.release(limiter.acquire(), 429)
+        self.assertEqual(limiter.concurrency, 2)
+
+        for _ in range(5):
+            limiter.release(limiter.acquire(), 200)
+        self.assertGreater(limiter.concurrency, 3)
+        self.assertEqual(limiter.stats()['throttled'], 5)
+
+    def test_concurrency_queues_callers(self):
+
+        limiter = HostLimiter(max_concurrency=1)
+        first = limiter.acquire()
+        acquired = threading.Event()
+
+        def second():
+            limiter.release(limiter.acquire())
+            acquired.set()
+
+        threading.Thread(target=second).start()
+        self.assertFalse(acquired.wait(0.2))
+        self.assertEqual(limiter.stats()['waiting'], 1)
+        limiter.release(first, 200)
+        self.assertTrue(acquired.wait(1))
+
+    def test_learns_from_headers(self):
+
+        limiter = HostLimiter()
+
+        limiter.release(limiter.acquire(), 429, {'Retry-After': '0.3'})
+        self.assertGreater(self.take(limiter, 1), 0.25)
+
+        limiter.release(limiter.acquire(), 200, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '0.3'})
+        self.assertGreater(self.take(limiter, 1), 0.25)
+
+        # the remaining quota is spread over the time left until the reset
+        limiter.release(limiter.acquire(), 200, {'X-RateLimit-Remaining': '5', 'X-RateLimit-Reset': '10'})
+        self.assertEqual(limiter.stats()['rate'], 0.5)
+
+
+class TestQuotaServer(unittest.TestCase):
+
+    def setUp(self):
+
+        class TestREST(RESTInterface):
+            user = Get('users/{id}')
+            report = Get('reports/{id}', weight=5)
+
+        self.TestREST = TestREST
+        self.server = StandInServer(quota=10, quota_window=1.0).start()
+
+    def tearDown(self):
+
+        self.server.stop()
+
+    def call_all(self, test_rest, endpoint, count, workers=8):
+
+        results = [None] * count
+        ids = iter(range(count))
+        lock = threading.Lock()
+
+        def work():
+            while True:
+                with lock:
+                    index = next(ids, None)
+                if index is None:
+                    return
+                results[index] = getattr(test_rest, endpoint).get(id=index)
+
+        threads = [threading.Thread(target=work) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_without_limiter_calls_fail(self):
+
+        with Client(self.server.url, pool_maxsize=8) as client:
+            results = self.call_all(self.TestREST(client), 'user', 25)
+
+        self.assertTrue(any(result.get('code') == 429 for result in results))
+
+    def test_limiter_queues_calls_within_quota(self):
+
+        limiter = RateLimiter()
+        start = time.perf_counter()
+        with Client(self.server.url, pool_maxsize=8, rate_limiter=limiter) as client:
+            results = self.call_all(self.TestREST(client), 'user', 25)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual([result['path'] for result in results], ['/users/{}'.format(i) for i in range(25)])
+        # 25 requests at 10 per window need three windows
+        self.assertLess(elapsed, 4.5)
+        self.assertLessEqual(self.server.rejected, 8)
+
+        stats = limiter.stats()
+        self.assertEqual(stats['retries'], self.server.rejected)
+        self.assertIn('127.0.0.1:{}'.format(self.server.server_address[1]), stats['hosts'])
+
+    def test_weights(self):
+
+        limiter = RateLimiter(rate=10, burst=10)
+        start = time.perf_counter()
+        with Client(self.server.url, rate_limiter=limiter) as client:
+            results = self.call_all(self.TestREST(client), 'report', 4, workers=4)
+
+        # each report takes half of the budget of a second
+        self.assertGreater(time.perf_counter() - start, 0.9)
+        self.assertTrue(all('path' in result for result in results))
@@ -0,0 +1,187 @@
+import sys
+import unittest
+
+from crest.builder import RESTInterface, Get
+from crest.client import Client
+from crest.cache import ResponseCache
+from crest.records import Record, attribute_name, class_name
+from crest.schema import JSONSchema
+from crest.benchmarks.server import StandInServer
+
+
+USERS_SCHEMA = {
+    'title': 'users',
+    'type': 'array',
+    'items': {'$ref': '#/definitions/user'},
+    'definitions': {
+        'user': {
+            'type': 'object',
+            'properties': {
+                'id': {'type': 'integer'},
+                'class': {'type': ['string', 'null']},
+                'first-name': {'type': 'string'},
+                'manager': {'$ref': '#/definitions/user'},
+                'address': {
+                    'type': 'object',
+                    'properties': {'city': {'type': 'string'}, 'zip': {'type': 'string'}}
+                },
+                'posts': {
+                    'type': 'array',
+                    'items': {'type': 'object', 'properties': {'title': {'type': 'string'}}}
+                },
+                'tags': {'type': 'array', 'items': {'type': 'string'}}
+            }
+        }
+    }
+}
+
+ITEMS_SCHEMA = JSONSchema({
+    'type': 'array',
+    'items': {
+        'title': 'item',
+        'type': 'object',
+        'properties': {
+            'id': {'type': 'integer'},
+            'name': {'type': 'string'},
+            'value': {'type': 'number'},
+            'active': {'type': 'boolean'}
+        }
+    }
+})
+
+
+class TestRecords(unittest.TestCase):
+
+    def setUp(self):
+
+        self.schema = JSONSchema(USERS_SCHEMA)
+        self.user_class = self.schema.record_class()
+
+    def test_record_class(self):
+
+        user_class = self.user_class
+        self.assertIs(self.schema.record_class(), user_class)
+        self.assertEqual(user_class.__name__, 'User')
+        self.assertTrue(issubclass(user_class, Record))
+        self.assertEqual(user_class.__slots__, ('id', 'class_', 'first_name', 'manager', 'address', 'posts', 'tags'))
+        self.assertEqual(user_class.__annotations__['id'], int)
+        self.assertIs(user_class.__annotations__['manager'], user_class)
+        self.assertEqual(user_class.__annotations__['address'].__name__, 'UserAddress')
+
+        # records have no __dict__, and are much smaller than the dicts they come from
+        record = user_class(id=1)
+        with self.assertRaises(AttributeError):
+            record.other = 1
+        self.assertLess(sys.getsizeof(record), sys.getsizeof(dict.fromkeys(user_class._keys)))
+
+        with self.assertRaises(TypeError):
+            user_class(other=1)
+
+    def test_from_dict(self):
+
+        data = {
+            'id': 2,
+            'class': None,
+            'first-name': 'Janet',
+            'manager': {'id': 1, 'first-name': 'Emma'},
+            'address': {'city': 'Springfield', 'zip': '12345'},
+            'posts': [{'title': 'one'}, {'title': 'two'}],
+            'tags': ['a'],
+            'undeclared': True
+        }
+        user = self.user_class.from_dict(data)
+
+        self.assertEqual(user.first_name, 'Janet')
+        self.assertIsInstance(user.manager, self.user_class)
+        self.assertEqual(user.manager.first_name, 'Emma')
+        self.assertIsNone(user.manager.address)
+        self.assertEqual(user.address.city, 'Springfield')
+        self.assertEqual([post.title for post in user.posts], ['one', 'two'])
+        self.assertEqual(user.tags, ['a'])
+
+        expected = dict(data)
+        del expected['undeclared']
+        expected['manager'] = dict.fromkeys(self.user_class._keys)
+        expected['manager'].update({'id': 1, 'first-name': 'Emma'})
+        self.assertEqual(user.to_dict(), expected)
+        self.assertEqual(self.user_class.from_dict(user.to_dict()), user)
+
+    def test_invalidate(self):
+
+        self.schema.invalidate()
+        self.assertIsNot(self.schema.record_class(), self.user_class)
+
+    def test_names(self):
+
+        self.assertEqual(attribute_name('first-name'), 'first_name')
+        self.assertEqual(attribute_name('class'), 'class_')
+        self.assertEqual(attribute_name('2fa'), '_2fa')
+        self.assertEqual(class_name('user_posts'), 'UserPosts')
+        self.assertEqual(class_name('2d point'), 'Record2dPoint')
+
+    def test_reserved_names(self):
+
+        self.assertEqual(attribute_name('__x'), '_x_')
+        self.assertEqual(attribute_name('__'), '_2_')
+        self.assertEqual(attribute_name('to_dict'), 'to_dict_')
+        self.assertEqual(attribute_name('_fields'), '_fields_')
+
+        keys = ['__x', '__init__', '_fields', '_keys', '_schema', 'from_dict', 'from_list', 'to_dict']
+        schema = JSONSchema({'type': 'object', 'properties': {key: {'type': 'integer'} for key in keys}})
+        record_class = schema.record_class()
+        self.assertFalse(any(field.startswith('__') for field in record_class._fields))
+
+        data = {key: index for index, key in enumerate(keys)}
+        record = record_class.from_dict(data)
+        self.assertEqual(record._x_, 0)
+        self.assertEqual(record.to_dict_, 7)
+        self.assertEqual(record.to_dict(), data)
+        self.assertEqual(record_class.from_list([data]), [record])
+        self.assertEqual(record_class._keys, tuple(keys))
+
+    def test_not_an_object(self):
+
+        with self.assertRaises(ValueError):
+            JSONSchema({'type': 'array', 'items': {'type': 'string'}}).record_class()
+
+
+class TestRecordResults(unittest.TestCase):
+
+    def setUp(self):
+
+        class TestREST(RESTInterface):
+
+            items = Get('items', result_schema=ITEMS_SCHEMA)
+            item_records = Get('items', result_schema=ITEMS_SCHEMA, result='records')
+
+        self.server = StandInServer().start()
+        self.client = Client(self.server.url, cache=ResponseCache(default_ttl=60))
+        self.test_rest = TestREST(self.client)
+
+    def tearDown(self):
+
+        self.client.close()
+        self.server.stop()
+
+    def test_records(self):
+
+        items = self.test_rest.item_records.get(params={'items': 5})
+        self.assertEqual(len(items), 5)
+        self.assertEqual(type(items[3]).__name__, 'Item')
+        self.assertEqual((items[3].id, items[3].name, items[3].value, items[3].active), (3, 'item 3', 1.5, False))
+
+        # the same response as plain JSON is cached apart from its records
+        self.assertEqual(self.test_rest.items.get(params={'items': 5})[3]['name'], 'item 3')
+        self.assertIs(self.test_rest.item_records.get(params={'items': 5}), items)
+        self.assertEqual(self.server.requests, 2)
+
+    def test_unknown_result(self):
+
+        with self.assertRaises(ValueError):
+            Get('items', result='rows')
+        with self.assertRaises(ValueError):
+            self.client.invoke('items', 'GET', result='records', params={'items': 5})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import jsonschema
+
+from crest.registry import SchemaRegistry
+from crest.schema import JSONSchema
+
+
+POINT_SCHEMA = {
+    'title': 'point',
+    'type': 'object',
+    'properties': {
+        'inner': {'$ref': '#/definitions/inner'}
+    },
+    'definitions': {
+        'inner': {
+            'type': 'object',
+            'properties': {'x': {'$ref': '#/definitions/coordinate'}},
+            'definitions': {'coordinate': {'type': 'number'}}
+        }
+    }
+}
+
+
+class TestSchemaRegistry(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.directory, 'cache')
+        self.path = os.path.join(self.directory, 'point.json')
+        self.write(POINT_SCHEMA)
+
+    def tearDown(self):
+
+        shutil.rmtree(self.directory)
+
+    def write(self, schema, mtime=None):
+
+        with open(self.path, 'w') as f:
+            json.dump(schema, f)
+        if mtime is not None:
+            os.utime(self.path, ns=(mtime, mtime))
+
+    def registry(self):
+        return SchemaRegistry(self.cache_dir, search_paths=[self.directory])
+
+    def test_load_by_name_and_path(self):
+
+        registry = self.registry()
+        schema = registry.load('point')
+        self.assertIs(registry.load(self.path), schema)
+        self.assertIs(registry.load('point.json'), schema)
+        self.assertEqual(registry.stats(), {'memory_hits': 2, 'disk_hits': 0, 'misses': 1, 'schemas': 1})
+
+        with self.assertRaises(FileNotFoundError):
+            registry.load('missing')
+
+    def test_warm_start(self):
+
+        expected = JSONSchema(self.path).schema
+        self.assertEqual(self.registry().load('point').schema, expected)
+
+        registry = self.registry()
+        schema = registry.load('point')
+        self.assertEqual(schema.schema, expected)
+        self.assertEqual(registry.stats()['disk_hits'], 1)
+        self.assertEqual(registry.stats()['misses'], 0)
+
+        schema.validate({'inner': {'x': 1.5}})
+        with self.assertRaises(jsonschema.ValidationError):
+            schema.validate({'inner': {'x': 'one'}})
+
+    def test_touched_file(self):
+
+        self.registry().load('point')
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+        registry = self.registry()
+        registry.load('point')
+        self.assertEqual(registry.stats()['disk_hits'], 1)
+
+    def test_modified_file(self):
+
+        registry = self.registry()
+        registry.load('point')
+        stat = os.stat(self.path)
+        changed = dict(POINT_SCHEMA, required=['inner'])
+        self.write(changed, mtime=stat.st_mtime_ns + 10 ** 9)
+
+        # both the in-memory and the on-disk copies are stale
+        schema = registry.load('point')
+        self.assertEqual(schema.schema['required'], ['inner'])
+        self.assertEqual(registry.stats()['misses'], 2)
+
+        fresh = self.registry()
+        self.assertEqual(fresh.load('point').schema['required'], ['inner'])
+        self.assertEqual(fresh.stats()['disk_hits'], 1)
+
+    def test_corrupt_cache(self):
+
+        self.registry().load('point')
+        for name in os.listdir(self.cache_dir):
+            with open(os.path.join(self.cache_dir, name), 'w') as f:
+                f.write('{"version": 1, "sche')
+
+        registry = self.registry()
+        self.assertEqual(registry.load('point').schema, JSONSchema(self.path).schema)
+        self.assertEqual(registry.stats()['misses'], 1)
+        self.assertEqual(self.registry().load('point').schema, JSONSchema(self.path).schema)
+
+    def test_without_cache_dir(self):
+
+        registry = SchemaRegistry(search_paths=[self.directory])
+        self.assertIs(registry.load('point'), registry.load('point'))
+        registry.clear()
+        registry.load('point')
+        self.assertEqual(registry.stats()['misses'], 2)
+
+    def test_concurrent_loads(self):
+
+        registry = self.registry()
+        schemas = []
+        threads = [threading.Thread(target=lambda: schemas.append(registry.load('point'))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertTrue(all(schema is schemas[0] for schema in schemas))
+        self.assertEqual(registry.stats()['misses'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,10 @@
+import copy
+import random
 import unittest
 import jsonschema
 
+from crest.schema import BaseSchema, JSONSchema, sub_validator
+
 
 class TestSchema(unittest.TestCase):
 
@@ -136,4 +140,322 @@ class TestSchema(unittest.TestCase):
         result = outer_schema.validate(test_element)
 
         # presto
-        self.assertTrue(result)
\ No newline at end of file
+        self.assertTrue(result)
+
+    def test_validator_is_compiled_once(self):
+
+        validator = self.test_schema.validator
+        self.test_schema.validate({'name': 'jerry'})
+        self.assertIs(self.test_schema.validator, validator)
+
+        self.test_schema.adjust_references()
+        self.assertIsNot(self.test_schema.validator, validator)
+
+    def test_invalid_schema(self):
+
+        schema = JSONSchema({'type': 'object', 'properties': {'name': {'type': 12}}})
+        with self.assertRaises(jsonschema.exceptions.SchemaError):
+            schema.validate({})
+
+    def test_validate_many(self):
+
+        good_objects = [{'name': 'jerry', 'value': i} for i in range(10)]
+        self.assertTrue(self.test_schema.validate_many(good_objects))
+
+        bad_objects = good_objects + [{'name': 'jerry', 'value': 'ten'}]
+        with self.assertRaises(jsonschema.exceptions.ValidationError) as ctx:
+            self.test_schema.validate_many(bad_objects)
+        self.assertEqual(list(ctx.exception.path), [10, 'value'])
+
+    def test_adjust_references_exact_names(self):
+
+        schema = JSONSchema({
+            'type': 'object',
+            'properties': {
+                'point': {'$ref': '#/definitions/point'},
+                'endpoint': {'$ref': '#/definitions/endpoint'}
+            },
+            'definitions': {
+                'endpoint': {'type': 'string'},
+                'point': {'type': 'number'}
+            }
+        })
+
+        self.assertEqual(schema.schema['properties']['point']['$ref'], '#/definitions/point')
+        self.assertEqual(schema.schema['properties']['endpoint']['$ref'], '#/definitions/endpoint')
+
+    def test_adjust_references_nearest_scope(self):
+
+        inner_schema = JSONSchema({
+            'type': 'object',
+            'properties': {'label': {'$ref': '#/definitions/label'}},
+            'definitions': {'label': {'type': 'string'}}
+        })
+
+        outer_schema = JSONSchema({
+            'type': 'object',
+            'properties': {
+                'label': {'$ref': '#/definitions/label'},
+                'inner': {'$ref': '#/definitions/inner'}
+            },
+            'definitions': {
+                'label': {'type': 'number'},
+                'inner': inner_schema
+            }
+        })
+
+        self.assertEqual(outer_schema.schema['properties']['label']['$ref'], '#/definitions/label')
+        self.assertEqual(outer_schema.schema['definitions']['inner']['properties']['label']['$ref'],
+                         '#/definitions/inner/definitions/label')
+        self.assertTrue(outer_schema.validate({'label': 1, 'inner': {'label': 'one'}}))
+
+        # relabeling is idempotent
+        outer_schema.adjust_references()
+        self.assertEqual(outer_schema.schema['definitions']['inner']['properties']['label']['$ref'],
+                         '#/definitions/inner/definitions/label')
+
+    def test_adjust_references_out_of_scope(self):
+
+        schema = JSONSchema({
+            'type': 'object',
+            'properties': {
+                'point': {'$ref': '#/definitions/point/properties/x'},
+                'self': {'$ref': '#'}
+            },
+            'definitions': {
+                'shape': {
+                    'definitions': {
+                        'point': {'properties': {'x': {'type': 'number'}}}
+                    }
+                }
+            }
+        })
+
+        self.assertEqual(schema.schema['properties']['point']['$ref'],
+                         '#/definitions/shape/definitions/point/properties/x')
+        self.assertEqual(schema.schema['properties']['self']['$ref'], '#')
+
+    def test_adjust_references_errors(self):
+
+        ambiguous = {
+            'type': 'object',
+            'properties': {'point': {'$ref': '#/definitions/point'}},
+            'definitions': {
+                'a': {'definitions': {'point': {'type': 'number'}}},
+                'b': {'definitions': {'point': {'type': 'string'}}}
+            }
+        }
+        with self.assertRaises(ValueError):
+            JSONSchema(ambiguous)
+
+        missing = {
+            'type': 'object',
+            'properties': {'point': {'$ref': '#/definitions/point'}}
+        }
+        with self.assertRaises(ValueError):
+            JSONSchema(missing)
+
+    def test_nested_schemas_are_shared_not_modified(self):
+
+        library = JSONSchema({
+            'type': 'object',
+            'properties': {
+                'point': {'$ref': '#/definitions/point'},
+                'tags': {'type': 'array', 'items': {'enum': ['a', 'b']}}
+            },
+            'definitions': {
+                'point': {'type': 'object', 'properties': {'x': {'type': 'number'}}}
+            }
+        })
+        snapshot = copy.deepcopy(library.schema)
+
+        outer_dict = {
+            'type': 'object',
+            'properties': {
+                'first': {'$ref': '#/definitions/first'},
+                'second': {'$ref': '#/definitions/second'}
+            },
+            'definitions': {
+                'first': library,
+                'second': {'allOf': [library]}
+            }
+        }
+        outer_schema = JSONSchema(outer_dict)
+
+        # neither the nested schema nor the dict the outer schema came from change
+        self.assertEqual(library.schema, snapshot)
+        self.assertIs(outer_dict['definitions']['first'], library)
+
+        first = outer_schema.schema['definitions']['first']
+        second = outer_schema.schema['definitions']['second']['allOf'][0]
+        self.assertEqual(first['properties']['point']['$ref'], '#/definitions/first/definitions/point')
+        self.assertEqual(second['properties']['point']['$ref'], '#/definitions/second/allOf/0/definitions/point')
+
+        # subtrees without rewritten references are shared rather than copied
+        self.assertIsNot(first, library.schema)
+        self.assertIs(first['definitions'], library.schema['definitions'])
+        self.assertIs(first['properties']['tags'], library.schema['properties']['tags'])
+
+        self.assertTrue(outer_schema.validate({'first': {'point': {'x': 1}}, 'second': {'tags': ['a']}}))
+        with self.assertRaises(jsonschema.exceptions.ValidationError):
+            outer_schema.validate({'second': {'point': {'x': 'one'}}})
+
+
+class TestCompiledValidation(unittest.TestCase):
+
+    def test_same_verdicts_as_jsonschema(self):
+
+        schema_dict = {
+            'type': 'object',
+            'properties': {
+                'id': {'type': 'integer'},
+                'name': {'type': 'string'},
+                'point': {'$ref': '#/definitions/point'}
+            },
+            'definitions': {
+                'point': {
+                    'type': 'object',
+                    'properties': {'x': {'type': 'number'}, 'y': {'type': 'number'}}
+                }
+            }
+        }
+        schema = JSONSchema(schema_dict)
+        objects = [{'id': i, 'name': str(i), 'point': {'x': i, 'y': -i}} for i in range(50)]
+        objects += [{'id': 'one'}, {'name': 1}, {'point': {'x': 'one'}}, {'point': []}, []]
+
+        for obj in objects:
+            try:
+                jsonschema.validate(obj, schema_dict)
+                expected = True
+            except jsonschema.exceptions.ValidationError:
+                expected = False
+            self.assertEqual(schema.validator.is_valid(obj), expected)
+            if expected:
+                self.assertTrue(schema.validate(obj))
+            else:
+                with self.assertRaises(jsonschema.exceptions.ValidationError):
+                    schema.validate(obj)
+
+        self.assertTrue(schema.validate_many(objects[:50]))
+        with self.assertRaises(jsonschema.exceptions.ValidationError) as context:
+            schema.validate_many(objects)
+        self.assertEqual(context.exception.path[0], 50)
+
+
+class TestBatchValidator(unittest.TestCase):
+
+    SCHEMA = {
+        'type': 'array',
+        'items': {'$ref': '#/definitions/item'},
+        'definitions': {
+            'item': {
+                'type': 'object',
+                'required': ['id', 'name'],
+                'properties': {
+                    'id': {'type': 'integer', 'minimum': 0, 'maximum': 1000},
+                    'name': {'type': 'string', 'minLength': 1, 'maxLength': 5},
+                    'score': {'type': ['number', 'null'], 'minimum': -1.5},
+                    'kind': {'enum': ['a', 'b', 1, True, None]},
+                    'flag': {'type': 'boolean'},
+                    'tags': {'type': 'array', 'items': {'type': 'string'}},
+                    'small': {'$ref': '#/definitions/small'},
+                    'note': {'description': 'only an annotation'}
+                }
+            },
+            'small': {'type': 'integer', 'maximum': 3}
+        }
+    }
+
+    VALID = {
+        'id': [0, 5, 1000, 3.0],
+        'name': ['a', 'abcde'],
+        'score': [None, 0, 2.5, -1.5],
+        'kind': ['a', 1, 1.0, True, None],
+        'flag': [True, False],
+        'tags': [[], ['x']],
+        'small': [1, 3],
+        'note': [1, 'x', None],
+        'other': [[1]]
+    }
+
+    ANYTHING = [0, 1, -1, 1000, 1001, 1.0, 1.5, True, False, None, 'a', 'b', 'abcdef', '', [], ['x'], [1], {},
+                {'a': 1}, float('inf'), 10 ** 30, 2.0]
+
+    def objects(self, count, seed=7):
+        """ Objects that are mostly valid, with a few wrong values and a few non-objects """
+
+        rng = random.Random(seed)
+        objects = []
+        for _ in range(count):
+            if rng.random() < 0.005:
+                objects.append(rng.choice(self.ANYTHING))
+                continue
+            obj = {}
+            for key, values in self.VALID.items():
+                if rng.random() < (0.97 if key in ('id', 'name') else 0.8):
+                    obj[key] = rng.choice(self.ANYTHING) if rng.random() < 0.01 else rng.choice(values)
+            objects.append(obj)
+        return objects
+
+    def test_same_verdicts_as_jsonschema(self):
+
+        schema = JSONSchema(self.SCHEMA)
+        batch = schema.batch_validator(items=True)
+        self.assertTrue(batch.vectorized)
+        self.assertEqual([check.key for check in batch.checks], ['id', 'name', 'score', 'kind', 'flag'])
+        self.assertEqual(sorted(batch.residual.schema['properties']), ['small', 'tags'])
+
+        generic = sub_validator(schema.validator, self.SCHEMA['items'])
+        for seed in range(3):
+            objects = self.objects(3000, seed)
+            expected = [index for index, obj in enumerate(objects) if not generic.is_valid(obj)]
+            self.assertTrue(expected)
+            self.assertEqual(batch.invalid_indices(objects), expected)
+
+    def test_draft4_integers(self):
+
+        schema = JSONSchema({'$schema': 'http://json-schema.org/draft-04/schema#', 'type': 'object',
+                             'properties': {'id': {'type': 'integer'}}})
+        self.assertEqual(schema.batch_validator().invalid_indices([{'id': 1}, {'id': 1.0}, {'id': True}]), [1, 2])
+        schema = JSONSchema({'type': 'object', 'properties': {'id': {'type': 'integer'}}})
+        self.assertEqual(schema.batch_validator().invalid_indices([{'id': 1}, {'id': 1.0}, {'id': True}]), [2])
+
+        # the same, for the items of an array, which are checked column by column
+        objects = [{'id': 1}, {'id': 1.0}, {'id': True}, {'id': 2.5}]
+        schemas = {}
+        for draft, expected in [('draft-04', [1, 2, 3]), ('draft-07', [2, 3])]:
+            schema = schemas[draft] = JSONSchema({
+                '$schema': 'http://json-schema.org/{}/schema#'.format(draft),
+                'type': 'array',
+                'items': {'type': 'object', 'properties': {'id': {'type': 'integer'}}}
+            })
+            batch = schema.batch_validator(items=True)
+            self.assertTrue(batch.vectorized)
+            self.assertEqual(batch.invalid_indices(objects), expected)
+
+        with self.assertRaises(jsonschema.exceptions.ValidationError):
+            schemas['draft-04'].validate(objects[:2])
+        self.assertTrue(schemas['draft-07'].validate(objects[:2]))
+
+    def test_fallback(self):
+
+        schema = JSONSchema({'type': 'object', 'properties': {'id': {'type': 'integer'}},
+                             'additionalProperties': False})
+        batch = schema.batch_validator()
+        self.assertFalse(batch.vectorized)
+        self.assertEqual(batch.invalid_indices([{'id': 1}, {'id': 1, 'x': 2}, {'id': 'a'}]), [1, 2])
+
+    def test_validate(self):
+
+        schema = JSONSchema(self.SCHEMA)
+        objects = self.objects(500)
+        invalid = set(schema.batch_validator(items=True).invalid_indices(objects))
+        with self.assertRaises(jsonschema.exceptions.ValidationError) as ctx:
+            schema.validate(objects)
+        self.assertEqual(ctx.exception.path[0], min(invalid))
+
+        valid = [obj for index, obj in enumerate(objects) if index not in invalid]
+        self.assertTrue(schema.validate(valid))
+
+        with self.assertRaises(ValueError):
+            JSONSchema({'type': 'object'}).batch_validator(items=True)
@@ -0,0 +1,191 @@
+import json
+import tracemalloc
+import unittest
+
+import jsonschema
+import marshmallow
+import requests
+
+from marshmallow import Schema, fields
+from crest.builder import RESTInterface, Get
+from crest.client import Client
+from crest.schema import JSONSchema
+from crest.streaming import JSONArrayStream, element_schema, split_path
+from crest.benchmarks.server import StandInServer
+
+
+def chunked(data, size):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+def generated_array(count, chunk_size=64 * 1024):
+    """ Produce the bytes of a large JSON array lazily, in chunks """
+    buffer = [b'{"meta": {"skip": [1, 2, {"x": "]"}]}, "data": [']
+    size = len(buffer[0])
+    for i in range(count):
+        item = json.dumps({'id': i, 'name': 'item {}'.format(i)}).encode('utf-8')
+        buffer.append(item if i == 0 else b',' + item)
+        size += len(buffer[-1])
+        if size >= chunk_size:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    buffer.append(b']}')
+    yield b''.join(buffer)
+
+
+class ItemSchema(Schema):
+    id = fields.Integer()
+    name = fields.String()
+    value = fields.Float()
+    active = fields.Boolean()
+
+
+class EnvelopeSchema(Schema):
+    count = fields.Integer()
+    data = fields.List(fields.Nested(ItemSchema))
+
+
+JSON_ITEM = {
+    'type': 'object',
+    'properties': {'id': {'type': 'integer'}, 'name': {'type': 'string'}},
+    'required': ['id']
+}
+
+JSON_ENVELOPE = {
+    'definitions': {'item': JSON_ITEM, 'items': {'type': 'array', 'items': {'$ref': '#/definitions/item'}}},
+    'type': 'object',
+    'properties': {'count': {'type': 'integer'}, 'data': {'$ref': '#/definitions/items'}}
+}
+
+
+class TestJSONArrayStream(unittest.TestCase):
+
+    def test_any_chunking(self):
+
+        document = {
+            'meta': {'a': [1, 2, {'b': '}]'}]},
+            'data': {'x': 1, 'items': [{'id': i, 'text': 'é' * i, 'n': i * 1.25} for i in range(20)]}
+        }
+        raw = json.dumps(document).encode('utf-8')
+
+        for size in [1, 2, 3, 7, 100, len(raw)]:
+            items = list(JSONArrayStream(chunked(raw, size), path='data.items'))
+            self.assertEqual(items, document['data']['items'])
+
+    def test_top_level_array(self):
+
+        self.assertEqual(list(JSONArrayStream([b' [1, 2', b'3, 4.5e1] '])), [1, 23, 45.0])
+        self.assertEqual(list(JSONArrayStream([b'[]'])), [])
+        self.assertEqual(list(JSONArrayStream([b'{"data": []}'], path=['data'])), [])
+
+    def test_errors(self):
+
+        with self.assertRaises(ValueError):
+            list(JSONArrayStream([b'{"other": []}'], path='data'))
+        with self.assertRaises(ValueError):
+            list(JSONArrayStream([b'{"data": 1}'], path='data'))
+        with self.assertRaises(ValueError):
+            list(JSONArrayStream([b'[1, 2'], path=None))
+
+    def test_constant_memory(self):
+
+        peaks = []
+        for count in [5000, 50000]:
+            tracemalloc.start()
+            total = sum(1 for _ in JSONArrayStream(generated_array(count), path='data'))
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            self.assertEqual(total, count)
+
+        # ten times the payload should not need meaningfully more memory
+        self.assertLess(peaks[1], peaks[0] * 2)
+
+    def test_split_path(self):
+
+        self.assertEqual(split_path(None), ())
+        self.assertEqual(split_path('data.items'), ('data', 'items'))
+        self.assertEqual(split_path(['data', 'items']), ('data', 'items'))
+
+    def test_element_schema(self):
+
+        self.assertIsInstance(element_schema(EnvelopeSchema(), 'data'), ItemSchema)
+        item_schema = ItemSchema(many=True)
+        self.assertIs(element_schema(item_schema), item_schema)
+
+    def test_json_element_schema(self):
+
+        validator = element_schema(JSONSchema({'type': 'array', 'items': JSON_ITEM}))
+        self.assertTrue(validator.is_valid({'id': 1}))
+        self.assertFalse(validator.is_valid({'name': 'x'}))
+        # an element is checked against the item schema, not the whole array's
+        self.assertFalse(validator.is_valid([{'id': 1}]))
+
+        validator = element_schema(JSONSchema(JSON_ENVELOPE), 'data')
+        self.assertTrue(validator.is_valid({'id': 1, 'name': 'x'}))
+        self.assertFalse(validator.is_valid({'id': 'x'}))
+
+        self.assertIsNone(element_schema(JSONSchema(JSON_ENVELOPE), 'count'))
+        self.assertIsNone(element_schema(JSONSchema(JSON_ENVELOPE), 'other'))
+        self.assertIsNone(element_schema(JSONSchema({'type': 'array'})))
+
+
+class TestStreamingClient(unittest.TestCase):
+
+    def setUp(self):
+
+        class TestREST(RESTInterface):
+
+            items = Get('items', result_schema=ItemSchema(many=True))
+            envelope = Get('items', result_schema=EnvelopeSchema())
+            bad = Get('items', result_schema=Schema.from_dict({'id': fields.String()})(many=True))
+            json_items = Get('items', result_schema=JSONSchema({'type': 'array', 'items': JSON_ITEM}))
+            json_envelope = Get('items', result_schema=JSONSchema(JSON_ENVELOPE))
+            json_bad = Get('items', result_schema=JSONSchema({'type': 'array', 'items': {'type': 'string'}}))
+
+        self.server = StandInServer().start()
+        self.client = Client(self.server.url)
+        self.test_rest = TestREST(self.client)
+
+    def tearDown(self):
+
+        self.client.close()
+        self.server.stop()
+
+    def test_stream(self):
+
+        items = self.client.stream('items', 'GET', params={'items': 500}, chunk_size=128)
+        self.assertEqual([item['id'] for item in items], list(range(500)))
+
+    def test_stream_path_with_validation(self):
+
+        items = list(self.test_rest.envelope.stream(path='data', validate=True,
+                                                    params={'items': 10, 'envelope': 'data'}))
+        self.assertEqual(len(items), 10)
+        self.assertEqual(items[3], {'id': 3, 'name': 'item 3', 'value': 1.5, 'active': False})
+
+    def test_stream_validation_error(self):
+
+        items = self.test_rest.bad.stream(validate=True, params={'items': 10})
+        with self.assertRaises(marshmallow.exceptions.ValidationError):
+            next(items)
+
+        # without validation the elements come through untouched
+        self.assertEqual(len(list(self.test_rest.bad.stream(params={'items': 10}))), 10)
+
+    def test_stream_json_schema_validation(self):
+
+        items = list(self.test_rest.json_items.stream(validate=True, params={'items': 10}))
+        self.assertEqual([item['id'] for item in items], list(range(10)))
+
+        items = list(self.test_rest.json_envelope.stream(path='data', validate=True,
+                                                         params={'items': 10, 'envelope': 'data'}))
+        self.assertEqual(items[3], {'id': 3, 'name': 'item 3', 'value': 1.5, 'active': False})
+
+        items = self.test_rest.json_bad.stream(validate=True, params={'items': 10})
+        with self.assertRaises(jsonschema.ValidationError):
+            next(items)
+
+    def test_stream_http_error(self):
+
+        with self.assertRaises(requests.HTTPError):
+            list(self.client.stream('nothing', 'OPTIONS'))
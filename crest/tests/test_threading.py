@@ -0,0 +1,112 @@
+import json
+import threading
+import unittest
+
+from concurrent import futures
+from crest.builder import RESTInterface, Get, Post, Put, Delete
+from crest.client import Client
+from crest.benchmarks.server import StandInServer, StandInHandler
+
+
+class HeaderEchoHandler(StandInHandler):
+    """ Echoes the headers a request was sent with, along with its body """
+
+    def _respond(self):
+        self.server.register_request()
+        body = self._read_body()
+        payload = json.dumps({
+            'method': self.command,
+            'path': self.path,
+            'content_type': self.headers.get('Content-Type'),
+            'authorization': self.headers.get('Authorization'),
+            'agent': self.headers.get('X-Agent'),
+            'body': json.loads(body) if body else None
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _respond
+
+
+class TestSharedClient(unittest.TestCase):
+
+    def setUp(self):
+
+        class TestREST(RESTInterface):
+
+            get_user = Get('users/{id}')
+            post_user = Post('users/{id}')
+            put_user = Put('users/{id}')
+            delete_user = Delete('users/{id}')
+
+        self.server = StandInServer(handler=HeaderEchoHandler).start()
+        self.client = Client(self.server.url, token='Bearer secret', headers={'X-Agent': 'crest'},
+                             pool_maxsize=8)
+        self.test_rest = TestREST(self.client)
+
+    def tearDown(self):
+
+        self.client.close()
+        self.server.stop()
+
+    def test_defaults_are_immutable(self):
+
+        with self.assertRaises(TypeError):
+            self.client.headers['Content-Type'] = 'text/plain'
+
+        self.test_rest.post_user.post(id=1, body={})
+        self.assertEqual(dict(self.client.headers), {'X-Agent': 'crest'})
+
+        # replacing the defaults as a whole is fine
+        self.client.headers = {'X-Agent': 'other'}
+        self.assertEqual(self.test_rest.get_user.get(id=1)['agent'], 'other')
+
+    def test_get_after_post_has_no_content_type(self):
+
+        self.test_rest.post_user.post(id=1, body={'a': 1})
+        result = self.test_rest.get_user.get(id=1)
+
+        self.assertIsNone(result['content_type'])
+        self.assertEqual(result['authorization'], 'Bearer secret')
+
+    def test_stress(self):
+
+        threads = 16
+        calls = 100
+        barrier = threading.Barrier(threads)
+
+        def worker(index):
+            barrier.wait()
+            problems = []
+            for i in range(calls):
+                call_id = '{}-{}'.format(index, i)
+                verb = ('get', 'post', 'put', 'delete')[i % 4]
+                endpoint = getattr(self.test_rest, verb + '_user')
+                if verb in ('post', 'put'):
+                    result = getattr(endpoint, verb)(id=call_id, body={'call': call_id})
+                else:
+                    result = getattr(endpoint, verb)(id=call_id)
+
+                expected = {
+                    'method': verb.upper(),
+                    'path': '/users/' + call_id,
+                    'content_type': None if verb == 'get' else 'application/json',
+                    'authorization': 'Bearer secret',
+                    'agent': 'crest',
+                    'body': {'call': call_id} if verb in ('post', 'put') else None
+                }
+                if result != expected:
+                    problems.append((expected, result))
+            return problems
+
+        with futures.ThreadPoolExecutor(max_workers=threads) as executor:
+            problems = [problem for result in executor.map(worker, range(threads)) for problem in result]
+
+        self.assertEqual(problems, [])
+        self.assertEqual(self.server.requests, threads * calls)
+        # threads share the pool instead of each opening their own connections
+        self.assertLessEqual(self.server.connections, 8 + threads)
+        self.assertEqual(dict(self.client.headers), {'X-Agent': 'crest'})
@@ -0,0 +1,209 @@
+import json
+import os
+import tempfile
+import unittest
+
+from concurrent import futures
+from importlib.util import find_spec
+
+from jsonschema import ValidationError
+from requests import HTTPError
+
+from crest.builder import RESTInterface, Get, Post
+from crest.client import Client
+from crest.schema import JSONSchema
+from crest.transport import (InProcessTransport, WSGITransport, RecordingTransport, ReplayTransport, Response,
+                             HTTP2Transport, request_url)
+from crest.benchmarks.server import StandInServer, HTTP2StandInServer, echo_payload
+
+
+USER_SCHEMA = JSONSchema({
+    'type': 'object',
+    'properties': {'id': {'type': 'integer'}, 'name': {'type': 'string'}},
+    'required': ['id', 'name']
+})
+
+
+class UsersREST(RESTInterface):
+
+    api_base = 'api'
+    user = Get('users/{id}', result_schema=USER_SCHEMA)
+    items = Get('items')
+    users = Post('users')
+
+
+class TestInProcessTransport(unittest.TestCase):
+
+    def setUp(self):
+
+        self.requests = []
+
+        def handler(request):
+            self.requests.append(request)
+            if request.path == '/api/users/2':
+                return 200, {'id': 2, 'name': request.query.get('name', 'Janet')}
+            if request.path == '/api/users/3':
+                return 200, {'id': 3}
+            if request.method == 'POST':
+                return Response(201, json.dumps(request.json()).encode('utf-8'))
+            return 404, {'message': 'not found'}
+
+        self.client = Client('http://api.example', transport=InProcessTransport(handler))
+        self.test_rest = UsersREST(self.client)
+
+    def test_call(self):
+
+        self.assertIsNone(self.client.session)
+        self.assertEqual(self.test_rest.user.get(id=2), {'id': 2, 'name': 'Janet'})
+        self.assertEqual(self.test_rest.user.get(id=2, params={'name': 'Emma'})['name'], 'Emma')
+        self.assertEqual(self.requests[-1].url, 'http://api.example/api/users/2?name=Emma')
+        self.assertEqual(self.test_rest.users.post(body={'name': 'Emma'}), {'name': 'Emma'})
+        self.assertEqual(self.requests[-1].headers['Content-Type'], 'application/json')
+
+    def test_errors(self):
+
+        # the schema is applied to the response exactly as it would be over HTTP
+        with self.assertRaises(ValidationError):
+            self.test_rest.user.get(id=3)
+        with self.assertRaises(HTTPError):
+            list(self.client.stream('api/missing', 'GET'))
+
+
+class TestWSGITransport(unittest.TestCase):
+
+    def test_call(self):
+
+        def app(environ, start_response):
+            body = environ['wsgi.input'].read(int(environ.get('CONTENT_LENGTH') or 0))
+            path = environ['PATH_INFO'] + ('?' + environ['QUERY_STRING'] if environ['QUERY_STRING'] else '')
+            start_response('200 OK', [('Content-Type', 'application/json')])
+            return [echo_payload(environ['REQUEST_METHOD'], path, body)]
+
+        with Client('http://api.example', transport=WSGITransport(app)) as client:
+            test_rest = UsersREST(client)
+            self.assertEqual(len(test_rest.items.get(params={'items': 3})), 3)
+            items = client.stream('api/items', 'GET', params={'items': 3})
+            self.assertEqual([item['id'] for item in items], [0, 1, 2])
+            echoed = test_rest.users.post(body={'name': 'Emma'})
+            self.assertEqual((echoed['method'], echoed['path'], echoed['body']),
+                             ('POST', '/api/users', {'name': 'Emma'}))
+
+
+@unittest.skipUnless(find_spec('httpx') and find_spec('h2'), 'HTTP/2 needs httpx and h2')
+class TestHTTP2Transport(unittest.TestCase):
+
+    def setUp(self):
+
+        self.server = HTTP2StandInServer(latency=0.05).start()
+        self.client = Client(self.server.url, transport=HTTP2Transport(max_streams=4, http1=False), coalesce=False)
+        self.test_rest = UsersREST(self.client)
+
+    def tearDown(self):
+
+        self.client.close()
+        self.server.stop()
+
+    def test_multiplexing(self):
+
+        with futures.ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(lambda i: self.test_rest.items.get(params={'items': i}), range(32)))
+
+        self.assertEqual([len(result) for result in results], list(range(32)))
+        # every call went over the one connection, no more than 4 at a time
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.server.requests, 32)
+        self.assertLessEqual(self.server.peak_streams, 4)
+        self.assertGreater(self.server.peak_streams, 1)
+
+    def test_body_and_stream(self):
+
+        echoed = self.test_rest.users.post(body={'name': 'Emma'})
+        self.assertEqual((echoed['method'], echoed['path'], echoed['body']),
+                         ('POST', '/api/users', {'name': 'Emma'}))
+        # bodies streamed from a generator are read off the calling thread
+        self.assertEqual(self.test_rest.users.post(body=({'id': i} for i in range(3)))['body'],
+                         [{'id': 0}, {'id': 1}, {'id': 2}])
+        # larger than a frame and the initial flow control window
+        items = list(self.client.stream('api/items', 'GET', params={'items': 5000}, chunk_size=1024))
+        self.assertEqual([item['id'] for item in items], list(range(5000)))
+        self.assertEqual(self.server.connections, 1)
+
+    def test_options(self):
+
+        with self.assertRaises(ValueError):
+            HTTP2Transport(max_streams=0)
+        with Client(self.server.url, http2=True) as client:
+            self.assertIsInstance(client.transport, HTTP2Transport)
+            self.assertIsNone(client.session)
+
+
+class TestRecordReplay(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'cassette.jsonl')
+
+    def tearDown(self):
+
+        self.directory.cleanup()
+
+    def test_record_replay(self):
+
+        with StandInServer() as server:
+            with Client(server.url, transport=RecordingTransport(self.path)) as client:
+                test_rest = UsersREST(client)
+                recorded = [test_rest.items.get(params={'items': 3, 'envelope': 'data'}),
+                            test_rest.users.post(body={'name': 'Emma'})]
+            url = server.url
+            self.assertEqual(server.requests, 2)
+
+        # the server is gone, so these can only come from the cassette
+        transport = ReplayTransport(self.path)
+        with Client(url, transport=transport) as client:
+            test_rest = UsersREST(client)
+            self.assertEqual(test_rest.items.get(params={'envelope': 'data', 'items': 3}), recorded[0])
+            self.assertEqual(test_rest.users.post(body={'name': 'Emma'}), recorded[1])
+            self.assertEqual([item['id'] for item in client.stream('api/items', 'GET', path='data',
+                                                                    params={'items': 3, 'envelope': 'data'})],
+                             [0, 1, 2])
+            self.assertEqual(transport.replayed, 3)
+
+            with self.assertRaises(LookupError):
+                test_rest.items.get(params={'items': 4})
+            with self.assertRaises(LookupError):
+                test_rest.users.post(body={'name': 'Janet'})
+
+        with self.assertRaises(FileNotFoundError):
+            ReplayTransport(os.path.join(self.directory.name, 'missing.jsonl'))
+
+    def test_redacted_headers(self):
+
+        def handler(request):
+            return 200, [{'id': 2}], {'Set-Cookie': 'session=secret', 'X-Token': 'abc', 'ETag': '"1"'}
+
+        transport = RecordingTransport(self.path, InProcessTransport(handler))
+        with Client('http://api.example', transport=transport) as client:
+            self.assertEqual(client.invoke('users', 'GET'), [{'id': 2}])
+            self.assertEqual(list(client.stream('users', 'GET')), [{'id': 2}])
+
+        transport = RecordingTransport(self.path, InProcessTransport(handler), redact_headers=['x-token'])
+        with Client('http://api.example', transport=transport) as client:
+            client.invoke('users', 'GET', params={'page': 2})
+
+        with open(self.path, encoding='utf-8') as f:
+            saved = [json.loads(line)['response']['headers'] for line in f]
+        self.assertNotIn('secret', json.dumps(saved[:2]))
+        self.assertEqual((saved[0]['ETag'], saved[0]['X-Token']), ('"1"', 'abc'))
+        self.assertEqual(saved[2]['Set-Cookie'], 'session=secret')
+        self.assertNotIn('X-Token', saved[2])
+
+    def test_request_url(self):
+
+        self.assertEqual(request_url('http://a/b', None), 'http://a/b')
+        self.assertEqual(request_url('http://a/b', {'x': 1, 'y': [2, 3], 'z': None}), 'http://a/b?x=1&y=2&y=3')
+        self.assertEqual(request_url('http://a/b?x=1', {'y': 'a b'}), 'http://a/b?x=1&y=a+b')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import mmap
+import tempfile
+import tracemalloc
+import unittest
+
+from crest.builder import RESTInterface, Post, Put
+from crest.client import Client
+from crest.codec import get_codec
+from crest.ratelimit import RateLimiter
+from crest.transport import InProcessTransport
+from crest.uploads import Upload, JSONArrayUpload, NDJSONUpload, encode_body, is_streamed
+from crest.benchmarks.server import StandInServer
+
+
+def records(count):
+    return ({'id': i, 'name': 'item {}'.format(i)} for i in range(count))
+
+
+class UploadREST(RESTInterface):
+
+    api_base = 'api'
+    items = Post('items')
+    item = Put('items/{id}')
+
+
+class TestEncodeBody(unittest.TestCase):
+
+    def setUp(self):
+
+        self.codec = get_codec('json')
+
+    def encode(self, body):
+
+        data, content_type = encode_body(body, self.codec)
+        return b''.join(data) if is_streamed(data) else data, content_type
+
+    def test_bodies(self):
+
+        self.assertEqual(self.encode({'a': 1}), (b'{"a":1}', None))
+        self.assertEqual(self.encode(b'{"a":1}'), (b'{"a":1}', None))
+        self.assertEqual(self.encode(None), (None, None))
+        self.assertEqual(self.encode(chunk for chunk in [b'{"a"', b':1}']), (b'{"a":1}', None))
+        # a generator of anything but bytes is a generator of records
+        self.assertEqual(json.loads(self.encode(records(3))[0]), list(records(3)))
+        self.assertEqual(self.encode(iter([])), (b'[]', None))
+        # a first record that is null is still a record
+        self.assertEqual(self.encode(record for record in [None, {'a': 1}]), (b'[null,{"a":1}]', None))
+        # lists of chunks are streamed too, lists of records are encoded as they were
+        self.assertTrue(is_streamed(encode_body([b'{"a"', b':1}'], self.codec)[0]))
+        self.assertEqual(self.encode([b'{"a"', b':1}']), (b'{"a":1}', None))
+        self.assertEqual(self.encode([{'a': 1}]), (b'[{"a":1}]', None))
+
+    def test_uploads(self):
+
+        self.assertEqual(self.encode(NDJSONUpload(records(2))),
+                         (b'{"id":0,"name":"item 0"}\n{"id":1,"name":"item 1"}\n', 'application/x-ndjson'))
+        self.assertEqual(self.encode(NDJSONUpload([])), (b'', 'application/x-ndjson'))
+        self.assertEqual(self.encode(Upload(b'\x00\x01')), (b'\x00\x01', 'application/octet-stream'))
+
+        # records are sent in chunks of about chunk_size bytes, not one by one or all at once
+        for upload_class in (JSONArrayUpload, NDJSONUpload):
+            chunks = list(upload_class(records(1000), chunk_size=1024).encode(self.codec))
+            self.assertLess(max(len(chunk) for chunk in chunks), 2048)
+            self.assertLess(len(chunks), 60)
+            body = b''.join(chunks)
+            if upload_class is JSONArrayUpload:
+                decoded = json.loads(body)
+            else:
+                decoded = [json.loads(line) for line in body.splitlines()]
+            self.assertEqual(decoded, list(records(1000)))
+
+
+class TestUploads(unittest.TestCase):
+
+    def setUp(self):
+
+        self.server = StandInServer().start()
+        self.client = Client(self.server.url)
+        self.upload_rest = UploadREST(self.client)
+
+    def tearDown(self):
+
+        self.client.close()
+        self.server.stop()
+
+    def test_streams(self):
+
+        self.assertEqual(self.upload_rest.items.post(body=records(3))['body'], list(records(3)))
+        self.assertEqual(self.upload_rest.item.put(id=1, body=iter([b'{"a"', b':1}']))['body'], {'a': 1})
+        self.assertEqual(self.upload_rest.items.post(body=NDJSONUpload(records(2)))['body'],
+                         '{"id":0,"name":"item 0"}\n{"id":1,"name":"item 1"}\n')
+
+    def test_files(self):
+
+        with tempfile.TemporaryFile() as f:
+            f.write(b'{"a":1}')
+            f.seek(0)
+            self.assertEqual(self.upload_rest.items.post(body=f)['body'], {'a': 1})
+            with mmap.mmap(f.fileno(), 0) as mapped:
+                self.assertEqual(self.upload_rest.item.put(id=1, body=mapped)['body'], {'a': 1})
+        self.assertEqual(self.upload_rest.items.post(body=b'{"b":2}')['body'], {'b': 2})
+
+    def test_constant_memory(self):
+
+        def large_records():
+            return ({'id': i, 'padding': 'x' * 1000} for i in range(6000))
+
+        expected = hashlib.sha256()
+        for chunk in JSONArrayUpload(large_records()).encode(self.client.codec):
+            expected.update(chunk)
+
+        tracemalloc.start()
+        try:
+            result = self.client.invoke('api/items?digest', 'POST', body=large_records())
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(result['sha256'], expected.hexdigest())
+        # the upload is several megabytes, but only a chunk of it is ever in memory
+        self.assertGreater(result['length'], 5 * 1024 * 1024)
+        self.assertLess(peak, result['length'] / 5)
+
+    def test_content_type(self):
+
+        headers = []
+
+        def handler(request):
+            headers.append(request.headers)
+            return 200, {}
+
+        with Client('http://api.example', transport=InProcessTransport(handler)) as client:
+            upload_rest = UploadREST(client)
+            upload_rest.items.post(body=NDJSONUpload(records(2)))
+            upload_rest.items.post(body=records(2))
+            upload_rest.items.post(body=Upload(b'\x00', 'image/png'))
+        self.assertEqual([h['Content-Type'] for h in headers],
+                         ['application/x-ndjson', 'application/json', 'image/png'])
+
+    def test_no_retry(self):
+
+        calls = []
+
+        def handler(request):
+            calls.append(request.body)
+            return 429, {'message': 'slow down'}, {'Retry-After': '0'}
+
+        limiter = RateLimiter(max_retries=2)
+        with Client('http://api.example', rate_limiter=limiter, transport=InProcessTransport(handler)) as client:
+            self.assertEqual(client.invoke('items', 'POST', body={'a': 1})['code'], 429)
+            self.assertEqual(len(calls), 3)
+            # a streamed body is used up once it has been sent, so it isn't sent again
+            self.assertEqual(client.invoke('items', 'POST', body=records(3))['code'], 429)
+            self.assertEqual(len(calls), 4)
+        self.assertEqual(limiter.retries, 2)
+
+if __name__ == '__main__':
+    unittest.main()
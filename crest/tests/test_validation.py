@@ -0,0 +1,160 @@
+import unittest
+
+import jsonschema
+import marshmallow
+
+from marshmallow import Schema, fields, validate
+from crest.builder import RESTInterface, Get
+from crest.client import Client
+from crest.schema import JSONSchema
+from crest.validation import (LazyRecords, LazyValidation, SampledValidation, Validation, get_validation,
+                              item_loader)
+from crest.benchmarks.server import StandInServer
+
+
+class ItemSchema(Schema):
+    id = fields.Integer(validate=validate.Range(max=900))
+    name = fields.String()
+    value = fields.Float()
+    active = fields.Boolean()
+
+
+ITEMS_SCHEMA = JSONSchema({
+    'type': 'array',
+    'items': {'$ref': '#/definitions/item'},
+    'definitions': {
+        'item': {
+            'type': 'object',
+            'properties': {'id': {'type': 'integer', 'maximum': 900}},
+            'required': ['id']
+        }
+    }
+})
+
+
+def records(count):
+    return [{'id': i, 'name': 'item {}'.format(i), 'value': i * 0.5, 'active': i % 2 == 0} for i in range(count)]
+
+
+class TestValidation(unittest.TestCase):
+
+    def test_lazy_records(self):
+
+        items = LazyValidation().apply(ItemSchema(many=True), records(1000))
+        self.assertIsInstance(items, LazyRecords)
+        self.assertEqual(len(items), 1000)
+        self.assertEqual(items.loaded, 0)
+
+        self.assertEqual(items[3], records(4)[3])
+        self.assertEqual(items[-100]['id'], 900)
+        self.assertEqual([item['id'] for item in items[10:13]], [10, 11, 12])
+        self.assertEqual(items.loaded, 5)
+        with self.assertRaises(IndexError):
+            items[1000]
+
+        # the same invalid element fails the same way on every access
+        for _ in range(2):
+            with self.assertRaises(marshmallow.ValidationError) as context:
+                items[950]
+            self.assertEqual(list(context.exception.messages), [950])
+        with self.assertRaises(marshmallow.ValidationError) as context:
+            items.load_all()
+        self.assertEqual(list(context.exception.messages), [901])
+
+    def test_lazy_json_schema(self):
+
+        items = LazyValidation().apply(ITEMS_SCHEMA, records(1000))
+        self.assertEqual(items[5]['id'], 5)
+        with self.assertRaises(jsonschema.ValidationError) as context:
+            items[901]
+        self.assertEqual(list(context.exception.path), [901, 'id'])
+
+    def test_objects_are_loaded_eagerly(self):
+
+        self.assertIsNone(item_loader(ItemSchema()))
+        self.assertIsNone(item_loader(JSONSchema({'type': 'object'})))
+        with self.assertRaises(marshmallow.ValidationError):
+            LazyValidation().apply(ItemSchema(), {'id': 1000})
+        self.assertEqual(SampledValidation().apply(ItemSchema(), {'id': 1}), {'id': 1})
+
+    def test_sampled(self):
+
+        sampled = SampledValidation(fraction=0.1, first=10, seed=3)
+        indices = sampled.sample(200)
+        self.assertEqual(indices[:10], list(range(10)))
+        self.assertEqual(len(indices), 29)
+        self.assertEqual(indices, sorted(set(indices)))
+        self.assertEqual(indices, SampledValidation(fraction=0.1, first=10, seed=3).sample(200))
+
+        self.assertEqual(SampledValidation(fraction=0, first=5).sample(3), [0, 1, 2])
+        self.assertEqual(SampledValidation(fraction=1, first=None).sample(4), [0, 1, 2, 3])
+        with self.assertRaises(ValueError):
+            SampledValidation(fraction=2)
+
+        # only the first 900 records are valid, so a sample of the head passes
+        items = records(1000)
+        self.assertIs(SampledValidation(fraction=0, first=100).apply(ItemSchema(many=True), items), items)
+
+        # and a sample of the whole list fails, always on the same element
+        errors = set()
+        for _ in range(3):
+            with self.assertRaises(marshmallow.ValidationError) as context:
+                SampledValidation(fraction=0.5, first=0).apply(ItemSchema(many=True), items)
+            errors.update(context.exception.messages)
+        self.assertEqual(len(errors), 1)
+        self.assertGreater(errors.pop(), 900)
+
+    def test_get_validation(self):
+
+        self.assertIs(get_validation('lazy'), get_validation('lazy'))
+        self.assertIsInstance(get_validation(None), Validation)
+        sampled = SampledValidation(first=3)
+        self.assertIs(get_validation(sampled), sampled)
+        with self.assertRaises(ValueError):
+            get_validation('sometimes')
+
+
+class TestClientValidation(unittest.TestCase):
+
+    def setUp(self):
+
+        class TestREST(RESTInterface):
+
+            items = Get('items', result_schema=ItemSchema(many=True))
+            lazy_items = Get('items', result_schema=ItemSchema(many=True), validation='lazy')
+            sampled_items = Get('items', result_schema=ItemSchema(many=True),
+                                validation=SampledValidation(fraction=0, first=50))
+
+        self.server = StandInServer().start()
+        self.client = Client(self.server.url)
+        self.test_rest = TestREST(self.client)
+
+    def tearDown(self):
+
+        self.client.close()
+        self.server.stop()
+
+    def test_modes(self):
+
+        with self.assertRaises(marshmallow.ValidationError):
+            self.test_rest.items.get(params={'items': 1000})
+
+        items = self.test_rest.lazy_items.get(params={'items': 1000})
+        self.assertEqual(items[0], {'id': 0, 'name': 'item 0', 'value': 0.0, 'active': True})
+        with self.assertRaises(marshmallow.ValidationError):
+            items[999]
+
+        self.assertEqual(len(self.test_rest.sampled_items.get(params={'items': 1000})), 1000)
+
+    def test_client_default(self):
+
+        with Client(self.server.url, validation='lazy') as client:
+            items = client.invoke('items', 'GET', result_schema=ItemSchema(many=True), params={'items': 1000})
+            self.assertIsInstance(items, LazyRecords)
+            items = client.invoke('items', 'GET', result_schema=ItemSchema(many=True), params={'items': 10},
+                                  validation='eager')
+            self.assertIsInstance(items, list)
+
+
+if __name__ == '__main__':
+    unittest.main()
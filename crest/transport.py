@@ -0,0 +1,523 @@
+import base64
+import io
+import json
+import os
+import threading
+
+from collections import defaultdict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from crest.uploads import async_body
+
+# requests is imported when an HTTP transport or a response needs it, so that clients
+# on the in-process transports don't pay for it until they have to
+
+# headers that describe how the body was sent rather than the body a client sees, and
+# that no longer hold once it has been saved decoded
+TRANSFER_HEADERS = frozenset(['content-encoding', 'content-length', 'transfer-encoding', 'connection'])
+
+# response headers a `RecordingTransport` leaves out of its cassette by default, since
+# they carry session cookies or credentials
+REDACTED_HEADERS = frozenset(['set-cookie', 'set-cookie2', 'authorization', 'proxy-authorization',
+                              'authentication-info', 'proxy-authentication-info'])
+
+
+def request_url(url, params=None):
+    """ The URL a request is actually sent to: `url` with `params` appended to its query
+        string, the way `requests` does it
+    """
+    if not params:
+        return url
+    if isinstance(params, dict):
+        params = [(key, value) for key, values in params.items()
+                  for value in (values if isinstance(values, (list, tuple)) else [values]) if value is not None]
+    query = urlencode(params, doseq=True)
+    parts = urlsplit(url)
+    return urlunsplit(parts._replace(query='{}&{}'.format(parts.query, query) if parts.query else query))
+
+
+def body_bytes(data):
+    """ A request body, which may be None, bytes, a str or an iterable of chunks, as bytes """
+    if data is None:
+        return b''
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return bytes(data)
+    if isinstance(data, str):
+        return data.encode('utf-8')
+    if hasattr(data, 'read'):
+        return body_bytes(data.read())
+    return b''.join(chunk.encode('utf-8') if isinstance(chunk, str) else bytes(chunk) for chunk in data)
+
+
+class Request(object):
+    """ A request as a transport that doesn't go over the network sees it: `url`
+        already includes the query, `query` holds it decoded, and `body` is bytes
+    """
+
+    def __init__(self, method, url, headers=None, body=b''):
+
+        self.method = method
+        self.url = url
+        self.headers = dict(headers or {})
+        self.body = body
+
+        parts = urlsplit(url)
+        self.path = parts.path or '/'
+        self.query_string = parts.query
+        self.query = dict(parse_qsl(parts.query, keep_blank_values=True))
+
+    def json(self):
+        return json.loads(self.body) if self.body else None
+
+    def __repr__(self):
+        return 'Request({!r}, {!r})'.format(self.method, self.url)
+
+
+class Response(object):
+    """ A complete response produced without the network, with the parts of the
+        interface of a `requests.Response` that the clients use
+    """
+
+    def __init__(self, status_code, content=b'', headers=None, reason=None, url=None):
+
+        from requests.structures import CaseInsensitiveDict
+        from http.client import responses
+
+        self.status_code = status_code
+        self.content = content
+        self.headers = CaseInsensitiveDict(headers or {})
+        self.reason = reason if reason is not None else responses.get(status_code, '')
+        self.url = url
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=1):
+        size = chunk_size or len(self.content) or 1
+        for start in range(0, len(self.content), size):
+            yield self.content[start:start + size]
+
+    def raise_for_status(self):
+        if 400 <= self.status_code < 600:
+            from requests import HTTPError
+            raise HTTPError('{} {} for url: {}'.format(self.status_code, self.reason, self.url), response=self)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        return '<Response [{}]>'.format(self.status_code)
+
+
+class Transport(object):
+    """ What a `Client` sends its requests through. `request` takes the method, the URL,
+        the headers, the query `params`, the encoded body as `data`, the basic `auth`
+        credentials and whether to `stream` the response, and returns a response with
+        the interface of a `requests.Response`: `status_code`, `reason`, `headers`,
+        `content`, `iter_content`, `raise_for_status` and `close`.
+    """
+
+    def request(self, method, url, headers=None, params=None, data=None, auth=None, stream=False):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class HTTPTransport(Transport):
+    """ The default transport: HTTP/1.1 through a pooled `requests.Session`, with the
+        pool options of `Client`. With `metrics`, the connections are instrumented so
+        that calls record their connect and wait times.
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_block=False, keep_alive=True, metrics=None):
+
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter_class = HTTPAdapter
+        if metrics is not None:
+            from crest.metrics import TimedHTTPAdapter, mark_headers
+            adapter_class = TimedHTTPAdapter
+            session.hooks['response'].append(mark_headers)
+        adapter = adapter_class(pool_connections=pool_connections,
+                                pool_maxsize=pool_maxsize,
+                                pool_block=pool_block)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if not keep_alive:
+            session.headers['Connection'] = 'close'
+        self.session = session
+
+    def request(self, method, url, headers=None, params=None, data=None, auth=None, stream=False):
+        return self.session.request(method, url, headers=headers, params=params, data=data, auth=auth,
+                                    stream=stream)
+
+    def close(self):
+        self.session.close()
+
+
+class StreamedResponse(object):
+    """ A `requests.Response`-like view of an `httpx.Response` of an `HTTP2Transport`
+        whose body hasn't been read yet; it is read chunk by chunk on the transport's
+        event loop as it is iterated over
+    """
+
+    def __init__(self, transport, response, semaphore):
+
+        self.status_code = response.status_code
+        self.reason = response.reason_phrase
+        self.headers = response.headers
+        self.url = str(response.url)
+        self._transport = transport
+        self._response = response
+        self._semaphore = semaphore
+
+    @property
+    def content(self):
+        return self._transport.call(self._response.aread())
+
+    def iter_content(self, chunk_size=1):
+        chunks = self._response.aiter_bytes(chunk_size)
+        while True:
+            try:
+                yield self._transport.call(chunks.__anext__())
+            except StopAsyncIteration:
+                return
+
+    def raise_for_status(self):
+        Response.raise_for_status(self)
+
+    def close(self):
+        if self._semaphore is not None:
+            semaphore, self._semaphore = self._semaphore, None
+            self._transport.call(self._transport.release(self._response, semaphore))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class HTTP2Transport(Transport):
+    """ HTTP/2 through an `httpx.AsyncClient` running on an event loop in a background
+        thread, which multiplexes the concurrent requests of every thread over a single
+        connection per host instead of one connection per request in flight. At most
+        `max_streams` requests are sent to a host at the same time, on top of the limit
+        the server advertises; the others wait for a stream to free up. HTTPS hosts
+        negotiate HTTP/2 and fall back to HTTP/1.1 if they don't speak it; with
+        `http1=False`, HTTP/2 is also spoken to plain http:// hosts, which then have to
+        support it.
+
+        Needs httpx with its HTTP/2 extra, e.g. `pip install cREST[http2]`.
+    """
+
+    def __init__(self, max_streams=100, http1=True, keep_alive=True, timeout=None, metrics=None):
+
+        try:
+            import httpx
+            import h2  # noqa: F401
+        except ImportError:
+            raise ImportError('HTTP2Transport requires httpx and h2; install them with '
+                              '`pip install cREST[http2]`') from None
+
+        if max_streams < 1:
+            raise ValueError('max_streams must be at least 1, not {}'.format(max_streams))
+        import asyncio
+
+        self.max_streams = max_streams
+        self.metrics = metrics
+        # the sync HTTP/2 connections of httpx can't be shared between threads, so every
+        # request runs on one event loop and the calling threads wait for their own
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='crest-http2', daemon=True)
+        self._thread.start()
+        limits = httpx.Limits(max_keepalive_connections=None if keep_alive else 0)
+        self.client = httpx.AsyncClient(http1=http1, http2=True, limits=limits, timeout=timeout)
+        self._streams = {}
+
+    def call(self, coroutine):
+        """ Run a coroutine on the transport's event loop and wait for its result """
+        import asyncio
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def send(self, method, url, headers, data, auth):
+        """ Open a stream and return the response once its headers have arrived, with
+            the semaphore of its host, which is released by `release`
+        """
+
+        import asyncio
+
+        parts = urlsplit(url)
+        origin = (parts.scheme, parts.netloc)
+        semaphore = self._streams.get(origin)
+        if semaphore is None:
+            semaphore = self._streams[origin] = asyncio.Semaphore(self.max_streams)
+
+        await semaphore.acquire()
+        try:
+            request = self.client.build_request(method, url, headers=headers, content=async_body(data))
+            response = await self.client.send(request, auth=auth, stream=True)
+        except BaseException:
+            semaphore.release()
+            raise
+        return response, semaphore
+
+    async def read(self, response, semaphore):
+        try:
+            return await response.aread()
+        finally:
+            await self.release(response, semaphore)
+
+    @staticmethod
+    async def release(response, semaphore):
+        try:
+            await response.aclose()
+        finally:
+            semaphore.release()
+
+    async def fetch(self, method, url, headers, data, auth):
+        """ Send a request and read its whole response in one go on the event loop """
+        response, semaphore = await self.send(method, url, headers, data, auth)
+        return response, await self.read(response, semaphore)
+
+    def request(self, method, url, headers=None, params=None, data=None, auth=None, stream=False):
+
+        url = request_url(url, params)
+        if not stream and self.metrics is None:
+            # one hop to the event loop and back instead of two
+            response, content = self.call(self.fetch(method, url, headers, data, auth))
+        else:
+            response, semaphore = self.call(self.send(method, url, headers, data, auth))
+            if self.metrics is not None:
+                from crest.metrics import mark_headers
+                mark_headers(response)
+            if stream:
+                return StreamedResponse(self, response, semaphore)
+            content = self.call(self.read(response, semaphore))
+        return Response(response.status_code, content, response.headers, reason=response.reason_phrase, url=url)
+
+    def close(self):
+
+        if self._thread is None:
+            return
+        self.call(self.client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+        self._loop.close()
+
+
+class InProcessTransport(Transport):
+    """ Dispatches every request to a Python function in the same process, without any
+        sockets. `handler(request)` gets a `Request` and returns a `Response`, or a
+        `(status, body)` or `(status, body, headers)` tuple, where a body that isn't
+        bytes or a str is encoded as JSON.
+    """
+
+    def __init__(self, handler):
+
+        self.handler = handler
+
+    def request(self, method, url, headers=None, params=None, data=None, auth=None, stream=False):
+
+        request = Request(method, request_url(url, params), headers, body_bytes(data))
+        result = self.handler(request)
+        if isinstance(result, Response):
+            result.url = result.url or request.url
+            return result
+
+        status, body = result[:2]
+        response_headers = dict(result[2]) if len(result) > 2 else {}
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        elif not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+            response_headers.setdefault('Content-Type', 'application/json')
+        return Response(status, body, response_headers, url=request.url)
+
+
+class WSGITransport(Transport):
+    """ Dispatches every request to a WSGI application in the same process, without any
+        sockets, e.g. a Flask or Django app, or a test double. `environ` holds extra
+        keys for the WSGI environment of every request.
+    """
+
+    def __init__(self, app, environ=None):
+
+        self.app = app
+        self.environ = dict(environ or {})
+
+    def make_environ(self, request):
+
+        parts = urlsplit(request.url)
+        scheme = parts.scheme or 'http'
+        environ = {
+            'REQUEST_METHOD': request.method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': request.path,
+            'QUERY_STRING': request.query_string,
+            'SERVER_NAME': parts.hostname or 'localhost',
+            'SERVER_PORT': str(parts.port or (443 if scheme == 'https' else 80)),
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'CONTENT_LENGTH': str(len(request.body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scheme,
+            'wsgi.input': io.BytesIO(request.body),
+            'wsgi.errors': io.StringIO(),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False
+        }
+        for name, value in request.headers.items():
+            key = name.upper().replace('-', '_')
+            if key == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif key != 'CONTENT_LENGTH':
+                environ['HTTP_' + key] = value
+        environ.update(self.environ)
+        return environ
+
+    def request(self, method, url, headers=None, params=None, data=None, auth=None, stream=False):
+
+        request = Request(method, request_url(url, params), headers, body_bytes(data))
+        if auth is not None:
+            credentials = base64.b64encode('{}:{}'.format(*auth).encode('utf-8')).decode('ascii')
+            request.headers.setdefault('Authorization', 'Basic ' + credentials)
+
+        started = []
+
+        def start_response(status, response_headers, exc_info=None):
+            started[:] = [status, response_headers]
+
+        chunks = self.app(self.make_environ(request), start_response)
+        try:
+            content = b''.join(chunks)
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+        status, response_headers = started
+        code, _, reason = status.partition(' ')
+        return Response(int(code), content, response_headers, reason=reason, url=request.url)
+
+
+def _encode_body(body):
+    """ A body as it is saved in a cassette: text if it is UTF-8, base64 otherwise """
+    try:
+        return {'body': body.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {'body_base64': base64.b64encode(body).decode('ascii')}
+
+
+def _decode_body(saved):
+    if 'body_base64' in saved:
+        return base64.b64decode(saved['body_base64'])
+    return saved.get('body', '').encode('utf-8')
+
+
+def exchange_key(method, url, body):
+    """ What a request is matched on when it is replayed: its method, its URL with the
+        query sorted, and its body
+    """
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return method.upper(), urlunsplit(parts._replace(query=query)), body
+
+
+class RecordingTransport(Transport):
+    """ Sends requests through another transport, an `HTTPTransport` by default, and
+        appends every exchange to the cassette at `path`, one JSON object per line, so
+        that a `ReplayTransport` can serve it back later. Request headers are not saved,
+        and neither are the response headers named in `redact_headers`, which are the
+        `REDACTED_HEADERS` unless given, so that credentials and session cookies don't
+        end up in the cassette.
+    """
+
+    def __init__(self, path, transport=None, redact_headers=REDACTED_HEADERS):
+
+        self.path = path
+        self.transport = transport if transport is not None else HTTPTransport()
+        self.redact_headers = frozenset(name.lower() for name in redact_headers)
+        self._lock = threading.Lock()
+
+    def request(self, method, url, headers=None, params=None, data=None, auth=None, stream=False):
+
+        body = body_bytes(data)
+        # a streamed response is read in full to be saved, but is still handed back as
+        # one, so the caller can iterate over its content
+        response = self.transport.request(method, url, headers=headers, params=params, data=body or None,
+                                          auth=auth, stream=stream)
+        dropped = TRANSFER_HEADERS.union(self.redact_headers)
+        exchange = {
+            'request': dict({'method': method, 'url': request_url(url, params)}, **_encode_body(body)),
+            'response': dict({
+                'status': response.status_code,
+                'reason': response.reason,
+                'headers': {name: value for name, value in response.headers.items()
+                            if name.lower() not in dropped}
+            }, **_encode_body(response.content))
+        }
+        line = json.dumps(exchange) + '\n'
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+        return response
+
+    def close(self):
+        self.transport.close()
+
+
+class ReplayTransport(Transport):
+    """ Serves the exchanges saved by a `RecordingTransport` in the cassette at `path`,
+        without any network. A request is matched on its method, URL and body; requests
+        that were recorded several times get the recorded responses in order, and the
+        last one again once those run out. A request that was never recorded raises a
+        `LookupError`.
+
+        `replayed` counts the requests served.
+    """
+
+    def __init__(self, path):
+
+        self.path = path
+        self.replayed = 0
+        self._exchanges = defaultdict(list)
+        self._served = defaultdict(int)
+        self._lock = threading.Lock()
+
+        if not os.path.exists(path):
+            raise FileNotFoundError('No cassette at {}'.format(path))
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    exchange = json.loads(line)
+                    request = exchange['request']
+                    key = exchange_key(request['method'], request['url'], _decode_body(request))
+                    self._exchanges[key].append(exchange['response'])
+
+    def request(self, method, url, headers=None, params=None, data=None, auth=None, stream=False):
+
+        url = request_url(url, params)
+        key = exchange_key(method, url, body_bytes(data))
+        with self._lock:
+            responses = self._exchanges.get(key)
+            if not responses:
+                raise LookupError('No recorded response for {} {}'.format(method, url))
+            saved = responses[min(self._served[key], len(responses) - 1)]
+            self._served[key] += 1
+            self.replayed += 1
+        return Response(saved['status'], _decode_body(saved), saved.get('headers'), reason=saved.get('reason'),
+                        url=url)
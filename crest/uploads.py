@@ -0,0 +1,155 @@
+import itertools
+import mmap
+
+from collections.abc import Iterable, Mapping
+
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+BYTES_TYPES = (bytes, bytearray, memoryview, mmap.mmap)
+
+
+class Upload(object):
+    """ A request body that is sent as it is, with its own `content_type`: bytes, a
+        memory-mapped file, a binary file object, or an iterable of bytes chunks, which
+        is sent with chunked transfer encoding
+    """
+
+    def __init__(self, data, content_type='application/octet-stream'):
+
+        self.data = data
+        self.content_type = content_type
+
+    def encode(self, codec):
+        return self.data
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, self.content_type)
+
+
+class JSONArrayUpload(Upload):
+    """ Streams an iterable of records, e.g. a generator, as a JSON array in chunks of
+        about `chunk_size` bytes, so the whole array never has to be in memory. The
+        records are encoded a batch at a time, with as many records in a batch as fit
+        in a chunk going by the size of the last one.
+    """
+
+    def __init__(self, records, content_type='application/json', chunk_size=UPLOAD_CHUNK_SIZE):
+
+        super(JSONArrayUpload, self).__init__(records, content_type)
+        self.chunk_size = chunk_size
+
+    def encode(self, codec):
+
+        records = iter(self.data)
+        prefix = b'['
+        batch_size = 1
+        while True:
+            batch = list(itertools.islice(records, batch_size))
+            if not batch:
+                break
+            # the records of a batch without the brackets of the array around them
+            encoded = codec.dumps(batch)
+            yield prefix + encoded[1:-1]
+            prefix = b','
+            batch_size = max(1, batch_size * self.chunk_size // len(encoded))
+        yield b']' if prefix == b',' else b'[]'
+
+
+class NDJSONUpload(JSONArrayUpload):
+    """ Streams an iterable of records as newline-delimited JSON, one record per line """
+
+    def __init__(self, records, content_type='application/x-ndjson', chunk_size=UPLOAD_CHUNK_SIZE):
+
+        super(NDJSONUpload, self).__init__(records, content_type, chunk_size)
+
+    def encode(self, codec):
+
+        records = iter(self.data)
+        batch_size = 1
+        while True:
+            batch = list(itertools.islice(records, batch_size))
+            if not batch:
+                return
+            encoded = b'\n'.join(map(codec.dumps, batch)) + b'\n'
+            yield encoded
+            batch_size = max(1, batch_size * self.chunk_size // len(encoded))
+
+
+CHUNK_TYPES = (bytes, bytearray, memoryview)
+
+_EMPTY = object()
+
+
+def encode_body(body, codec):
+    """ The data to send for the `body` of a call, and its content type, or None for the
+        client's JSON default. Bytes, memory-mapped files and file objects are sent as
+        they are, without a copy; an iterable of bytes chunks, e.g. a generator or a
+        list, is sent chunk by chunk; any other iterator or iterable that isn't a list,
+        a tuple or a dict is streamed as a JSON array of records; an `Upload` is sent
+        as it says; anything else is encoded as JSON in memory.
+    """
+
+    if body is None:
+        return None, None
+    if isinstance(body, Upload):
+        return body.encode(codec), body.content_type
+    if isinstance(body, BYTES_TYPES) or hasattr(body, 'read'):
+        return body, None
+    if isinstance(body, (list, tuple)):
+        if body and all(isinstance(chunk, CHUNK_TYPES) for chunk in body):
+            return iter(body), None
+        return codec.dumps(body), None
+    if isinstance(body, Iterable) and not isinstance(body, (str, Mapping)):
+        body = iter(body)
+        first = next(body, _EMPTY)
+        if first is _EMPTY:
+            return JSONArrayUpload(()).encode(codec), None
+        body = itertools.chain([first], body)
+        if isinstance(first, CHUNK_TYPES):
+            return body, None
+        return JSONArrayUpload(body).encode(codec), None
+    return codec.dumps(body), None
+
+
+def is_streamed(data):
+    """ Whether sending `data` consumes it, so that it can't be sent again: files and
+        memory-mapped files are read from their current position, and iterators only
+        go through their chunks once
+    """
+    return data is not None and not isinstance(data, (bytes, bytearray, memoryview))
+
+
+async def async_chunks(data, chunk_size=UPLOAD_CHUNK_SIZE):
+    """ The chunks of a body for the asyncio HTTP libraries, which can't read files or
+        iterate over iterables that block; those are read in the event loop's executor
+    """
+
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    if isinstance(data, (bytearray, memoryview)):
+        view = memoryview(data).cast('B')
+        for start in range(0, len(view), chunk_size):
+            yield bytes(view[start:start + chunk_size])
+    elif hasattr(data, 'read'):
+        while True:
+            chunk = await loop.run_in_executor(None, data.read, chunk_size)
+            if not chunk:
+                return
+            yield chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+    else:
+        iterator = iter(data)
+        end = object()
+        while True:
+            chunk = await loop.run_in_executor(None, next, iterator, end)
+            if chunk is end:
+                return
+            yield chunk.encode('utf-8') if isinstance(chunk, str) else bytes(chunk)
+
+
+def async_body(data):
+    """ A body as the asyncio HTTP libraries take it: bytes, or an async iterable """
+    if data is None or isinstance(data, bytes):
+        return data
+    return async_chunks(data)
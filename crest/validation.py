@@ -0,0 +1,205 @@
+import math
+import random
+
+from collections.abc import Sequence
+
+from crest.schema import sub_validator
+
+
+def load_result(result_schema, value):
+    """ Load a whole decoded response with a marshmallow `result_schema`, or check it
+        against a `crest.schema.JSONSchema` and return it as it is
+    """
+    if hasattr(result_schema, 'load'):
+        return result_schema.load(value)
+    result_schema.validate(value)
+    return value
+
+
+def item_loader(result_schema):
+    """ A function `load(item, index)` that loads one element of a list response
+        described by `result_schema`, or None if the schema doesn't describe a list.
+        An invalid element raises the error the whole list would have raised, labelled
+        with the element's index.
+    """
+
+    if hasattr(result_schema, 'load'):
+        if not getattr(result_schema, 'many', False):
+            return None
+
+        def load(item, index):
+            from marshmallow import ValidationError
+            try:
+                return result_schema.load(item, many=False)
+            except ValidationError as ex:
+                raise ValidationError({index: ex.messages}, data=item) from ex
+
+        return load
+
+    schema = result_schema.schema
+    if schema.get('type') != 'array' or not isinstance(schema.get('items'), dict):
+        return None
+    validator = sub_validator(result_schema.validator, schema['items'])
+
+    def load(item, index):
+        from jsonschema.exceptions import best_match
+        error = best_match(validator.iter_errors(item))
+        if error is not None:
+            error.path.appendleft(index)
+            raise error
+        return item
+
+    return load
+
+
+class LazyRecords(Sequence):
+    """ A read-only sequence over the elements of a list response, each of which is
+        loaded with the result schema the first time it is accessed and kept from then
+        on. An invalid element raises its error, labelled with its index, on every
+        access, and `load_all` loads whatever hasn't been accessed yet.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, items, load):
+
+        self._items = items
+        self._load = load
+        self._loaded = [self._MISSING] * len(items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self._items)))]
+
+        if index < 0:
+            index += len(self._items)
+        if not 0 <= index < len(self._items):
+            raise IndexError('LazyRecords index out of range')
+        value = self._loaded[index]
+        if value is self._MISSING:
+            value = self._loaded[index] = self._load(self._items[index], index)
+        return value
+
+    def __iter__(self):
+        for index in range(len(self._items)):
+            yield self[index]
+
+    def __eq__(self, other):
+        if isinstance(other, (LazyRecords, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    @property
+    def loaded(self):
+        """ How many elements have been loaded so far """
+        return sum(1 for value in self._loaded if value is not self._MISSING)
+
+    def load_all(self):
+        """ Load every element, raising the error of the first invalid one, and return
+            them as a list
+        """
+        return list(self)
+
+    def __repr__(self):
+        return 'LazyRecords({} items, {} loaded)'.format(len(self), self.loaded)
+
+
+class Validation(object):
+    """ How a client applies the result schema of a call to a decoded response. The
+        eager strategy, the default, loads the whole response before returning it. The
+        others only differ for list responses whose schema describes a list, i.e. a
+        marshmallow schema with `many=True` or a JSON schema of type array; any other
+        response is loaded eagerly.
+    """
+
+    name = 'eager'
+
+    def apply(self, result_schema, value):
+        return load_result(result_schema, value)
+
+    def __repr__(self):
+        return '{}()'.format(type(self).__name__)
+
+
+class LazyValidation(Validation):
+    """ Return list responses as a `LazyRecords`, which loads each element when it is
+        first accessed, so a caller that only looks at a few elements of a long list
+        only pays for those
+    """
+
+    name = 'lazy'
+
+    def apply(self, result_schema, value):
+        load = item_loader(result_schema) if isinstance(value, list) else None
+        if load is None:
+            return load_result(result_schema, value)
+        return LazyRecords(value, load)
+
+
+class SampledValidation(Validation):
+    """ Check only the `first` elements of a list response and a `fraction` of the
+        others, picked at random with a fixed `seed` so that the same response always
+        checks the same elements. The sample is checked in order, and the first invalid
+        element raises its error, labelled with its index.
+
+        The elements are returned as they were decoded, so this suits schemas that
+        validate responses rather than transform them.
+    """
+
+    name = 'sampled'
+
+    def __init__(self, fraction=0.01, first=100, seed=0):
+
+        if not 0 <= fraction <= 1:
+            raise ValueError('fraction must be between 0 and 1, not {}'.format(fraction))
+        self.fraction = fraction
+        self.first = first
+        self.seed = seed
+
+    def sample(self, count):
+        """ The sorted indices of the elements checked in a list of `count` elements """
+        head = min(self.first or 0, count)
+        rest = range(head, count)
+        picked = random.Random(self.seed).sample(rest, math.ceil(self.fraction * len(rest)))
+        return list(range(head)) + sorted(picked)
+
+    def apply(self, result_schema, value):
+        load = item_loader(result_schema) if isinstance(value, list) else None
+        if load is None:
+            return load_result(result_schema, value)
+        for index in self.sample(len(value)):
+            load(value[index], index)
+        return value
+
+    def __repr__(self):
+        return 'SampledValidation(fraction={}, first={}, seed={})'.format(self.fraction, self.first, self.seed)
+
+
+VALIDATIONS = {
+    'eager': Validation,
+    'lazy': LazyValidation,
+    'sampled': SampledValidation
+}
+
+
+# the strategies are stateless, so every name maps to a single shared instance, which
+# lets calls that name the same strategy be coalesced
+_DEFAULTS = {}
+
+
+def get_validation(validation=None):
+    """ Turn a strategy name, 'eager', 'lazy' or 'sampled', into a `Validation`, with
+        the default settings of its class; instances are returned unchanged
+    """
+    if isinstance(validation, Validation):
+        return validation
+    name = validation or 'eager'
+    if name not in VALIDATIONS:
+        raise ValueError('Unknown validation {!r}, expected one of {}'.format(name, sorted(VALIDATIONS)))
+    if name not in _DEFAULTS:
+        _DEFAULTS[name] = VALIDATIONS[name]()
+    return _DEFAULTS[name]
@@ -4,13 +4,19 @@ from setuptools import setup
 setup(
     name='cREST',
     version='0.1.5',
-    packages=['crest', 'crest.tests'],
+    packages=['crest', 'crest.benchmarks', 'crest.tests'],
     license='LICENSE.txt',
     long_description=open('README.txt').read(),
     install_requires=[
         'requests==2.20.0',
         'marshmallow==3.0.0rc5'
     ],
+    extras_require={
+        'async': ['aiohttp>=3.8'],
+        'orjson': ['orjson>=3'],
+        'numpy': ['numpy>=1.20'],
+        'http2': ['httpx[http2]>=0.23']
+    },
     author='Jerry Vinokurov',
     author_email='grapesmoker@gmail.com'
 )